@@ -0,0 +1,37 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from apps.health.views import healthcheck, readiness
+
+PROBES = {"/healthcheck/": healthcheck, "/readiness/": readiness}
+
+
+class ProbeMiddleware:
+    """Answers the liveness and readiness probes ahead of the other middleware.
+
+    Goes first in ``MIDDLEWARE``, so probes skip sessions, CSRF, auth, metrics
+    and URL resolution. The routes in ``urls.py`` serve the same views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if (probe := PROBES.get(request.path_info)) is not None:
+            return probe(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if (probe := PROBES.get(request.path_info)) is None:
+            return await self.get_response(request)
+        # The healthcheck touches neither the database nor the disk, so it is
+        # answered on the event loop; readiness runs queries in a thread.
+        if probe is healthcheck:
+            return probe(request)
+        return await sync_to_async(probe)(request)
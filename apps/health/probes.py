@@ -0,0 +1,78 @@
+"""Readiness checks, cached so frequent probes do not load the database.
+
+The result is kept for ``VENDING_READINESS_TTL`` seconds per process and only
+one thread runs the checks at a time. Once the migrations are found applied
+they are not checked again, since the code of a running process cannot gain
+new ones. The triggers that keep the product search index in sync are checked
+every time: a migration that rebuilds the product table drops them.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+
+from apps.vending.search import missing_triggers
+
+_lock = threading.Lock()
+_checked_at = None
+_report = None
+_migrated = False
+
+
+def readiness_report() -> dict:
+    global _checked_at, _report
+    with _lock:
+        now = time.monotonic()
+        if _checked_at is None or now - _checked_at >= settings.VENDING_READINESS_TTL:
+            _report = check_readiness()
+            _checked_at = time.monotonic()
+        return _report
+
+
+def check_readiness() -> dict:
+    checks = {}
+    connection = connections[DEFAULT_DB_ALIAS]
+    try:
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        latency = time.perf_counter() - start
+        checks["database"] = "ok"
+        checks["database_latency_ms"] = round(latency * 1000, 3)
+        if latency > settings.VENDING_READINESS_MAX_DB_LATENCY:
+            checks["database"] = "slow"
+        checks["migrations"] = "ok" if migrated(connection) else "pending"
+        if checks["migrations"] == "ok":
+            missing = missing_triggers(connection.alias)
+            checks["search_index"] = (
+                f"missing triggers: {', '.join(missing)}" if missing else "ok"
+            )
+    except DatabaseError as error:
+        checks["database"] = f"error: {error}"
+
+    ready = (
+        checks["database"] == "ok"
+        and checks.get("migrations") == "ok"
+        and checks.get("search_index") == "ok"
+    )
+    return {"status": "ready" if ready else "not ready", "checks": checks}
+
+
+def migrated(connection) -> bool:
+    global _migrated
+    if not _migrated:
+        executor = MigrationExecutor(connection)
+        _migrated = not executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return _migrated
+
+
+def reset() -> None:
+    """Forgets the cached results."""
+    global _checked_at, _report, _migrated
+    with _lock:
+        _checked_at = _report = None
+        _migrated = False
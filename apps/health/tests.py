@@ -1,8 +1,85 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
 from django.test import TestCase
 
+from apps.health import probes
+from apps.vending import admission
+
+
+@pytest.fixture(autouse=True)
+def reset_probes():
+    probes.reset()
+    yield
+    probes.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_admission():
+    # Every test client shares one address.
+    admission.reset()
+
 
 # Create your tests here.
 def test_healthcheck_ok(client):
     response = client.get("/healthcheck/")
     assert response.status_code == 200
     assert response.content == b"OK"
+
+
+def test_healthcheck_skips_the_middleware_stack(client):
+    response = client.get("/healthcheck/")
+    assert "X-Frame-Options" not in response
+    assert response.wsgi_request.resolver_match is None
+
+
+@pytest.mark.django_db
+def test_readiness_checks_the_database(client):
+    response = client.get("/readiness/")
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "ready",
+        "checks": {
+            "database": "ok",
+            "database_latency_ms": pytest.approx(0, abs=250),
+            "migrations": "ok",
+            "search_index": "ok",
+        },
+    }
+
+
+@pytest.mark.django_db
+def test_readiness_is_cached(client, django_assert_num_queries):
+    client.get("/readiness/")
+    with django_assert_num_queries(0):
+        response = client.get("/readiness/")
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_readiness_fails_on_a_slow_database(client, settings):
+    settings.VENDING_READINESS_MAX_DB_LATENCY = 0
+    response = client.get("/readiness/")
+    assert response.status_code == 503
+    assert response.json()["checks"]["database"] == "slow"
+
+
+@pytest.mark.django_db
+def test_readiness_fails_with_pending_migrations(client, monkeypatch):
+    monkeypatch.setattr(
+        MigrationExecutor, "migration_plan", lambda self, targets: [targets[0]]
+    )
+    response = client.get("/readiness/")
+    assert response.status_code == 503
+    assert response.json()["checks"]["migrations"] == "pending"
+
+
+@pytest.mark.django_db
+def test_readiness_fails_without_the_search_triggers(client):
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TRIGGER product_search_update")
+    response = client.get("/readiness/")
+    assert response.status_code == 503
+    assert response.json()["checks"]["search_index"] == (
+        "missing triggers: product_search_update"
+    )
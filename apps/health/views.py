@@ -1,5 +1,31 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
+
+from apps.health.probes import readiness_report
+from apps.vending.metrics import CONTENT_TYPE, render
 
 
 def healthcheck(request):
     return HttpResponse("OK")
+
+
+def readiness(request):
+    report = readiness_report()
+    return JsonResponse(report, status=200 if report["status"] == "ready" else 503)
+
+
+def metrics(request):
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+def metrics_allowed(request) -> bool:
+    """Scrapers send ``Bearer <VENDING_METRICS_TOKEN>``; staff may look too."""
+    token = settings.VENDING_METRICS_TOKEN
+    if token and constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return True
+    return request.user.is_staff
@@ -1,21 +1,204 @@
-from django.contrib import admin
-from apps.vending.models import Buyer, Product, VendingMachineSlot
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from apps.vending.ledger import balance_expression, from_cents
+from apps.vending.models import (
+    SLOT_CAPACITY,
+    Buyer,
+    Product,
+    Sale,
+    VendingMachine,
+    VendingMachineSlot,
+)
+from apps.vending.versions import (
+    FLEET_SCOPE,
+    bump_catalog,
+    bump_versions,
+    machine_scope,
+)
+
+# Unfiltered changelists of tables larger than this show an estimated count.
+ESTIMATED_COUNT_THRESHOLD = 10_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Estimates the size of unfiltered changelists of large tables.
+
+    ``COUNT(*)`` reads the whole table on SQLite. The largest rowid is found
+    with one index lookup and equals the row count until rows are deleted, so
+    it is close enough to size the pagination.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if connection.vendor == "sqlite" and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT MAX(rowid) FROM "
+                    + connection.ops.quote_name(query.model._meta.db_table)
+                )
+                estimate = cursor.fetchone()[0] or 0
+            if estimate > ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class PriceActionForm(ActionForm):
+    price = forms.DecimalField(
+        required=False, max_digits=4, decimal_places=2, min_value=0
+    )
+
+
+class QuantityActionForm(ActionForm):
+    quantity = forms.IntegerField(
+        required=False, min_value=0, max_value=SLOT_CAPACITY, label="Quantity"
+    )
+
+
+def action_value(request, action_form, name: str):
+    """Cleans the ``name`` field of ``action_form`` posted with an action."""
+    return action_form.base_fields[name].clean(request.POST.get(name))
+
+
+class StockFilter(admin.SimpleListFilter):
+    title = "stock"
+    parameter_name = "stock"
+
+    def lookups(self, request, model_admin):
+        return [("empty", "Empty"), ("low", "Low (5 or less)"), ("full", "Full")]
+
+    def queryset(self, request, queryset):
+        if self.value() == "empty":
+            return queryset.filter(quantity=0)
+        if self.value() == "low":
+            return queryset.filter(quantity__lte=5)
+        if self.value() == "full":
+            return queryset.filter(quantity=SLOT_CAPACITY)
+        return queryset
 
 
 # Register your models here.
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ScalableAdmin):
     list_display = ["name", "price", "created_at", "updated_at"]
     ordering = ["-created_at"]
+    # Prefix searches, served by product_name_nocase_idx.
+    search_fields = ["^name"]
+    action_form = PriceActionForm
+    actions = ["change_price"]
+
+    @admin.action(description="Set the price of the selected products")
+    def change_price(self, request, queryset):
+        try:
+            price = action_value(request, PriceActionForm, "price")
+        except ValidationError:
+            price = None
+        if price is None:
+            self.message_user(request, "Enter a valid price.", messages.ERROR)
+            return
+        with transaction.atomic():
+            changed = queryset.update(price=price, updated_at=timezone.now())
+            bump_catalog()
+        self.message_user(request, f"Changed the price of {changed} products.")
+
 
+class VendingMachineAdmin(ScalableAdmin):
+    list_display = ["name", "created_at"]
+    ordering = ["name"]
 
-class VendingMachineSlotAdmin(admin.ModelAdmin):
-    list_display = ["product", "quantity", "row", "column"]
 
+class VendingMachineSlotAdmin(ScalableAdmin):
+    list_display = ["product", "machine", "quantity", "row", "column"]
+    list_select_related = ["product", "machine"]
+    list_filter = [StockFilter]
+    search_fields = ["^product__name"]
+    raw_id_fields = ["machine", "product"]
+    action_form = QuantityActionForm
+    actions = ["restock"]
 
-class BuyerAdmin(admin.ModelAdmin):
+    @admin.action(description="Restock the selected slots")
+    def restock(self, request, queryset):
+        try:
+            quantity = action_value(request, QuantityActionForm, "quantity")
+        except ValidationError:
+            self.message_user(request, "Enter a valid quantity.", messages.ERROR)
+            return
+        if quantity is None:
+            quantity = SLOT_CAPACITY
+        with transaction.atomic():
+            # Bumped first, so the transaction holds the write lock before it
+            # reads the machines, as in apps.vending.restock.apply_chunk.
+            bump_versions([FLEET_SCOPE])
+            machine_ids = set(queryset.values_list("machine_id", flat=True).distinct())
+            restocked = queryset.update(quantity=quantity)
+            bump_versions(machine_scope(id) for id in machine_ids)
+        self.message_user(request, f"Set {restocked} slots to {quantity} units.")
+
+
+class BuyerAdmin(ScalableAdmin):
     list_display = ["user", "credit"]
+    list_select_related = ["user"]
+    raw_id_fields = ["user"]
+    search_fields = ["user__username"]
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request).annotate(balance_cents=balance_expression())
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Usernames are case sensitive, so a range on the unique index finds
+        # the ones that start with the term without scanning auth_user.
+        if not search_term:
+            return queryset, False
+        return (
+            queryset.filter(
+                user__username__gte=search_term,
+                user__username__lt=search_term + "\U0010ffff",
+            ),
+            False,
+        )
+
+    @admin.display(description="credit", ordering="balance_cents")
+    def credit(self, buyer):
+        return from_cents(buyer.balance_cents)
+
+
+class SaleAdmin(ScalableAdmin):
+    list_display = ["sold_at", "product", "quantity", "price", "machine", "buyer"]
+    list_select_related = ["product", "machine", "buyer__user"]
+    # Served by sale_sold_at_idx.
+    ordering = ["-sold_at"]
+    raw_id_fields = ["buyer", "machine", "slot", "product"]
+
+    @admin.display(description="unit price")
+    def price(self, sale):
+        return from_cents(sale.unit_price_cents)
+
+    # The journal is append-only.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 admin.site.register(Buyer, BuyerAdmin)
 admin.site.register(Product, ProductAdmin)
+admin.site.register(Sale, SaleAdmin)
+admin.site.register(VendingMachine, VendingMachineAdmin)
 admin.site.register(VendingMachineSlot, VendingMachineSlotAdmin)
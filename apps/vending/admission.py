@@ -0,0 +1,200 @@
+"""Admission control: token bucket rate limits and a cap on writes in flight.
+
+``VENDING_RATE_LIMITS`` maps request paths, or ``"*"`` for every path, to
+limits of ``(requests per second, burst)`` on one of these keys:
+
+- ``"buyer"``: the buyer of a token request, read from the signature alone
+  ahead of authentication, or the session of a session client;
+- ``"ip"``: the client address, read from ``X-Forwarded-For`` when the
+  request comes through one of ``VENDING_TRUSTED_PROXIES``;
+- ``"route"``: every request to the path.
+
+A request over any of its limits gets a 429 whose ``Retry-After`` is the time
+until its bucket has a token again. Writes (unsafe methods) beyond
+``VENDING_MAX_INFLIGHT_WRITES`` running at once get a 503 instead of queueing
+on SQLite's write lock, so an overloaded process sheds early rather than
+slowing down every request.
+
+Buckets and the count of writes are kept per process: with several workers
+the limits add up. At most ``VENDING_RATE_LIMIT_MAX_KEYS`` buckets are kept per
+limit, and the least recently used ones are forgotten, which refills them.
+Every rejected request is counted in ``vending_requests_shed_total``.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest, HttpResponse
+from rest_framework import status
+
+from apps.vending import metrics
+from apps.vending.authentication import token_buyer_id
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+ALL_PATHS = "*"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Takes a token and returns 0, or returns the seconds until one is due."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """A token bucket per key, keeping the ``max_keys`` most recently used."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(now)
+
+
+class WriteSlots:
+    def __init__(self):
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, limit: int | None) -> bool:
+        with self._lock:
+            if limit is not None and self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+_lock = threading.Lock()
+_limiters = {}
+_writes = WriteSlots()
+
+
+def admit(request: HttpRequest) -> HttpResponse | None:
+    """Returns the response rejecting ``request``, or None to let it through.
+
+    Requests let through must be passed to ``finish`` once answered.
+    """
+    for path in (request.path_info, ALL_PATHS):
+        for scope, (rate, burst) in settings.VENDING_RATE_LIMITS.get(path, {}).items():
+            key = request_key(request, scope)
+            if key is None:
+                continue
+            if wait := limiter(path, scope, rate, burst).take(key):
+                metrics.requests_shed.inc(path=path, limit=scope)
+                return rejected(
+                    status.HTTP_429_TOO_MANY_REQUESTS, "too many requests", wait
+                )
+
+    if request.method not in SAFE_METHODS:
+        if not _writes.acquire(settings.VENDING_MAX_INFLIGHT_WRITES):
+            metrics.requests_shed.inc(path=ALL_PATHS, limit="writes")
+            return rejected(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "server overloaded",
+                settings.VENDING_OVERLOAD_RETRY_AFTER,
+            )
+        request._admitted_write = True
+    return None
+
+
+def finish(request: HttpRequest) -> None:
+    if getattr(request, "_admitted_write", False):
+        request._admitted_write = False
+        _writes.release()
+
+
+def request_key(request: HttpRequest, scope: str) -> str | None:
+    if scope == "route":
+        return ""
+    if scope == "ip":
+        return client_address(request)
+    if scope == "buyer":
+        if (buyer_id := token_buyer_id(request)) is not None:
+            return f"buyer:{buyer_id}"
+        if session_key := request.COOKIES.get(settings.SESSION_COOKIE_NAME):
+            return f"session:{session_key}"
+        return None
+    raise ImproperlyConfigured(f"Unknown rate limit key {scope!r}")
+
+
+def client_address(request: HttpRequest) -> str:
+    """The address of the client, seen through ``VENDING_TRUSTED_PROXIES``.
+
+    Every proxy appends the address it was reached from to ``X-Forwarded-For``,
+    so the client is the rightmost address that is not a trusted proxy. Without
+    trusted proxies the header is ignored: any client can set it.
+    """
+    address = request.META.get("REMOTE_ADDR", "")
+    trusted = settings.VENDING_TRUSTED_PROXIES
+    if address not in trusted:
+        return address
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    for hop in reversed([hop.strip() for hop in forwarded.split(",")]):
+        if not hop:
+            continue
+        address = hop
+        if hop not in trusted:
+            break
+    return address
+
+
+def limiter(path: str, scope: str, rate: float, burst: int) -> RateLimiter:
+    # Keyed by the limit too, so changed settings start with fresh buckets.
+    key = (path, scope, rate, burst)
+    with _lock:
+        if (rate_limiter := _limiters.get(key)) is None:
+            rate_limiter = _limiters[key] = RateLimiter(
+                rate, burst, settings.VENDING_RATE_LIMIT_MAX_KEYS
+            )
+        return rate_limiter
+
+
+def rejected(status_code: int, reason: str, retry_after: float) -> HttpResponse:
+    response = HttpResponse(
+        reason,
+        status=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+    # Shed requests are counted, not logged: django.request would log every
+    # 503 as an error, and renders a traceback for it, under overload.
+    response._has_been_logged = True
+    return response
+
+
+def reset() -> None:
+    """Forgets every bucket."""
+    with _lock:
+        _limiters.clear()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class VendingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.vending"
+
+    def ready(self):
+        from apps.vending import signals  # noqa: F401
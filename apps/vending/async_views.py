@@ -0,0 +1,233 @@
+"""Async versions of the read endpoints, for ASGI deployments.
+
+DRF 3.14 views are always synchronous, so these are plain Django views built
+on the async ORM. They validate with the same validators and return the same
+bytes as their counterparts in ``apps.vending.views``; ``urls.py`` routes to
+them when ``VENDING_ASYNC_READS`` is set. Under WSGI they would run each
+request in a new event loop, so keep the sync views there.
+"""
+
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.utils.urls import replace_query_param
+
+from apps.vending.authentication import TOKEN_KEYWORD, arequest_buyer
+from apps.vending.cache import (
+    acatalog_response,
+    ainventory_response,
+    json_response,
+    not_modified,
+)
+from apps.vending.ledger import balance_expression, from_cents
+from apps.vending.models import Buyer, VendingMachineSlot
+from apps.vending.pagination import DEFAULT_PAGE_SIZE, aiter_slots, apaginate_slots
+from apps.vending.search import catalog_products
+from apps.vending.serializers import (
+    BuyerSerializer,
+    VendingMachineSlotSerializer,
+    serialize_product_row,
+    serialize_slot_row,
+)
+from apps.vending.streaming import STREAM_CHUNK_SIZE, astream_json_array
+from apps.vending.validators import (
+    ListSlotsValidator,
+    LowStockValidator,
+    ProductSearchValidator,
+    SlotsMatrixValidator,
+)
+from apps.vending.versions import ainventory_versions, inventory_etag
+from apps.vending.views import (
+    MATRIX_FIELDS,
+    SeveralMachines,
+    listed_slots,
+    low_stock_slots,
+    machine_filters,
+    matrix_filters,
+    matrix_slots,
+    slots_matrix,
+)
+
+
+def validation_error(validator) -> HttpResponse:
+    return json_response(validator.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class VendingMachineSlotsView(View):
+    read_replica = True
+
+    async def get(self, request, *args, **kwargs):
+        validator = ListSlotsValidator(data=request.GET)
+        if not validator.is_valid():
+            return validation_error(validator)
+        slots = listed_slots(self.kwargs, validator.validated_data)
+
+        if validator.validated_data["stream"]:
+            return await self.stream(slots)
+
+        cursor = validator.validated_data["cursor"]
+        limit = validator.validated_data["limit"]
+        if cursor is None and limit is None:
+            build = partial(self.serialize, slots)
+        else:
+            build = partial(self.paginate, slots, cursor, limit or DEFAULT_PAGE_SIZE)
+
+        return await ainventory_response(request, self.kwargs.get("machine_id"), build)
+
+    async def stream(self, slots):
+        etag = inventory_etag(await ainventory_versions(self.kwargs.get("machine_id")))
+        if not_modified(self.request, etag):
+            return HttpResponseNotModified(headers={"ETag": etag})
+
+        response = StreamingHttpResponse(
+            astream_json_array(
+                serialize_slot_row(slot)
+                async for slot in aiter_slots(slots, STREAM_CHUNK_SIZE)
+            ),
+            content_type="application/json",
+        )
+        response["ETag"] = etag
+        return response
+
+    async def serialize(self, slots) -> list:
+        return [serialize_slot_row(slot) async for slot in slots]
+
+    async def paginate(self, slots, cursor, limit: int) -> dict:
+        page, next_cursor = await apaginate_slots(slots, cursor, limit)
+        next_url = None
+        if next_cursor is not None:
+            next_url = replace_query_param(
+                self.request.build_absolute_uri(), "cursor", next_cursor
+            )
+        return {
+            "next": next_url,
+            "results": [serialize_slot_row(slot) for slot in page],
+        }
+
+
+class LowStockSlotsView(View):
+    read_replica = True
+
+    async def get(self, request, *args, **kwargs):
+        validator = LowStockValidator(data=request.GET)
+        if not validator.is_valid():
+            return validation_error(validator)
+        slots = low_stock_slots(self.kwargs, validator.validated_data)
+
+        return await ainventory_response(
+            request, self.kwargs.get("machine_id"), partial(self.serialize, slots)
+        )
+
+    async def serialize(self, slots) -> list:
+        return [serialize_slot_row(slot) async for slot in slots]
+
+
+class VendingMachineSlotsMatrixView(View):
+    read_replica = True
+
+    async def get(self, request, *args, **kwargs):
+        validator = SlotsMatrixValidator(data=request.GET)
+        if not validator.is_valid():
+            return validation_error(validator)
+        rows = validator.validated_data["rows"]
+        columns = validator.validated_data["columns"]
+
+        try:
+            return await ainventory_response(
+                request,
+                self.kwargs.get("machine_id"),
+                partial(self.build_matrix, rows, columns),
+            )
+        except SeveralMachines as error:
+            return HttpResponseBadRequest(content=error.message)
+
+    async def build_matrix(self, rows: int | None, columns: int | None) -> list:
+        slots = matrix_slots(
+            [
+                slot
+                async for slot in VendingMachineSlot.objects.filter(
+                    **matrix_filters(self.kwargs, rows, columns)
+                )
+                .order_by("row", "column")
+                .values_list(*MATRIX_FIELDS)
+            ]
+        )
+        return slots_matrix(slots, rows, columns)
+
+
+class VendingMachineSlotView(View):
+    read_replica = True
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            return await ainventory_response(
+                request, self.kwargs.get("machine_id"), self.serialize
+            )
+        except VendingMachineSlot.DoesNotExist:
+            return json_response(
+                {"detail": exceptions.NotFound.default_detail},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+    async def serialize(self) -> dict:
+        slot = await VendingMachineSlot.objects.select_related("product").aget(
+            id=self.kwargs["id"], **machine_filters(self.kwargs)
+        )
+        return VendingMachineSlotSerializer(slot).data
+
+
+class ProductsView(View):
+    read_replica = True
+
+    async def get(self, request, *args, **kwargs):
+        validator = ProductSearchValidator(data=request.GET)
+        if not validator.is_valid():
+            return validation_error(validator)
+
+        return await acatalog_response(
+            request,
+            partial(
+                self.search,
+                validator.validated_data["search"],
+                validator.validated_data["limit"],
+            ),
+        )
+
+    async def search(self, text: str | None, limit: int) -> list:
+        # Raw querysets have no async iteration in Django 4.2.
+        rows = await sync_to_async(catalog_products)(text, limit)
+        return [serialize_product_row(row) for row in rows]
+
+
+class ProfileView(View):
+    read_replica = True
+
+    async def get(self, request):
+        try:
+            buyer = await arequest_buyer(request)
+        except exceptions.AuthenticationFailed as error:
+            return json_response(
+                {"detail": error.detail},
+                status=status.HTTP_401_UNAUTHORIZED,
+                headers={"WWW-Authenticate": TOKEN_KEYWORD},
+            )
+        if buyer is None:
+            return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
+
+        buyer = (
+            await Buyer.objects.select_related("user")
+            .annotate(balance_cents=balance_expression())
+            .aget(pk=buyer.pk)
+        )
+        buyer_serializer = BuyerSerializer(
+            {"credit": from_cents(buyer.balance_cents), "user": buyer.user}
+        )
+        return json_response(buyer_serializer.data)
@@ -0,0 +1,214 @@
+"""Signed-token authentication for the buyer endpoints.
+
+``LoginView`` hands out a token signed with ``SECRET_KEY`` that carries the
+user and buyer ids, a random token id and the time it was issued. Clients send
+it back as ``Authorization: Token <token>`` and the request is authenticated
+from the signature alone: no ``django_session`` row and no ``User`` lookup.
+
+Tokens expire after ``VENDING_AUTH_TOKEN_MAX_AGE`` seconds. ``LogoutView``
+revokes a token by storing its id in the ``revoked_token`` table until it would
+have expired anyway, so every worker rejects it. Checking a token costs one
+primary key lookup on the primary database, which also rejects tokens of
+deleted buyers and of deleted or inactive users.
+"""
+
+import secrets
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import cached_property
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists
+from django.utils import timezone
+from rest_framework import authentication, exceptions
+
+from apps.vending.models import Buyer, RevokedToken
+
+TOKEN_KEYWORD = "Token"
+TOKEN_SALT = "apps.vending.authentication"
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    user_id: int
+    buyer_id: int
+    token_id: str
+
+
+class TokenUser:
+    """The authenticated user of a token request, known only by its ids."""
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+    is_staff = False
+    is_superuser = False
+
+    def __init__(self, claims: TokenClaims):
+        self.id = self.pk = claims.user_id
+        self.buyer_id = claims.buyer_id
+
+    def __str__(self) -> str:
+        return f"token user {self.pk}"
+
+    @cached_property
+    def buyer(self) -> Buyer:
+        # A Buyer with every other field deferred: the ids are enough for the
+        # ledger and the order engine, anything else is loaded on access.
+        return Buyer.from_db(
+            DEFAULT_DB_ALIAS, ["id", "user_id"], [self.buyer_id, self.pk]
+        )
+
+
+def issue_token(buyer: Buyer) -> str:
+    return signing.dumps(
+        {"u": buyer.user_id, "b": buyer.pk, "j": secrets.token_urlsafe(12)},
+        salt=TOKEN_SALT,
+    )
+
+
+def read_token(token: str) -> TokenClaims:
+    """Returns the claims of a valid token or raises ``signing.BadSignature``."""
+    claims = _verify_token(token)
+    _check_revoked(_revoked_query(claims).first())
+    return claims
+
+
+async def aread_token(token: str) -> TokenClaims:
+    claims = _verify_token(token)
+    _check_revoked(await _revoked_query(claims).afirst())
+    return claims
+
+
+def _revoked_query(claims: TokenClaims):
+    # The token's buyer with an active user, and whether the token was revoked.
+    return (
+        Buyer.objects.using(DEFAULT_DB_ALIAS)
+        .filter(pk=claims.buyer_id, user_id=claims.user_id, user__is_active=True)
+        .values_list(
+            Exists(RevokedToken.objects.filter(token_id=claims.token_id)), flat=True
+        )
+    )
+
+
+def _check_revoked(revoked: bool | None) -> None:
+    if revoked is None:
+        raise signing.BadSignature("Token user is inactive or deleted")
+    if revoked:
+        raise signing.BadSignature("Token has been revoked")
+
+
+def _verify_token(token: str) -> TokenClaims:
+    payload = signing.loads(
+        token, salt=TOKEN_SALT, max_age=settings.VENDING_AUTH_TOKEN_MAX_AGE
+    )
+    return TokenClaims(payload["u"], payload["b"], payload["j"])
+
+
+def token_buyer_id(request) -> int | None:
+    """The buyer id in the token of ``request``, checking only the signature.
+
+    For rate limiting ahead of authentication, so revoked tokens are still
+    counted against their buyer.
+    """
+    header = request.headers.get("Authorization", "").split()
+    if len(header) != 2 or header[0].lower() != TOKEN_KEYWORD.lower():
+        return None
+    try:
+        return _verify_token(header[1]).buyer_id
+    except signing.BadSignature:
+        return None
+
+
+def revoke_token(claims: TokenClaims) -> None:
+    """Rejects the token of ``claims`` from now on, and purges expired ones."""
+    now = timezone.now()
+    RevokedToken.objects.filter(expires_at__lte=now).delete()
+    # The token was issued before now, so it expires before this row does.
+    RevokedToken.objects.update_or_create(
+        token_id=claims.token_id,
+        defaults={
+            "expires_at": now + timedelta(seconds=settings.VENDING_AUTH_TOKEN_MAX_AGE)
+        },
+    )
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    def authenticate(self, request):
+        token = self.get_token(request)
+        if token is None:
+            return None
+
+        try:
+            claims = read_token(token)
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed("Invalid or expired token")
+        return TokenUser(claims), claims
+
+    @staticmethod
+    def get_token(request) -> str | None:
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != TOKEN_KEYWORD.lower().encode():
+            return None
+        try:
+            (token,) = header[1:]
+            return token.decode()
+        except (ValueError, UnicodeDecodeError):
+            raise exceptions.AuthenticationFailed("Invalid token header")
+
+    def authenticate_header(self, request) -> str:
+        return TOKEN_KEYWORD
+
+
+class BuyerBackend(ModelBackend):
+    """``ModelBackend`` that loads a session's user and buyer in one query."""
+
+    def get_user(self, user_id):
+        try:
+            user = User.objects.select_related("buyer").get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def user_buyer(user) -> Buyer | None:
+    try:
+        return user.buyer
+    except (AttributeError, Buyer.DoesNotExist):
+        # Anonymous users have no buyer attribute at all.
+        return None
+
+
+def request_buyer(request) -> Buyer | None:
+    """The buyer behind ``request``, loaded at most once per request.
+
+    Token requests need no query. Session users come from ``BuyerBackend``
+    with their buyer already joined in, and the buyer keeps a reference to
+    the user, so serializing both costs nothing more either.
+    """
+    http_request = getattr(request, "_request", request)
+    if not hasattr(http_request, "_buyer"):
+        http_request._buyer = user_buyer(request.user)
+    return http_request._buyer
+
+
+async def arequest_buyer(request) -> Buyer | None:
+    """``request_buyer`` for plain async views, which DRF does not authenticate.
+
+    Raises ``AuthenticationFailed`` for an invalid token.
+    """
+    token = SignedTokenAuthentication.get_token(request)
+    if token is None:
+        return await sync_to_async(lambda: user_buyer(get_user(request)))()
+
+    try:
+        claims = await aread_token(token)
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed("Invalid or expired token")
+    return TokenUser(claims).buyer
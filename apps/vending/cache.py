@@ -0,0 +1,135 @@
+"""Read cache and conditional responses for the inventory endpoints.
+
+Responses are cached under a key built from the request URL and the inventory
+versions it depends on (see ``apps.vending.versions``). Writes bump those
+versions in their own transaction, which orphans exactly the affected entries;
+orphaned entries simply expire. Because the versions live in the database,
+a per-process cache stays correct when several workers write.
+
+The same versions are sent as the ETag, so a client revalidating with
+``If-None-Match`` gets a 304 without the listing query or the serializers.
+"""
+
+import hashlib
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from apps.vending.versions import (
+    acatalog_versions,
+    ainventory_versions,
+    catalog_versions,
+    inventory_etag,
+    inventory_versions,
+)
+
+INVENTORY_CACHE_ALIAS = "inventory"
+
+
+def inventory_cache():
+    return caches[INVENTORY_CACHE_ALIAS]
+
+
+def cached_inventory(
+    request: HttpRequest, versions: tuple[int, int], build: Callable[[], object]
+):
+    """Returns the cached response data for ``request`` or builds and caches it."""
+    key = _cache_key(request, versions)
+    cache = inventory_cache()
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data)
+    return data
+
+
+async def acached_inventory(
+    request: HttpRequest,
+    versions: tuple[int, int],
+    build: Callable[[], Awaitable[object]],
+):
+    key = _cache_key(request, versions)
+    cache = inventory_cache()
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data)
+    return data
+
+
+def _cache_key(request: HttpRequest, versions: tuple[int, int]) -> str:
+    url = f"{request.get_host()}{request.path}?{sorted(request.GET.lists())}"
+    return "inventory:response:{}:{}:{}".format(
+        *versions, hashlib.sha1(url.encode()).hexdigest()
+    )
+
+
+def not_modified(request: HttpRequest, etag: str) -> bool:
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    return etag in if_none_match or f"W/{etag}" in if_none_match
+
+
+def inventory_response(
+    request: HttpRequest, machine_id: UUID | None, build: Callable[[], object]
+) -> Response:
+    """Builds a cached inventory response, or a 304 if the client is up to date."""
+    return versioned_response(request, inventory_versions(machine_id), build)
+
+
+def catalog_response(request: HttpRequest, build: Callable[[], object]) -> Response:
+    """``inventory_response`` for the product catalog."""
+    return versioned_response(request, catalog_versions(), build)
+
+
+def versioned_response(
+    request: HttpRequest, versions: tuple[int, int], build: Callable[[], object]
+) -> Response:
+    etag = inventory_etag(versions)
+    if not_modified(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    data = cached_inventory(request, versions, build)
+    return Response(data=data, headers={"ETag": etag})
+
+
+async def ainventory_response(
+    request: HttpRequest,
+    machine_id: UUID | None,
+    build: Callable[[], Awaitable[object]],
+) -> HttpResponse:
+    """``inventory_response`` for async views, which cannot return DRF responses."""
+    return await aversioned_response(
+        request, await ainventory_versions(machine_id), build
+    )
+
+
+async def acatalog_response(
+    request: HttpRequest, build: Callable[[], Awaitable[object]]
+) -> HttpResponse:
+    return await aversioned_response(request, await acatalog_versions(), build)
+
+
+async def aversioned_response(
+    request: HttpRequest,
+    versions: tuple[int, int],
+    build: Callable[[], Awaitable[object]],
+) -> HttpResponse:
+    etag = inventory_etag(versions)
+    if not_modified(request, etag):
+        return HttpResponseNotModified(headers={"ETag": etag})
+
+    data = await acached_inventory(request, versions, build)
+    return json_response(data, headers={"ETag": etag})
+
+
+def json_response(data, **kwargs) -> HttpResponse:
+    """An ``HttpResponse`` with the exact bytes DRF's ``JSONRenderer`` produces."""
+    return HttpResponse(
+        JSONRenderer().render(data), content_type="application/json", **kwargs
+    )
@@ -0,0 +1,209 @@
+"""``Idempotency-Key`` support for the write endpoints.
+
+Clients that retry a POST send the same ``Idempotency-Key`` header with every
+attempt. The first response for a key is stored in the ``idempotency_key``
+table for ``VENDING_IDEMPOTENCY_TTL`` seconds, and retries get it back, with an
+``Idempotent-Replayed`` header, without the view running again. Keys are scoped
+to the buyer and the route, and bound to the parsed request data, so the same
+form or JSON body matches however it was encoded: reusing one for a different
+request is a bad request.
+
+A request claims its key by inserting the row, or by taking over an expired
+one, in a single statement, so of several duplicates only one runs, whichever
+worker they reach. Duplicates wait for its response for up
+to ``VENDING_IDEMPOTENCY_WAIT_SECONDS`` before getting a 409. A claim expires
+after ``VENDING_IDEMPOTENCY_LOCK_SECONDS``, so a worker that dies mid-request
+does not hold the key forever. Responses with a 5xx status and exceptions,
+validation errors included, are not stored: the claim is dropped and the next
+attempt runs the view.
+
+Expired rows may be claimed again, and each process deletes them at most once
+every ``VENDING_IDEMPOTENCY_PURGE_SECONDS``.
+"""
+
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+from typing import Callable
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseBadRequest, QueryDict
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.vending.authentication import request_buyer
+from apps.vending.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# Form field carrying the CSRF token, which is not part of the request itself.
+CSRF_FIELD = "csrfmiddlewaretoken"
+# How often a duplicate checks whether the request it waits for has finished.
+POLL_SECONDS = 0.02
+
+_last_purge = 0.0
+
+
+def idempotent(post: Callable) -> Callable:
+    """Makes a view method replay its response to retries of the same request.
+
+    Requests without the header, or without a buyer, run the view as usual.
+    """
+
+    @wraps(post)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return post(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return HttpResponseBadRequest(
+                content=f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters"
+            )
+        buyer = request_buyer(request)
+        if buyer is None:
+            return post(view, request, *args, **kwargs)
+
+        return run_idempotent(
+            f"{buyer.pk}:{request.path}:{key}",
+            request_fingerprint(request),
+            lambda: post(view, request, *args, **kwargs),
+        )
+
+    return wrapper
+
+
+def request_fingerprint(request) -> str:
+    """Hashes ``request.data`` as canonical JSON.
+
+    The raw body cannot be used: once the CSRF check has read a form,
+    ``request.body`` raises.
+    """
+    data = request.data
+    if isinstance(data, QueryDict):
+        data = {key: values for key, values in data.lists() if key != CSRF_FIELD}
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def run_idempotent(
+    scope: str, fingerprint: str, run: Callable[[], HttpResponse]
+) -> HttpResponse:
+    """Runs ``run`` once per ``scope`` and replays its response afterwards."""
+    key = hashlib.sha256(scope.encode()).hexdigest()
+    deadline = time.monotonic() + settings.VENDING_IDEMPOTENCY_WAIT_SECONDS
+    maybe_purge()
+    while True:
+        # Retries are the common case, so the key is read before it is claimed.
+        entry = (
+            IdempotencyKey.objects.filter(key=key, expires_at__gt=timezone.now())
+            .values_list("fingerprint", "response")
+            .first()
+        )
+        if entry is None:
+            if claim(key, fingerprint):
+                break
+            # Claimed by a duplicate in between: wait for it like the others.
+            continue
+        if entry[0] != fingerprint:
+            return HttpResponseBadRequest(
+                content=f"{IDEMPOTENCY_HEADER} was used for a different request"
+            )
+        if entry[1] is not None:
+            return replay(entry[1])
+        if time.monotonic() >= deadline:
+            return HttpResponse(
+                status=status.HTTP_409_CONFLICT,
+                content=f"a request with this {IDEMPOTENCY_HEADER} is in progress",
+            )
+        time.sleep(POLL_SECONDS)
+
+    try:
+        response = run()
+    except BaseException:
+        IdempotencyKey.objects.filter(key=key).delete()
+        raise
+    if response.status_code >= 500:
+        IdempotencyKey.objects.filter(key=key).delete()
+    else:
+        IdempotencyKey.objects.filter(key=key).update(
+            response=stored(response),
+            expires_at=timezone.now()
+            + timedelta(seconds=settings.VENDING_IDEMPOTENCY_TTL),
+        )
+    return response
+
+
+def claim(key: str, fingerprint: str) -> bool:
+    """Takes ``key`` for the calling request, if it is free or expired.
+
+    One upsert inserts the key or takes over an expired row, so of the requests
+    racing for a key exactly one sees a changed row, in whichever process.
+    """
+    meta = IdempotencyKey._meta
+    now = timezone.now()
+    row = IdempotencyKey(
+        key=key,
+        fingerprint=fingerprint,
+        expires_at=now + timedelta(seconds=settings.VENDING_IDEMPOTENCY_LOCK_SECONDS),
+    )
+    fields = [meta.get_field(name) for name in ["key", "fingerprint", "expires_at"]]
+    table = connection.ops.quote_name(meta.db_table)
+    key_column, fingerprint_column, expires_at_column = (
+        connection.ops.quote_name(field.column) for field in fields
+    )
+    response_column = connection.ops.quote_name(meta.get_field("response").column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({key_column}, {fingerprint_column},"
+            f" {expires_at_column}) VALUES (%s, %s, %s)"
+            f" ON CONFLICT ({key_column}) DO UPDATE SET"
+            f" {fingerprint_column} = excluded.{fingerprint_column},"
+            f" {response_column} = NULL,"
+            f" {expires_at_column} = excluded.{expires_at_column}"
+            f" WHERE {table}.{expires_at_column} <= %s",
+            [
+                *(
+                    field.get_db_prep_save(getattr(row, field.attname), connection)
+                    for field in fields
+                ),
+                meta.get_field("expires_at").get_db_prep_save(now, connection),
+            ],
+        )
+        return cursor.rowcount == 1
+
+
+def maybe_purge() -> None:
+    global _last_purge
+    if time.monotonic() - _last_purge >= settings.VENDING_IDEMPOTENCY_PURGE_SECONDS:
+        _last_purge = time.monotonic()
+        IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+
+
+def stored(response: HttpResponse) -> dict:
+    # DRF responses are stored unrendered and rendered again on replay, so
+    # they are negotiated like the original.
+    if isinstance(response, Response):
+        return {"status": response.status_code, "data": response.data}
+    return {
+        "status": response.status_code,
+        "content": response.content.decode(response.charset),
+        "content_type": response["Content-Type"],
+    }
+
+
+def replay(response: dict) -> HttpResponse:
+    if "data" in response:
+        replayed = Response(data=response["data"], status=response["status"])
+    else:
+        replayed = HttpResponse(
+            response["content"],
+            status=response["status"],
+            content_type=response["content_type"],
+        )
+    replayed[REPLAYED_HEADER] = "true"
+    return replayed
@@ -0,0 +1,157 @@
+"""Sales journal, written behind the order path.
+
+Orders hand their ``Sale`` rows to a writer thread once they commit, so the
+response never waits for the journal. The thread collects sales for up to
+``VENDING_SALES_JOURNAL_FLUSH_SECONDS`` and inserts them with one
+``bulk_create`` of up to ``VENDING_SALES_JOURNAL_BATCH_SIZE`` rows per
+transaction. Every commit takes SQLite's write lock from the orders, so fewer,
+larger ones keep their latency down. It does not go through the single-writer
+queue: that thread queues sales itself when it commits orders, and would wait
+on a full journal that waits on it. At most
+``VENDING_SALES_JOURNAL_MAX_PENDING`` sales wait in memory; beyond that orders
+wait for room rather than grow the queue. The queue is flushed when the process
+exits, and ``flush`` waits for everything queued so far. Sales put after the
+journal is closed are inserted right away.
+
+A batch that fails to insert is logged and retried, waiting twice as long after
+every failure up to ``RETRY_MAX_SECONDS``, and stays queued until it is written:
+the orders it records have committed already and are not undone. Only a
+journal that is closing gives up on it, after ``CLOSING_ATTEMPTS``.
+
+With ``VENDING_SALES_JOURNAL_SYNC`` sales are inserted in the order's own
+transaction instead, which tests rely on.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from itertools import count
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from apps.vending.models import Sale
+
+logger = logging.getLogger(__name__)
+
+# Queue markers that end the current batch early.
+FLUSH = object()
+STOP = object()
+# Backoff between the attempts to write a failed batch.
+RETRY_SECONDS = 0.1
+RETRY_MAX_SECONDS = 30
+CLOSING_ATTEMPTS = 3
+
+
+def write_sales(sales: list[Sale]) -> None:
+    with transaction.atomic():
+        Sale.objects.bulk_create(sales)
+
+
+class SalesJournal:
+    def __init__(self, batch_size: int, max_pending: int, flush_seconds: float):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._sales = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def put(self, sales: list[Sale]) -> None:
+        """Queues ``sales``, waiting for room if the queue is full."""
+        # Queued under the lock, so ``close`` cannot queue STOP ahead of them.
+        with self._lock:
+            if not self._closed:
+                self._start()
+                for sale in sales:
+                    self._sales.put(sale)
+                return
+        write_sales(sales)
+
+    def flush(self) -> None:
+        """Writes every sale queued so far and waits for it."""
+        with self._lock:
+            if self._thread is not None and not self._closed:
+                self._sales.put(FLUSH)
+        self._sales.join()
+
+    def close(self) -> None:
+        """Writes the queued sales and stops the thread."""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._sales.put(STOP)
+            thread.join()
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._work, name="vending-sales-journal", daemon=True
+            )
+            self._thread.start()
+
+    def _work(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._sales.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size and batch[-1] not in (FLUSH, STOP):
+                try:
+                    batch.append(
+                        self._sales.get(timeout=max(0, deadline - time.monotonic()))
+                    )
+                except queue.Empty:
+                    break
+
+            sales = [sale for sale in batch if sale not in (FLUSH, STOP)]
+            stopping = STOP in batch
+            if sales:
+                self._write(sales)
+            for _ in batch:
+                self._sales.task_done()
+        connection.close()
+
+    def _write(self, sales: list[Sale]) -> None:
+        delay = RETRY_SECONDS
+        for attempt in count(1):
+            close_old_connections()
+            try:
+                write_sales(sales)
+                return
+            except Exception:
+                logger.exception(
+                    "Could not journal %d sales (attempt %d)", len(sales), attempt
+                )
+            if self._closed and attempt >= CLOSING_ATTEMPTS:
+                logger.error("Gave up journaling %d sales on close", len(sales))
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX_SECONDS)
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def sales_journal() -> SalesJournal:
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = SalesJournal(
+                settings.VENDING_SALES_JOURNAL_BATCH_SIZE,
+                settings.VENDING_SALES_JOURNAL_MAX_PENDING,
+                settings.VENDING_SALES_JOURNAL_FLUSH_SECONDS,
+            )
+            atexit.register(_journal.close)
+    return _journal
+
+
+def record_sales(sales: list[Sale]) -> None:
+    """Journals ``sales`` once the current transaction commits."""
+    if settings.VENDING_SALES_JOURNAL_SYNC:
+        Sale.objects.bulk_create(sales)
+    else:
+        transaction.on_commit(lambda: sales_journal().put(sales))
@@ -0,0 +1,128 @@
+"""Append-only credit ledger.
+
+A buyer's balance is the compacted snapshot on the buyer row
+(``Buyer.credit_cents`` up to ``Buyer.ledger_position``) plus the sum of the
+``CreditEntry`` rows appended after it. Top-ups, orders and refunds only insert
+entries, so they never contend on the buyer row; ``compact_ledger`` folds the
+tail into the snapshots periodically (see the ``compact_credit_ledger``
+management command).
+
+Entries that lower the balance are inserted first and checked afterwards in the
+same transaction, which rolls back if the balance went negative. On SQLite the
+insert takes the write lock, so the check cannot race another writer.
+"""
+
+from decimal import Decimal
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from apps.vending import metrics
+from apps.vending.models import Buyer, CreditEntry
+
+CENT = Decimal("0.01")
+
+
+class NegativeBalance(Exception):
+    pass
+
+
+def to_cents(amount: Decimal) -> int:
+    return int(amount.quantize(CENT) * 100)
+
+
+def from_cents(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(CENT)
+
+
+def _tail_total(**filters) -> Subquery:
+    return Subquery(
+        CreditEntry.objects.filter(
+            buyer_id=OuterRef("pk"), id__gt=OuterRef("ledger_position"), **filters
+        )
+        .values("buyer_id")
+        .annotate(total=Sum("amount_cents"))
+        .values("total")
+    )
+
+
+def balance_expression():
+    """Balance in cents of the buyers in a queryset, for ``annotate``."""
+    return F("credit_cents") + Coalesce(_tail_total(), 0)
+
+
+def balance_cents(buyer_id: int) -> int:
+    return (
+        Buyer.objects.filter(pk=buyer_id)
+        .annotate(balance=balance_expression())
+        .values_list("balance", flat=True)
+        .get()
+    )
+
+
+def balance(buyer_id: int) -> Decimal:
+    return from_cents(balance_cents(buyer_id))
+
+
+def append_entry(buyer_id: int, amount_cents: int, kind: CreditEntry.Kind) -> int:
+    """Appends an entry and returns the new balance in cents.
+
+    Raises ``NegativeBalance``, and appends nothing, if the balance would drop
+    below zero.
+    """
+    with transaction.atomic():
+        CreditEntry.objects.create(
+            buyer_id=buyer_id, amount_cents=amount_cents, kind=kind
+        )
+        new_balance = balance_cents(buyer_id)
+        if new_balance < 0:
+            raise NegativeBalance()
+    return new_balance
+
+
+def add_credit(buyer_id: int, amount: Decimal) -> Decimal:
+    amount_cents = to_cents(amount)
+    new_balance = append_entry(buyer_id, amount_cents, CreditEntry.Kind.CREDIT)
+    if amount_cents > 0:
+        transaction.on_commit(partial(metrics.credit_added.inc, amount_cents))
+    return from_cents(new_balance)
+
+
+def refund(buyer_id: int) -> Decimal:
+    """Withdraws the whole balance and returns the new balance."""
+    with transaction.atomic():
+        # Insert first so the balance is read under the write lock.
+        entry = CreditEntry.objects.create(
+            buyer_id=buyer_id, amount_cents=0, kind=CreditEntry.Kind.REFUND
+        )
+        CreditEntry.objects.filter(pk=entry.pk).update(
+            amount_cents=-balance_cents(buyer_id)
+        )
+    transaction.on_commit(metrics.refunds.inc)
+    return from_cents(0)
+
+
+def compact_ledger() -> int:
+    """Folds every appended entry into the buyer snapshots.
+
+    Returns the number of buyers whose snapshot changed. Entries are kept, so
+    the ledger remains a complete history.
+    """
+    watermark = CreditEntry.objects.aggregate(Max("id"))["id__max"]
+    if watermark is None:
+        return 0
+
+    return Buyer.objects.filter(
+        Exists(
+            CreditEntry.objects.filter(
+                buyer_id=OuterRef("pk"),
+                id__gt=OuterRef("ledger_position"),
+                id__lte=watermark,
+            )
+        )
+    ).update(
+        credit_cents=F("credit_cents") + Coalesce(_tail_total(id__lte=watermark), 0),
+        ledger_position=watermark,
+    )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.vending.ledger import compact_ledger
+
+
+class Command(BaseCommand):
+    help = "Folds appended credit ledger entries into the buyer balance snapshots."
+
+    def handle(self, *args, **options):
+        compacted = compact_ledger()
+        self.stdout.write(f"Compacted the credit ledger of {compacted} buyers")
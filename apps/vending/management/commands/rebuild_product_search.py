@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.vending.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the product name search index from the product table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        rebuild_index(options["database"])
+        self.stdout.write("Rebuilt the product search index")
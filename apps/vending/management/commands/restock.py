@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.vending.restock import FORMATS, import_slots
+
+
+class Command(BaseCommand):
+    help = "Imports slot updates and creations from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='File to import, or "-" for stdin.')
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Defaults to the file extension, or csv for stdin.",
+        )
+
+    def handle(self, *args, path, format, **options):
+        format = format or Path(path).suffix.lstrip(".").lower() or "csv"
+        if format not in FORMATS:
+            raise CommandError(f"Unknown format {format!r}, use --format")
+
+        if path == "-":
+            report = import_slots(sys.stdin, format)
+        else:
+            with open(path, newline="", encoding="utf-8-sig") as lines:
+                report = import_slots(lines, format)
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(
+            f"Created {report.created} slots, updated {report.updated},"
+            f" {len(report.errors)} lines failed"
+        )
+        if report.unreadable is not None:
+            raise CommandError(f"Stopped at an unreadable line: {report.unreadable}")
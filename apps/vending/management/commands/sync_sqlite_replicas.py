@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.vending.routers import copy_primary
+
+
+class Command(BaseCommand):
+    help = "Copies the primary database over the SQLite read replicas."
+
+    def handle(self, *args, **options):
+        for alias in settings.VENDING_READ_REPLICAS:
+            copy_primary(alias)
+            self.stdout.write(f"Copied the primary database to {alias}")
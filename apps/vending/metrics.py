@@ -0,0 +1,303 @@
+"""Request, SQL and sales metrics in the Prometheus text format.
+
+Metrics are kept in memory by every process and served by ``/metrics``. With
+several workers, set ``VENDING_METRICS_DIR`` to a directory they share: every
+process then writes a snapshot of its metrics there at most once per
+``VENDING_METRICS_FLUSH_SECONDS`` (and right before serving ``/metrics``), and
+``/metrics`` adds up the snapshots of all processes, including those that have
+exited, so counters never go backwards.
+
+Snapshots are named after the pid and the start time of their process, so a
+process that reuses the pid of an exited one does not overwrite its counters.
+Where the processes of the host can be listed (``/proc``), ``/metrics`` folds
+the snapshots of exited processes into ``metrics-exited.json`` and removes
+them, along with temporary files left by interrupted writes, so the directory
+does not grow with every restart.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EXITED_SNAPSHOT = "metrics-exited.json"
+# Temporary snapshots older than this were left by a process that died writing.
+STALE_TEMPORARY_SECONDS = 60
+
+_lock = threading.Lock()
+_registry = {}
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry[name] = self
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self, values: dict):
+        for key, value in values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: the count of each bucket (not cumulative), then the
+        # count above the last bucket, then the sum.
+        self.values = {}
+        _registry[name] = self
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            if (counts := self.values.get(key)) is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self, values: dict):
+        for key, counts in values.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else _format_value(bound)
+                yield f"{self.name}_bucket", {**labels, "le": le}, cumulative
+            yield f"{self.name}_count", labels, cumulative
+            yield f"{self.name}_sum", labels, counts[-1]
+
+    @staticmethod
+    def merge(total, counts):
+        if total is None:
+            return list(counts)
+        return [a + b for a, b in zip(total, counts)]
+
+
+http_requests = Counter(
+    "vending_http_requests_total",
+    "HTTP requests by route and status code.",
+    ["method", "route", "status"],
+)
+http_request_duration = Histogram(
+    "vending_http_request_duration_seconds",
+    "Time to build the response, by route.",
+    ["method", "route"],
+)
+db_queries = Counter(
+    "vending_db_queries_total",
+    "SQL queries run by requests, by route.",
+    ["method", "route"],
+)
+db_query_duration = Counter(
+    "vending_db_query_duration_seconds_total",
+    "Time spent running the SQL queries of requests, by route.",
+    ["method", "route"],
+)
+orders = Counter("vending_orders_total", "Committed orders, including carts.")
+units_sold = Counter("vending_units_sold_total", "Units sold by committed orders.")
+credit_added = Counter(
+    "vending_credit_added_cents_total", "Credit added by buyers, in cents."
+)
+refunds = Counter("vending_refunds_total", "Committed refunds.")
+requests_shed = Counter(
+    "vending_requests_shed_total",
+    "Requests rejected by admission control, by configured path and limit.",
+    ["path", "limit"],
+)
+
+
+def record_request(method: str, route: str, status: int, seconds: float, counter):
+    http_requests.inc(method=method, route=route, status=str(status))
+    http_request_duration.observe(seconds, method=method, route=route)
+    if counter is not None:
+        db_queries.inc(counter.count, method=method, route=route)
+        db_query_duration.inc(counter.seconds, method=method, route=route)
+    maybe_flush()
+
+
+def record_order(units: int) -> None:
+    orders.inc()
+    units_sold.inc(units)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            name: [[list(key), value] for key, value in metric.values.items()]
+            for name, metric in _registry.items()
+        }
+
+
+_last_flush = 0.0
+_process = None
+
+
+def maybe_flush() -> None:
+    if (
+        settings.VENDING_METRICS_DIR
+        and time.monotonic() - _last_flush >= settings.VENDING_METRICS_FLUSH_SECONDS
+    ):
+        flush()
+
+
+def flush() -> None:
+    """Writes this process's snapshot to ``VENDING_METRICS_DIR``."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    directory = Path(settings.VENDING_METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    write_snapshot(directory / f"metrics-{process_key()}.json", snapshot())
+
+
+def write_snapshot(path: Path, values: dict) -> None:
+    temporary = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    temporary.write_text(json.dumps(values))
+    os.replace(temporary, path)
+
+
+def process_key() -> str:
+    """``<pid>-<start time>`` of this process, unique even when pids are reused."""
+    global _process
+    pid = os.getpid()
+    if _process is None or _process[0] != pid:
+        # Forked children get their own key too.
+        _process = (pid, process_start(pid) or str(time.time_ns()))
+    return f"{_process[0]}-{_process[1]}"
+
+
+def process_start(pid: int) -> str | None:
+    """The start time of process ``pid`` in clock ticks, if it is running."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return None
+    # Field 22; the command name before it may contain spaces and parentheses.
+    return stat.rsplit(")", 1)[1].split()[19]
+
+
+def collect() -> dict:
+    """Returns the values of every metric, added up across processes."""
+    if not settings.VENDING_METRICS_DIR:
+        with _lock:
+            return {name: dict(metric.values) for name, metric in _registry.items()}
+
+    flush()
+    directory = Path(settings.VENDING_METRICS_DIR)
+    fold_exited(directory)
+    totals = {name: {} for name in _registry}
+    for path in directory.glob("metrics-*.json"):
+        merge_snapshot(totals, read_snapshot(path))
+    return totals
+
+
+def fold_exited(directory: Path) -> None:
+    """Merges the snapshots of exited processes into ``EXITED_SNAPSHOT``."""
+    if fcntl is None or process_start(os.getpid()) is None:
+        # Without /proc running processes cannot be told from exited ones.
+        return
+    with open(directory / "metrics.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        exited = []
+        for path in directory.glob("metrics-*-*.json"):
+            pid, _, start = path.stem.removeprefix("metrics-").partition("-")
+            if pid.isdigit() and process_start(int(pid)) != start:
+                exited.append(path)
+        if exited:
+            totals = {}
+            for path in [directory / EXITED_SNAPSHOT, *exited]:
+                merge_snapshot(totals, read_snapshot(path))
+            write_snapshot(
+                directory / EXITED_SNAPSHOT,
+                {
+                    name: [[list(key), value] for key, value in values.items()]
+                    for name, values in totals.items()
+                },
+            )
+            for path in exited:
+                path.unlink(missing_ok=True)
+
+        stale = time.time() - STALE_TEMPORARY_SECONDS
+        for path in directory.glob("metrics-*.tmp"):
+            try:
+                if path.stat().st_mtime < stale:
+                    path.unlink()
+            except OSError:
+                pass
+
+
+def read_snapshot(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def merge_snapshot(totals: dict, snapshot: dict) -> None:
+    """Adds the values of a snapshot to ``totals``, by metric and label set."""
+    for name, values in snapshot.items():
+        if (metric := _registry.get(name)) is None:
+            continue
+        merged = totals.setdefault(name, {})
+        for key, value in values:
+            key = tuple(key)
+            merged[key] = metric.merge(merged.get(key), value)
+
+
+def render() -> str:
+    lines = []
+    for name, values in collect().items():
+        metric = _registry[name]
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        if not values and not metric.labelnames:
+            values = {(): 0}
+        for sample, labels, value in metric.samples(values):
+            lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
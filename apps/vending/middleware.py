@@ -0,0 +1,276 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from apps.vending import admission, metrics
+from apps.vending.routers import replica_reads, wrote_to_primary
+
+logger = logging.getLogger(__name__)
+
+# The counter of the request being handled. Context variables follow the
+# request into the threads the async ORM runs queries in, so concurrent
+# requests never count each other's queries.
+request_queries = ContextVar("request_queries", default=None)
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` that counts queries without logging them."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def count_request_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection, see ``apps.vending.signals``."""
+    if (counter := request_queries.get()) is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.count += 1
+        counter.seconds += time.perf_counter() - start
+
+
+class QueryCountMiddleware:
+    """Counts the database queries run by each request.
+
+    The count is logged per endpoint at DEBUG level and, when
+    ``VENDING_QUERY_COUNT_HEADER`` is set, returned in an ``X-Query-Count``
+    header so tests and load tests can catch regressions. Streaming responses
+    only report the queries run before the body starts. Nothing is counted
+    when neither output is enabled.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled():
+            return self.get_response(request)
+        if (counter := request_queries.get()) is not None:
+            # Already counted by MetricsMiddleware.
+            return self.report(request, self.get_response(request), counter)
+
+        counter = QueryCounter()
+        token = request_queries.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_queries.reset(token)
+        return self.report(request, response, counter)
+
+    async def __acall__(self, request):
+        if not self.enabled():
+            return await self.get_response(request)
+        if (counter := request_queries.get()) is not None:
+            return self.report(request, await self.get_response(request), counter)
+
+        counter = QueryCounter()
+        token = request_queries.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_queries.reset(token)
+        return self.report(request, response, counter)
+
+    def enabled(self) -> bool:
+        return settings.VENDING_QUERY_COUNT_HEADER or logger.isEnabledFor(logging.DEBUG)
+
+    def report(self, request, response, counter: QueryCounter):
+        match = request.resolver_match
+        logger.debug(
+            "%s %s ran %d queries",
+            request.method,
+            match.route if match else request.path,
+            counter.count,
+        )
+        if settings.VENDING_QUERY_COUNT_HEADER:
+            response["X-Query-Count"] = str(counter.count)
+        return response
+
+
+class AdmissionMiddleware:
+    """Rate limits requests and sheds writes under overload, see ``admission``.
+
+    Goes after ``MetricsMiddleware``, so rejected requests are recorded with
+    their status, and before sessions and authentication, which they skip.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if (response := admission.admit(request)) is not None:
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            admission.finish(request)
+
+    async def __acall__(self, request):
+        if (response := admission.admit(request)) is not None:
+            return response
+        try:
+            return await self.get_response(request)
+        finally:
+            admission.finish(request)
+
+
+class ReplicaMiddleware:
+    """Sends the reads of read-only endpoints to the replicas, see ``routers``."""
+
+    cookie_name = "vending_primary_until"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        tokens = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = self.finish(tokens)
+        return self.pin(request, response, wrote)
+
+    async def __acall__(self, request):
+        tokens = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = self.finish(tokens)
+        return self.pin(request, response, wrote)
+
+    def start(self, request):
+        return (
+            replica_reads.set(self.replica(request)),
+            wrote_to_primary.set(False),
+        )
+
+    def finish(self, tokens) -> bool:
+        wrote = wrote_to_primary.get()
+        replica_reads.reset(tokens[0])
+        wrote_to_primary.reset(tokens[1])
+        return wrote
+
+    def replica(self, request) -> str | None:
+        """Picks the replica ``request`` reads from, or None for the primary."""
+        if replicas := settings.VENDING_READ_REPLICAS:
+            if self.reads_from_replica(request):
+                return random.choice(replicas)
+        return None
+
+    def reads_from_replica(self, request) -> bool:
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            return False
+        try:
+            if float(request.COOKIES.get(self.cookie_name, 0)) > time.time():
+                return False
+        except ValueError:
+            pass
+        try:
+            view = resolve(request.path_info).func
+        except Resolver404:
+            return False
+        return getattr(getattr(view, "view_class", view), "read_replica", False)
+
+    def pin(self, request, response, wrote: bool):
+        # Writes handed to the single-writer queue happen in another thread, so
+        # unsafe methods always pin.
+        if wrote or request.method not in ("GET", "HEAD", "OPTIONS"):
+            pin_seconds = settings.VENDING_REPLICA_PIN_SECONDS
+            response.set_cookie(
+                self.cookie_name,
+                str(time.time() + pin_seconds),
+                max_age=pin_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """Records the latency, status code and SQL queries of every request.
+
+    See ``apps.vending.metrics``. Requests that match no route are recorded
+    under the ``unmatched`` route, so scanners cannot add label values.
+    Streaming responses are timed until the body starts.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.VENDING_METRICS:
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        token = request_queries.set(counter)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_queries.reset(token)
+        return self.record(request, response, time.perf_counter() - start, counter)
+
+    async def __acall__(self, request):
+        if not settings.VENDING_METRICS:
+            return await self.get_response(request)
+
+        counter = QueryCounter()
+        token = request_queries.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_queries.reset(token)
+        return self.record(request, response, time.perf_counter() - start, counter)
+
+    def record(self, request, response, seconds: float, counter: QueryCounter):
+        match = request.resolver_match
+        metrics.record_request(
+            request.method,
+            match.route if match else "unmatched",
+            response.status_code,
+            seconds,
+            counter,
+        )
+        return response
@@ -0,0 +1,96 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:05
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def assign_default_machine(apps, schema_editor):
+    VendingMachine = apps.get_model("vending", "VendingMachine")
+    VendingMachineSlot = apps.get_model("vending", "VendingMachineSlot")
+    if VendingMachineSlot.objects.exists():
+        machine = VendingMachine.objects.create(name="Default machine")
+        VendingMachineSlot.objects.update(machine=machine)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0006_remove_buyer_email"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VendingMachine",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("name", models.CharField(max_length=200)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "vending_machine",
+            },
+        ),
+        migrations.AlterField(
+            model_name="vendingmachineslot",
+            name="column",
+            field=models.IntegerField(
+                validators=[
+                    django.core.validators.MaxValueValidator(10),
+                    django.core.validators.MinValueValidator(0),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="vendingmachineslot",
+            name="row",
+            field=models.IntegerField(
+                validators=[
+                    django.core.validators.MaxValueValidator(10),
+                    django.core.validators.MinValueValidator(0),
+                ]
+            ),
+        ),
+        migrations.AddField(
+            model_name="vendingmachineslot",
+            name="machine",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="slots",
+                to="vending.vendingmachine",
+            ),
+        ),
+        migrations.RunPython(assign_default_machine, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="vendingmachineslot",
+            name="machine",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="slots",
+                to="vending.vendingmachine",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vendingmachineslot",
+            index=models.Index(
+                fields=["machine", "row", "column"], name="slot_machine_position_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vendingmachineslot",
+            index=models.Index(
+                fields=["machine", "quantity"], name="slot_machine_quantity_idx"
+            ),
+        ),
+    ]
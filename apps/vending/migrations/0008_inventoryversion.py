@@ -0,0 +1,25 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0007_vendingmachine"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryVersion",
+            fields=[
+                (
+                    "scope",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "inventory_version",
+            },
+        ),
+    ]
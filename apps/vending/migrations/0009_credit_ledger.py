@@ -0,0 +1,109 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:18
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Max, Sum
+import django.core.validators
+import django.db.models.deletion
+
+
+def credit_to_cents(apps, schema_editor):
+    Buyer = apps.get_model("vending", "Buyer")
+    for buyer in Buyer.objects.all():
+        buyer.credit_cents = round(buyer.credit * 100)
+        buyer.save(update_fields=["credit_cents"])
+
+
+def cents_to_credit(apps, schema_editor):
+    # The ledger is folded into the snapshot by fold_ledger first.
+    Buyer = apps.get_model("vending", "Buyer")
+    for buyer in Buyer.objects.all():
+        buyer.credit = Decimal(buyer.credit_cents) / 100
+        buyer.save(update_fields=["credit"])
+
+
+def fold_ledger(apps, schema_editor):
+    # Runs before the ledger is dropped when migrating backwards, so entries
+    # appended since the last compaction are not lost, as in compact_ledger.
+    Buyer = apps.get_model("vending", "Buyer")
+    CreditEntry = apps.get_model("vending", "CreditEntry")
+    for buyer in Buyer.objects.all():
+        tail = CreditEntry.objects.filter(
+            buyer=buyer, id__gt=buyer.ledger_position
+        ).aggregate(total=Sum("amount_cents"), last=Max("id"))
+        if tail["last"] is not None:
+            buyer.credit_cents += tail["total"]
+            buyer.ledger_position = tail["last"]
+            buyer.save(update_fields=["credit_cents", "ledger_position"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0008_inventoryversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="buyer",
+            name="credit_cents",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="buyer",
+            name="ledger_position",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(credit_to_cents, cents_to_credit),
+        # Gives credit a default so migrating backwards can add it back to
+        # existing buyers before cents_to_credit fills it in.
+        migrations.AlterField(
+            model_name="buyer",
+            name="credit",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal("0.00"),
+                max_digits=4,
+                validators=[django.core.validators.MinValueValidator(Decimal("0.00"))],
+            ),
+        ),
+        migrations.RemoveField(
+            model_name="buyer",
+            name="credit",
+        ),
+        migrations.CreateModel(
+            name="CreditEntry",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("amount_cents", models.BigIntegerField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("credit", "Credit"),
+                            ("order", "Order"),
+                            ("refund", "Refund"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "buyer",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="credit_entries",
+                        to="vending.buyer",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "credit_entry",
+                "indexes": [
+                    models.Index(fields=["buyer", "id"], name="credit_entry_buyer_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(migrations.RunPython.noop, fold_ledger),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:07
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0009_credit_ledger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                django.db.models.functions.comparison.Collate("name", "NOCASE"),
+                name="product_name_nocase_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["-created_at"], name="product_created_idx"),
+        ),
+    ]
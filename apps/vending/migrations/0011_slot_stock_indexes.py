@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0010_product_admin_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="vendingmachineslot",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["row", "column", "id"],
+                name="slot_in_stock_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vendingmachineslot",
+            index=models.Index(fields=["quantity"], name="slot_quantity_idx"),
+        ),
+    ]
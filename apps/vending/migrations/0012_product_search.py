@@ -0,0 +1,53 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:30
+
+from django.db import migrations
+
+# An external content FTS5 index over product.name, keyed by the product rowid.
+# The triggers keep it in sync with every write to the table, including bulk
+# creates and queryset updates, which send no model signals.
+CREATE_SEARCH = [
+    """
+    CREATE VIRTUAL TABLE product_search USING fts5(
+        name,
+        content='product',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER product_search_insert AFTER INSERT ON product BEGIN
+        INSERT INTO product_search(rowid, name) VALUES (new.rowid, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_delete AFTER DELETE ON product BEGIN
+        INSERT INTO product_search(product_search, rowid, name)
+        VALUES ('delete', old.rowid, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_update AFTER UPDATE OF name ON product BEGIN
+        INSERT INTO product_search(product_search, rowid, name)
+        VALUES ('delete', old.rowid, old.name);
+        INSERT INTO product_search(rowid, name) VALUES (new.rowid, new.name);
+    END
+    """,
+    "INSERT INTO product_search(product_search) VALUES ('rebuild')",
+]
+DROP_SEARCH = [
+    "DROP TRIGGER product_search_update",
+    "DROP TRIGGER product_search_delete",
+    "DROP TRIGGER product_search_insert",
+    "DROP TABLE product_search",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0011_slot_stock_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEARCH, DROP_SEARCH),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0012_product_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Sale",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("order_id", models.UUIDField()),
+                ("sold_at", models.DateTimeField()),
+                ("quantity", models.IntegerField()),
+                ("unit_price_cents", models.BigIntegerField()),
+                (
+                    "buyer",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="vending.buyer",
+                    ),
+                ),
+                (
+                    "machine",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="vending.vendingmachine",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="vending.product",
+                    ),
+                ),
+                (
+                    "slot",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="vending.vendingmachineslot",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "sale",
+                "indexes": [models.Index(fields=["sold_at"], name="sale_sold_at_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0013_sale"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="vendingmachineslot",
+            name="slot_machine_quantity_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="vendingmachineslot",
+            name="slot_quantity_idx",
+        ),
+        migrations.AlterField(
+            model_name="vendingmachineslot",
+            name="product",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="vending.product",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vendingmachineslot",
+            index=models.Index(
+                fields=["machine", "quantity", "row", "column", "id"],
+                name="slot_machine_stock_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vendingmachineslot",
+            index=models.Index(
+                fields=["quantity", "row", "column", "id"], name="slot_low_stock_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vendingmachineslot",
+            index=models.Index(
+                fields=["product", "quantity", "row", "column", "id"],
+                name="slot_product_stock_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:50
+
+import rest_framework.utils.encoders
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0014_slot_low_stock_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyKey",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("fingerprint", models.CharField(max_length=64)),
+                (
+                    "response",
+                    models.JSONField(
+                        encoder=rest_framework.utils.encoders.JSONEncoder,
+                        null=True,
+                    ),
+                ),
+                ("expires_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "idempotency_key",
+                "indexes": [
+                    models.Index(
+                        fields=["expires_at"], name="idempotency_expires_at_idx"
+                    )
+                ],
+            },
+        ),
+    ]
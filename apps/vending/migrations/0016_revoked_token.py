@@ -0,0 +1,30 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0015_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RevokedToken",
+            fields=[
+                (
+                    "token_id",
+                    models.CharField(max_length=32, primary_key=True, serialize=False),
+                ),
+                ("expires_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "revoked_token",
+                "indexes": [
+                    models.Index(
+                        fields=["expires_at"], name="revoked_token_expires_at_idx"
+                    )
+                ],
+            },
+        ),
+    ]
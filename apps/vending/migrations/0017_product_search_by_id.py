@@ -0,0 +1,57 @@
+# Generated by Django 4.2.2 on 2026-10-19 09:12
+
+from importlib import import_module
+
+from django.db import migrations
+
+previous = import_module("apps.vending.migrations.0012_product_search")
+
+# The FTS5 index keeps its own copy of product names with the product id in an
+# unindexed column, instead of reading product by rowid. Django rebuilds the
+# product table on most AlterFields, which renumbers its rowids, as VACUUM may.
+# The rebuild also drops the triggers; the readiness probe reports that, and
+# manage.py rebuild_product_search creates them again.
+CREATE_SEARCH = [
+    """
+    CREATE VIRTUAL TABLE product_search USING fts5(
+        name,
+        product_id UNINDEXED,
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER product_search_insert AFTER INSERT ON product BEGIN
+        INSERT INTO product_search(name, product_id) VALUES (new.name, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_delete AFTER DELETE ON product BEGIN
+        DELETE FROM product_search WHERE product_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_update AFTER UPDATE OF name ON product BEGIN
+        UPDATE product_search SET name = new.name WHERE product_id = old.id;
+    END
+    """,
+    "INSERT INTO product_search(name, product_id) SELECT name, id FROM product",
+]
+DROP_SEARCH = [
+    "DROP TRIGGER IF EXISTS product_search_update",
+    "DROP TRIGGER IF EXISTS product_search_delete",
+    "DROP TRIGGER IF EXISTS product_search_insert",
+    "DROP TABLE product_search",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vending", "0016_revoked_token"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            DROP_SEARCH + CREATE_SEARCH, DROP_SEARCH + previous.CREATE_SEARCH
+        ),
+    ]
@@ -4,6 +4,8 @@ from uuid import uuid4
 
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models.functions import Collate
+from rest_framework.utils.encoders import JSONEncoder
 
 
 from django.contrib.auth.models import User
@@ -11,14 +13,59 @@ from django.contrib.auth.models import User
 
 class Buyer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    credit = models.DecimalField(
-        max_digits=4, decimal_places=2, validators=[MinValueValidator(Decimal("0.00"))]
+    # Compacted snapshot of the credit ledger: the balance in cents of every
+    # CreditEntry up to ledger_position. See apps.vending.ledger.
+    credit_cents = models.BigIntegerField(default=0, editable=False)
+    ledger_position = models.BigIntegerField(default=0, editable=False)
+
+    @property
+    def credit(self) -> Decimal:
+        from apps.vending.ledger import balance
+
+        return balance(self.pk)
+
+    @credit.setter
+    def credit(self, value):
+        if not self._state.adding:
+            raise AttributeError(
+                "credit of a saved buyer can only change through apps.vending.ledger"
+            )
+        self.credit_cents = round(Decimal(value) * 100)
+
+
+class CreditEntry(models.Model):
+    """Append-only change to a buyer's credit, in cents."""
+
+    class Kind(models.TextChoices):
+        CREDIT = "credit"
+        ORDER = "order"
+        REFUND = "refund"
+
+    class Meta:
+        db_table = "credit_entry"
+        indexes = [
+            models.Index(fields=["buyer", "id"], name="credit_entry_buyer_idx"),
+        ]
+
+    id = models.BigAutoField(primary_key=True)
+    # Covered by credit_entry_buyer_idx.
+    buyer = models.ForeignKey(
+        "Buyer", on_delete=models.CASCADE, related_name="credit_entries", db_index=False
     )
+    amount_cents = models.BigIntegerField()
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
 
 
 class Product(models.Model):
     class Meta:
         db_table = "product"
+        indexes = [
+            # Serves the case-insensitive prefix searches of the admin, which
+            # SQLite runs as LIKE 'term%'.
+            models.Index(Collate("name", "NOCASE"), name="product_name_nocase_idx"),
+            models.Index(fields=["-created_at"], name="product_created_idx"),
+        ]
 
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     name = models.CharField(max_length=200)
@@ -32,16 +79,159 @@ class Product(models.Model):
         return self.name + " $" + str(self.price)
 
 
+class VendingMachine(models.Model):
+    class Meta:
+        db_table = "vending_machine"
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    name = models.CharField(max_length=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+# Units a slot holds when full.
+SLOT_CAPACITY = 100
+
+
 class VendingMachineSlot(models.Model):
     class Meta:
         db_table = "vending_machine_slot"
+        indexes = [
+            models.Index(
+                fields=["machine", "row", "column"], name="slot_machine_position_idx"
+            ),
+            models.Index(
+                fields=["machine", "quantity", "row", "column", "id"],
+                name="slot_machine_stock_idx",
+            ),
+            # Fleet-wide listings: in-stock slots in listing order. Empty slots
+            # are kept with a quantity of 0, so they stay out of the index.
+            models.Index(
+                fields=["row", "column", "id"],
+                condition=models.Q(quantity__gt=0),
+                name="slot_in_stock_idx",
+            ),
+            # Slots from the emptiest up, in the order /slots/low-stock lists
+            # them, so its first k entries are the answer and quantity ranges
+            # are a scan. Every write to a slot keeps them up to date.
+            models.Index(
+                fields=["quantity", "row", "column", "id"], name="slot_low_stock_idx"
+            ),
+            models.Index(
+                fields=["product", "quantity", "row", "column", "id"],
+                name="slot_product_stock_idx",
+            ),
+        ]
 
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
-    product = models.ForeignKey("Product", on_delete=models.CASCADE)
+    # Covered by the slot_machine_* indexes above, which lead with the machine.
+    machine = models.ForeignKey(
+        "VendingMachine",
+        on_delete=models.CASCADE,
+        related_name="slots",
+        db_index=False,
+    )
+    # Covered by slot_product_stock_idx.
+    product = models.ForeignKey("Product", on_delete=models.CASCADE, db_index=False)
     quantity = models.IntegerField(
-        validators=[MaxValueValidator(100), MinValueValidator(0)]
+        validators=[MaxValueValidator(SLOT_CAPACITY), MinValueValidator(0)]
     )
     row = models.IntegerField(validators=[MaxValueValidator(10), MinValueValidator(0)])
     column = models.IntegerField(
         validators=[MaxValueValidator(10), MinValueValidator(0)]
     )
+
+
+class InventoryVersion(models.Model):
+    """Monotonic version of one inventory scope.
+
+    Scopes are the product catalog, the whole fleet and each machine (see
+    ``apps.vending.versions``). Rows are bumped in the same transaction as the
+    change they version and are never deleted.
+    """
+
+    class Meta:
+        db_table = "inventory_version"
+
+    scope = models.CharField(primary_key=True, max_length=64)
+    value = models.BigIntegerField(default=0)
+
+
+class Sale(models.Model):
+    """Append-only journal of order lines, one row per slot sold from.
+
+    Written behind the order path (see ``apps.vending.journal``), so rows
+    reference the buyer, slot, machine and product without foreign key
+    constraints: deleting any of them later must not block or lose the record.
+    """
+
+    class Meta:
+        db_table = "sale"
+        indexes = [
+            models.Index(fields=["sold_at"], name="sale_sold_at_idx"),
+        ]
+
+    id = models.BigAutoField(primary_key=True)
+    # Shared by the lines of one order.
+    order_id = models.UUIDField()
+    sold_at = models.DateTimeField()
+    buyer = models.ForeignKey(
+        "Buyer", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False
+    )
+    machine = models.ForeignKey(
+        "VendingMachine",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+    )
+    slot = models.ForeignKey(
+        "VendingMachineSlot",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+    )
+    product = models.ForeignKey(
+        "Product", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False
+    )
+    quantity = models.IntegerField()
+    unit_price_cents = models.BigIntegerField()
+
+
+class IdempotencyKey(models.Model):
+    """The response to a request sent with an ``Idempotency-Key``.
+
+    A row without a response claims its key for the request in flight (see
+    ``apps.vending.idempotency``). Rows past ``expires_at`` may be claimed
+    again and are purged.
+    """
+
+    class Meta:
+        db_table = "idempotency_key"
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_expires_at_idx"),
+        ]
+
+    # SHA-256 of the buyer, route and header value.
+    key = models.CharField(primary_key=True, max_length=64)
+    fingerprint = models.CharField(max_length=64)
+    response = models.JSONField(null=True, encoder=JSONEncoder)
+    expires_at = models.DateTimeField()
+
+
+class RevokedToken(models.Model):
+    """An auth token revoked before it expired (see ``apps.vending.authentication``).
+
+    Rows are kept until ``expires_at``, once the token is past its maximum age
+    anyway, and purged after that.
+    """
+
+    class Meta:
+        db_table = "revoked_token"
+        indexes = [
+            models.Index(fields=["expires_at"], name="revoked_token_expires_at_idx"),
+        ]
+
+    token_id = models.CharField(primary_key=True, max_length=32)
+    expires_at = models.DateTimeField()
@@ -0,0 +1,121 @@
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+from uuid import UUID, uuid4
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from apps.vending import metrics
+from apps.vending.journal import record_sales
+from apps.vending.ledger import NegativeBalance, append_entry, from_cents, to_cents
+from apps.vending.models import Buyer, CreditEntry, Sale, VendingMachineSlot
+from apps.vending.versions import bump_slots
+
+
+class OrderError(Exception):
+    pass
+
+
+class SlotNotFound(OrderError):
+    def __init__(self):
+        super().__init__("Slot not found")
+
+
+class OutOfStock(OrderError):
+    def __init__(self):
+        super().__init__("Not enough products in slot")
+
+
+class InsufficientCredit(OrderError):
+    def __init__(self):
+        super().__init__("Money not enough to buy products")
+
+
+def place_order(
+    buyer: Buyer, slot_id: UUID, quantity: int, machine_id: UUID | None = None
+) -> Decimal:
+    return place_cart_order(buyer, [(slot_id, quantity)], machine_id=machine_id)
+
+
+def place_cart_order(
+    buyer: Buyer, lines: list[tuple[UUID, int]], machine_id: UUID | None = None
+) -> Decimal:
+    """Sells every ``(slot_id, quantity)`` line and debits the buyer once.
+
+    Stock is taken with a conditional UPDATE, so the check and the write happen
+    in the same statement and concurrent orders cannot oversell. The buyer is
+    debited with a ledger entry that is rolled back if it would overdraw (see
+    ``apps.vending.ledger``). All lines are applied in a single UPDATE and the
+    whole cart is rolled back if any of them fails. When ``machine_id`` is
+    given, every slot must belong to that machine. The transaction starts with
+    a write, which keeps it short and avoids SQLite lock upgrades from a read to
+    a write; the prices are read after it, so no restock can change them
+    between the debit and the sale.
+    """
+    quantities = defaultdict(int)
+    for slot_id, quantity in lines:
+        quantities[slot_id] += quantity
+    slot_filters = {"id__in": quantities}
+    if machine_id is not None:
+        slot_filters["machine_id"] = machine_id
+
+    ordered = Case(
+        *[
+            When(id=slot_id, then=Value(quantity))
+            for slot_id, quantity in quantities.items()
+        ],
+        output_field=IntegerField(),
+    )
+    with transaction.atomic():
+        sold = VendingMachineSlot.objects.filter(
+            **slot_filters, quantity__gte=ordered
+        ).update(quantity=F("quantity") - ordered)
+        if sold != len(quantities):
+            if VendingMachineSlot.objects.filter(**slot_filters).count() != len(
+                quantities
+            ):
+                raise SlotNotFound()
+            raise OutOfStock()
+
+        slots = {
+            slot_id: (price, slot_machine_id, product_id)
+            for slot_id, price, slot_machine_id, product_id in (
+                VendingMachineSlot.objects.filter(id__in=quantities).values_list(
+                    "id", "product__price", "machine_id", "product_id"
+                )
+            )
+        }
+        total_cents = sum(
+            to_cents(slots[slot_id][0]) * quantity
+            for slot_id, quantity in quantities.items()
+        )
+        try:
+            balance_cents = append_entry(buyer.pk, -total_cents, CreditEntry.Kind.ORDER)
+        except NegativeBalance:
+            raise InsufficientCredit()
+
+        bump_slots(slot[1] for slot in slots.values())
+        record_sales(order_sales(buyer, slots, quantities))
+        transaction.on_commit(partial(metrics.record_order, sum(quantities.values())))
+
+    return from_cents(balance_cents)
+
+
+def order_sales(buyer: Buyer, slots: dict, quantities: dict) -> list[Sale]:
+    order_id = uuid4()
+    sold_at = timezone.now()
+    return [
+        Sale(
+            order_id=order_id,
+            sold_at=sold_at,
+            buyer_id=buyer.pk,
+            machine_id=slots[slot_id][1],
+            slot_id=slot_id,
+            product_id=slots[slot_id][2],
+            quantity=quantity,
+            unit_price_cents=to_cents(slots[slot_id][0]),
+        )
+        for slot_id, quantity in quantities.items()
+    ]
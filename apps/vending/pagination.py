@@ -0,0 +1,94 @@
+import base64
+import binascii
+import json
+from typing import AsyncIterator
+from uuid import UUID
+
+from django.db.models import Q, QuerySet
+
+# Slots are paginated by keyset on their grid position. The id breaks ties
+# between slots stored at the same position so the ordering is total.
+SLOT_ORDERING = ("row", "column", "id")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row: int, column: int, id: UUID) -> str:
+    payload = json.dumps([row, column, str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[int, int, UUID]:
+    try:
+        row, column, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(row), int(column), UUID(id)
+    except (binascii.Error, TypeError, ValueError) as error:
+        raise InvalidCursor("Invalid cursor") from error
+
+
+def slots_after(slots: QuerySet, cursor: tuple[int, int, UUID]) -> QuerySet:
+    row, column, id = cursor
+    return slots.filter(
+        Q(row__gt=row)
+        | Q(row=row, column__gt=column)
+        | Q(row=row, column=column, id__gt=id)
+    )
+
+
+def paginate_slots(
+    slots: QuerySet, cursor: tuple[int, int, UUID] | None, limit: int
+) -> tuple[list[tuple], str | None]:
+    """Returns one page of ``slots`` value rows and the cursor of the next page.
+
+    ``slots`` must be a ``values_list`` queryset ordered by ``SLOT_ORDERING``
+    whose rows start with ``id``, ``row`` and ``column`` at the positions used
+    by ``SLOT_FIELDS``.
+    """
+    page = list(_page_query(slots, cursor, limit))
+    return _split_page(page, limit)
+
+
+async def apaginate_slots(
+    slots: QuerySet, cursor: tuple[int, int, UUID] | None, limit: int
+) -> tuple[list[tuple], str | None]:
+    page = [slot async for slot in _page_query(slots, cursor, limit)]
+    return _split_page(page, limit)
+
+
+async def aiter_slots(slots: QuerySet, chunk_size: int) -> AsyncIterator[tuple]:
+    """Iterates over ``slots`` one keyset page of ``chunk_size`` rows at a time.
+
+    Stands in for ``QuerySet.aiterator()``, which in Django 4.2 runs
+    ``values_list`` queries in the event loop and raises
+    ``SynchronousOnlyOperation``. Same requirements as ``paginate_slots``.
+    """
+    cursor = None
+    while True:
+        page = [slot async for slot in _page_query(slots, cursor, chunk_size - 1)]
+        for slot in page:
+            yield slot
+        if len(page) < chunk_size:
+            return
+        id, _, row, column = page[-1][:4]
+        cursor = row, column, id
+
+
+def _page_query(
+    slots: QuerySet, cursor: tuple[int, int, UUID] | None, limit: int
+) -> QuerySet:
+    if cursor is not None:
+        slots = slots_after(slots, cursor)
+    return slots[: limit + 1]
+
+
+def _split_page(page: list[tuple], limit: int) -> tuple[list[tuple], str | None]:
+    if len(page) <= limit:
+        return page, None
+
+    page = page[:limit]
+    id, _, row, column = page[-1][:4]
+    return page, encode_cursor(row, column, id)
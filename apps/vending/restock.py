@@ -0,0 +1,170 @@
+"""Bulk restock and planogram import.
+
+Reads slot lines (``machine_id``, ``product_id``, ``row``, ``column``,
+``quantity``) from CSV or JSON Lines, one line at a time, so uploads of any
+size are never held in memory. Lines are validated and applied in chunks of
+``VENDING_RESTOCK_BATCH_SIZE``, each in its own transaction, with a handful of
+queries per chunk: the slot at a line's position is updated, or created if the
+machine has none there. Chunks go through the single-writer queue when it is
+enabled, so orders keep flowing between them. A line that fails validation is
+reported with its line number and skipped; it does not stop the rest of the
+import. An upload that cannot be decoded or parsed stops the import where it
+does: the lines read before are applied, and the report says why it stopped.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from apps.vending.models import Product, VendingMachine, VendingMachineSlot
+from apps.vending.validators import RestockLineValidator
+from apps.vending.versions import bump_slots
+from apps.vending.writer import run_write
+
+FORMATS = ["csv", "jsonl"]
+
+
+@dataclass
+class RestockReport:
+    created: int = 0
+    updated: int = 0
+    errors: list = field(default_factory=list)
+    # Why the upload could not be read to the end, if it could not.
+    unreadable: str | None = None
+
+    def error(self, line: int, errors) -> None:
+        self.errors.append({"line": line, "errors": dict(errors)})
+
+
+def read_lines(lines: Iterable[str], format: str) -> Iterator[tuple[int, object]]:
+    """Yields ``(line number, record)`` for every record of a text stream."""
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def import_slots(lines: Iterable[str], format: str) -> RestockReport:
+    report = RestockReport()
+    for chunk in read_chunks(read_lines(lines, format), report):
+        if positions := validate_chunk(chunk, report):
+            run_write(apply_chunk, positions, report)
+    return report
+
+
+def read_chunks(records: Iterator, report: RestockReport) -> Iterator[list]:
+    """Yields ``records`` in chunks, ending early if the upload is unreadable."""
+    chunk = []
+    try:
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == settings.VENDING_RESTOCK_BATCH_SIZE:
+                yield chunk
+                chunk = []
+    except (UnicodeDecodeError, csv.Error) as error:
+        report.unreadable = str(error)
+    if chunk:
+        yield chunk
+
+
+def validate_chunk(chunk: list, report: RestockReport) -> dict:
+    """Returns the valid lines of ``chunk`` by position, the last line winning."""
+    # One validator for every line: binding a serializer to each line would
+    # deep copy its fields every time.
+    validator = RestockLineValidator()
+    valid = []
+    for number, record in chunk:
+        if not isinstance(record, dict):
+            report.error(number, {"non_field_errors": ["Not a JSON object."]})
+            continue
+        try:
+            valid.append((number, validator.run_validation(record)))
+        except serializers.ValidationError as error:
+            report.error(number, error.detail)
+    if not valid:
+        return {}
+
+    machine_ids = VendingMachine.objects.filter(
+        id__in={line["machine_id"] for _, line in valid}
+    ).values_list("id", flat=True)
+    product_ids = Product.objects.filter(
+        id__in={line["product_id"] for _, line in valid}
+    ).values_list("id", flat=True)
+    machine_ids, product_ids = set(machine_ids), set(product_ids)
+
+    positions = {}
+    for number, line in valid:
+        if line["machine_id"] not in machine_ids:
+            report.error(number, {"machine_id": ["Machine not found."]})
+        elif line["product_id"] not in product_ids:
+            report.error(number, {"product_id": ["Product not found."]})
+        else:
+            positions[(line["machine_id"], line["row"], line["column"])] = line
+    return positions
+
+
+def apply_chunk(positions: dict, report: RestockReport) -> None:
+    machine_ids = {machine_id for machine_id, _, _ in positions}
+
+    with transaction.atomic():
+        # Writing first takes SQLite's write lock before the slots are read: a
+        # read transaction that later writes fails at once if another writer
+        # committed in between, whatever the busy timeout.
+        bump_slots(machine_ids)
+        existing = {
+            (slot.machine_id, slot.row, slot.column): slot
+            for slot in VendingMachineSlot.objects.filter(
+                machine_id__in=machine_ids
+            ).only("id", "machine_id", "row", "column")
+        }
+        updated, created = [], []
+        for position, line in positions.items():
+            if (slot := existing.get(position)) is not None:
+                slot.product_id = line["product_id"]
+                slot.quantity = line["quantity"]
+                updated.append(slot)
+            else:
+                created.append(VendingMachineSlot(**line))
+
+        update_slots(updated)
+        VendingMachineSlot.objects.bulk_create(created)
+
+    report.updated += len(updated)
+    report.created += len(created)
+
+
+def update_slots(slots: list[VendingMachineSlot]) -> None:
+    """Saves the product and quantity of ``slots`` with one prepared UPDATE.
+
+    ``bulk_update`` builds a CASE expression per field with a branch per slot,
+    which takes longer to compile than the database takes to run it.
+    """
+    meta = VendingMachineSlot._meta
+    fields = [meta.get_field(name) for name in ["product", "quantity", "id"]]
+    product, quantity, id = (connection.ops.quote_name(f.column) for f in fields)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {connection.ops.quote_name(meta.db_table)}"
+            f" SET {product} = %s, {quantity} = %s WHERE {id} = %s",
+            [
+                [
+                    field.get_db_prep_save(getattr(slot, field.attname), connection)
+                    for field in fields
+                ]
+                for slot in slots
+            ],
+        )
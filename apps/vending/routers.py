@@ -0,0 +1,66 @@
+"""Routes the reads of read-only endpoints to the read replicas.
+
+Replicas are the database aliases listed in ``VENDING_READ_REPLICAS``.
+``ReplicaMiddleware`` (in ``apps.vending.middleware``) enables them for safe
+requests to views that set ``read_replica = True``, picking one replica for
+the whole request. Everything else reads from and writes to ``default``.
+
+Once a request writes, the rest of it reads from the primary too. The response
+then carries a cookie that keeps the client on the primary for
+``VENDING_REPLICA_PIN_SECONDS``, long enough for the replicas to catch up, so
+buyers always see their own orders and top-ups.
+
+Users, sessions and revoked tokens are always read from the primary: a replica
+that lags would keep logged-out tokens working and forget recent logins.
+"""
+
+import sqlite3
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# The replica the current request reads from, if any.
+replica_reads = ContextVar("replica_reads", default=None)
+wrote_to_primary = ContextVar("wrote_to_primary", default=False)
+
+# Models that authenticate requests, read from the primary only.
+PRIMARY_APPS = {"auth", "sessions"}
+PRIMARY_MODELS = {"vending.revokedtoken"}
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        meta = model._meta
+        if meta.app_label in PRIMARY_APPS or meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        if (replica := replica_reads.get()) and not wrote_to_primary.get():
+            return replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        wrote_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.VENDING_READ_REPLICAS
+
+
+def copy_primary(alias: str) -> None:
+    """Overwrites the SQLite replica ``alias`` with a copy of the primary.
+
+    Uses SQLite's online backup, so the primary can keep taking writes. Meant
+    for local replicas, tests and edge devices that refresh a read copy.
+    """
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    connections[alias].close()
+    target = sqlite3.connect(connections[alias].settings_dict["NAME"])
+    try:
+        primary.connection.backup(target)
+    finally:
+        target.close()
@@ -0,0 +1,140 @@
+"""Product name search over the ``product_search`` FTS5 index.
+
+The index is an FTS5 table holding a copy of each product's name and its id,
+in an unindexed column, and kept in sync by triggers (see migration
+``0017_product_search_by_id``), so every write to the product table updates it,
+bulk ones included. Django drops the triggers when a migration rebuilds the
+product table, as most ``AlterField`` operations on SQLite do: the readiness
+probe then fails, and ``manage.py rebuild_product_search`` creates them again
+and refills the index.
+
+Every word of a search matches as a prefix, accents and case aside. Names that
+start with the first word come first, and results are ranked by FTS5's bm25.
+"""
+
+import re
+
+from django.db import connections, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Collate
+
+from apps.vending.models import Product
+
+PRODUCT_FIELDS = ("id", "name", "price")
+WORD = re.compile(r"\w+")
+
+MATCHING_IDS_SQL = "SELECT product_id FROM product_search WHERE product_search MATCH %s"
+# bm25 is computed for every match before the best ones can be picked, so broad
+# searches, such as a single letter, only rank RANKED_MATCHES of their matches
+# and stay as fast as narrow ones. Those are picked by relevance first: names
+# starting with the first word of the search come before the other matches,
+# and are listed first.
+RANKED_MATCHES = 1_000
+RANKED_SQL = (
+    "SELECT product.id, product.name, product.price FROM ("
+    "  SELECT rowid, tier, rank FROM ("
+    "    SELECT rowid, 0 AS tier, rank FROM product_search"
+    "    WHERE product_search MATCH %s"
+    "    UNION ALL"
+    "    SELECT rowid, 1, rank FROM product_search"
+    "    WHERE product_search MATCH %s"
+    "    LIMIT %s"
+    "  ) ORDER BY tier, rank, rowid LIMIT %s"
+    ") AS best"
+    # Product ids are only read for the best matches.
+    " JOIN product_search ON product_search.rowid = best.rowid"
+    " JOIN product ON product.id = product_search.product_id"
+    " ORDER BY best.tier, best.rank, best.rowid"
+)
+
+
+def search_query(text: str) -> str | None:
+    """Turns free text into an FTS5 query matching every word as a prefix.
+
+    Words are quoted, so FTS5 operators and column filters typed by users are
+    searched for as text. Returns None if ``text`` has no words.
+    """
+    words = WORD.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def matching_product_ids(text: str) -> RawSQL | list:
+    """The ids of the products matching ``text``, for ``product_id__in`` filters."""
+    query = search_query(text)
+    if query is None:
+        return []
+    return RawSQL(MATCHING_IDS_SQL, [query])
+
+
+def catalog_products(text: str | None, limit: int) -> list[tuple]:
+    """Returns ``PRODUCT_FIELDS`` rows of the ``limit`` best matches of ``text``.
+
+    Without a search the catalog is listed by name.
+    """
+    if text is None:
+        return list(
+            Product.objects.order_by(Collate("name", "NOCASE")).values_list(
+                *PRODUCT_FIELDS
+            )[:limit]
+        )
+
+    query = search_query(text)
+    if query is None:
+        return []
+    # ``^`` anchors the first word at the start of the name.
+    leading = f"^{query}"
+    others = f"({query}) NOT ({leading})"
+    return [
+        (product.id, product.name, product.price)
+        for product in Product.objects.raw(
+            RANKED_SQL, [leading, others, max(limit, RANKED_MATCHES), limit]
+        )
+    ]
+
+
+# The triggers of migration 0017_product_search_by_id, recreated by
+# rebuild_index when a table rebuild dropped them.
+TRIGGERS = {
+    "product_search_insert": (
+        "CREATE TRIGGER IF NOT EXISTS product_search_insert AFTER INSERT ON product"
+        " BEGIN"
+        "  INSERT INTO product_search(name, product_id) VALUES (new.name, new.id);"
+        " END"
+    ),
+    "product_search_delete": (
+        "CREATE TRIGGER IF NOT EXISTS product_search_delete AFTER DELETE ON product"
+        " BEGIN"
+        "  DELETE FROM product_search WHERE product_id = old.id;"
+        " END"
+    ),
+    "product_search_update": (
+        "CREATE TRIGGER IF NOT EXISTS product_search_update"
+        " AFTER UPDATE OF name ON product BEGIN"
+        "  UPDATE product_search SET name = new.name WHERE product_id = old.id;"
+        " END"
+    ),
+}
+
+
+def missing_triggers(using: str = "default") -> list[str]:
+    """The triggers that keep the index in sync and no longer exist."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+            [Product._meta.db_table],
+        )
+        existing = {name for (name,) in cursor.fetchall()}
+    return sorted(TRIGGERS.keys() - existing)
+
+
+def rebuild_index(using: str = "default") -> None:
+    """Refills the index from the product table and recreates missing triggers."""
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        for trigger in TRIGGERS.values():
+            cursor.execute(trigger)
+        cursor.execute("DELETE FROM product_search")
+        cursor.execute(
+            "INSERT INTO product_search(name, product_id) SELECT name, id FROM product"
+        )
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 
 
@@ -26,3 +28,38 @@ class UserSerializer(serializers.Serializer):
 class BuyerSerializer(serializers.Serializer):
     balance = serializers.IntegerField(source="credit")
     user = UserSerializer()
+
+
+# Fast read path for slot listings. Rows come straight from
+# ``VendingMachineSlot.objects.values_list(*SLOT_FIELDS)``, a single joined query,
+# and are turned into the same dicts VendingMachineSlotSerializer produces
+# without building DRF fields for every instance.
+SLOT_FIELDS = (
+    "id",
+    "quantity",
+    "row",
+    "column",
+    "product_id",
+    "product__name",
+    "product__price",
+)
+PRICE_QUANTUM = Decimal("0.01")
+
+
+def format_price(price: Decimal) -> str:
+    return f"{price.quantize(PRICE_QUANTUM):f}"
+
+
+def serialize_product_row(product_row: tuple) -> dict:
+    id, name, price = product_row
+    return {"id": str(id), "name": name, "price": format_price(price)}
+
+
+def serialize_slot_row(slot_row: tuple) -> dict:
+    id, quantity, row, column, *product_row = slot_row
+    return {
+        "id": str(id),
+        "quantity": quantity,
+        "coordinates": [column, row],
+        "product": serialize_product_row(product_row),
+    }
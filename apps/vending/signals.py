@@ -0,0 +1,57 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.vending.middleware import count_request_query
+from apps.vending.models import Product, VendingMachineSlot
+from apps.vending.versions import bump_catalog, bump_products, bump_slots
+
+
+@receiver(pre_save, sender=VendingMachineSlot)
+def remember_previous_machine(sender, instance, raw=False, **kwargs):
+    # A slot moved to another machine must also bump the machine it left.
+    instance._previous_machine_id = None
+    if not raw and not instance._state.adding:
+        instance._previous_machine_id = (
+            VendingMachineSlot.objects.filter(pk=instance.pk)
+            .values_list("machine_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=VendingMachineSlot)
+@receiver(post_delete, sender=VendingMachineSlot)
+def bump_slot_version(sender, instance, **kwargs):
+    machine_ids = [instance.machine_id]
+    if previous_machine_id := getattr(instance, "_previous_machine_id", None):
+        machine_ids.append(previous_machine_id)
+    bump_slots(machine_ids)
+
+
+@receiver(post_save, sender=Product)
+def bump_product_version(sender, instance, created, **kwargs):
+    # No slot can show a product that was just created, only the catalog.
+    if created:
+        bump_products()
+    else:
+        bump_catalog()
+
+
+@receiver(post_delete, sender=Product)
+def bump_deleted_product_version(sender, instance, **kwargs):
+    bump_catalog()
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    if count_request_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_request_query)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    # Straight on the driver connection, so they are not counted as queries.
+    for name, value in connection.settings_dict.get("SQLITE_PRAGMAS", {}).items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
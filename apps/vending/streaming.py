@@ -0,0 +1,53 @@
+import json
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+STREAM_CHUNK_SIZE = 500
+
+
+def stream_json_array(
+    items: Iterable, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Encodes ``items`` as a JSON array, yielding it ``chunk_size`` items at a time.
+
+    Items are encoded the way DRF's JSONRenderer does, so a streamed array is
+    byte-identical to the same list returned through a regular ``Response``.
+    """
+    separator = b"["
+    chunk = []
+    for item in items:
+        chunk.append(_encode(item))
+        if len(chunk) == chunk_size:
+            yield separator + ",".join(chunk).encode()
+            separator = b","
+            chunk = []
+
+    yield _close(separator, chunk)
+
+
+async def astream_json_array(
+    items: AsyncIterable, chunk_size: int = STREAM_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """``stream_json_array`` for async iterables, e.g. ``QuerySet.aiterator()``."""
+    separator = b"["
+    chunk = []
+    async for item in items:
+        chunk.append(_encode(item))
+        if len(chunk) == chunk_size:
+            yield separator + ",".join(chunk).encode()
+            separator = b","
+            chunk = []
+
+    yield _close(separator, chunk)
+
+
+def _encode(item) -> str:
+    return json.dumps(item, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _close(separator: bytes, chunk: list[str]) -> bytes:
+    if chunk:
+        return separator + ",".join(chunk).encode() + b"]"
+    elif separator == b"[":
+        return b"[]"
+    else:
+        return b"]"
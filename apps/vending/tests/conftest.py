@@ -0,0 +1,41 @@
+from importlib import reload
+
+import pytest
+from django.urls import clear_url_caches
+
+import vending_machine.urls
+
+from apps.vending import admission
+from apps.vending.cache import inventory_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_inventory_cache():
+    # The database is rolled back after every test but the cache is not.
+    inventory_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limits(settings):
+    # Every test client shares one address; admission tests set their limits.
+    settings.VENDING_RATE_LIMITS = {}
+    admission.reset()
+
+
+@pytest.fixture(autouse=True)
+def sync_sales_journal(settings):
+    # A writer thread cannot insert while the test transaction holds the
+    # database; tests of the background journal turn this off.
+    settings.VENDING_SALES_JOURNAL_SYNC = True
+
+
+@pytest.fixture
+def async_reads(settings):
+    """Routes the read endpoints to ``apps.vending.async_views``."""
+    settings.VENDING_ASYNC_READS = True
+    reload(vending_machine.urls)
+    clear_url_caches()
+    yield
+    settings.VENDING_ASYNC_READS = False
+    reload(vending_machine.urls)
+    clear_url_caches()
@@ -1,15 +1,31 @@
+from datetime import timedelta
 from decimal import Decimal
 from unittest.mock import ANY
 
 import pytest
+from asgiref.sync import async_to_sync
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
 from django.contrib.auth.models import User
+from django.test import Client
+from django.utils import timezone
 import factory
 from factory.django import DjangoModelFactory
-from apps.vending.models import Buyer, Product, VendingMachineSlot
+from apps.vending.models import (
+    Buyer,
+    Product,
+    RevokedToken,
+    VendingMachine,
+    VendingMachineSlot,
+)
+from apps.vending.serializers import VendingMachineSlotSerializer
 from apps.vending.tests.unit.product_tests import ProductFactory
 from apps.vending.tests.unit.vending_machine_slot_tests import VendingMachineSlotFactory
+from apps.vending.tests.unit.vending_machine_tests import VendingMachineFactory
+from apps.vending.validators import ListSlotsValidator, LowStockValidator
+from apps.vending.views import listed_slots, low_stock_slots
 
 
 @pytest.fixture
@@ -135,6 +151,28 @@ class TestListVendingMachineSlots:
         assert response.status_code == status.HTTP_200_OK
         assert response.json() == expected_response
 
+    def test_list_slots_matches_drf_serializer_output(self, client, slots_grid):
+        VendingMachineSlotFactory(
+            product=ProductFactory(name="Ñandú €", price=Decimal("0.5")), row=3
+        )
+        slots = VendingMachineSlot.objects.all()
+        expected = JSONRenderer().render(
+            VendingMachineSlotSerializer(slots, many=True).data
+        )
+
+        response = client.get("/slots/")
+
+        assert response.content == expected
+
+    def test_list_slots_runs_a_single_listing_query(
+        self, client, slots_grid, django_assert_num_queries
+    ):
+        # One query for the inventory version and one for the listing.
+        with django_assert_num_queries(2):
+            response = client.get("/slots/")
+
+        assert response.status_code == status.HTTP_200_OK
+
     def test_invalid_quantity_filter_returns_bad_request(self, client):
         response = client.get("/slots/?quantity=-1")
         assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -142,6 +180,101 @@ class TestListVendingMachineSlots:
             "quantity": ["Ensure this value is greater than or equal to 0."]
         }
 
+    @pytest.mark.parametrize(
+        "query, quantities",
+        [
+            ("in_stock=true", [1, 2, 3, 4, 1, 2, 3, 4]),
+            ("in_stock=false", [0, 0]),
+            ("min_quantity=3", [3, 4, 3, 4]),
+            ("min_quantity=0", [0, 1, 2, 3, 4, 0, 1, 2, 3, 4]),
+            ("in_stock=false&min_quantity=0", [0, 0]),
+            ("quantity=0", [0, 0]),
+            ("in_stock=true&quantity=2", [1, 2, 1, 2]),
+            ("min_quantity=2&quantity=3&limit=3", [2, 3, 2]),
+        ],
+    )
+    def test_stock_filters(self, client, slots_grid, query, quantities):
+        response = client.get(f"/slots/?{query}")
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()
+        if isinstance(results, dict):
+            results = results["results"]
+        assert [slot["quantity"] for slot in results] == quantities
+
+    def test_empty_slots_cannot_have_a_minimum_quantity(self, client, slots_grid):
+        response = client.get("/slots/?in_stock=false&min_quantity=3")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {
+            "non_field_errors": [
+                "in_stock=false cannot be combined with a positive min_quantity"
+            ]
+        }
+
+    def test_in_stock_listing_reads_the_partial_index(self, slots_grid):
+        validator = ListSlotsValidator(data={"min_quantity": 1})
+        validator.is_valid(raise_exception=True)
+
+        plan = listed_slots({}, validator.validated_data).explain()
+
+        assert "slot_in_stock_idx" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.django_db
+class TestPaginateVendingMachineSlots:
+    def test_cursor_pages_cover_every_slot_once(self, client, slots_grid):
+        response = client.get("/slots/?limit=4")
+        pages = [response.json()]
+        while pages[-1]["next"]:
+            pages.append(client.get(pages[-1]["next"]).json())
+
+        coordinates = [
+            slot["coordinates"] for page in pages for slot in page["results"]
+        ]
+        assert [len(page["results"]) for page in pages] == [4, 4, 2]
+        assert coordinates == [
+            [column, row] for row in range(1, 3) for column in range(1, 6)
+        ]
+
+    def test_cursor_pages_keep_quantity_filter(self, client, slots_grid):
+        first_page = client.get("/slots/?quantity=1&limit=3").json()
+        second_page = client.get(first_page["next"]).json()
+
+        assert "quantity=1" in first_page["next"]
+        assert [slot["quantity"] for slot in first_page["results"]] == [0, 1, 0]
+        assert [slot["quantity"] for slot in second_page["results"]] == [1]
+        assert second_page["next"] is None
+
+    def test_stream_matches_regular_listing(self, client, slots_grid):
+        expected = client.get("/slots/?quantity=3").content
+
+        response = client.get("/slots/?quantity=3&stream=true")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/json"
+        assert b"".join(response.streaming_content) == expected
+
+    def test_stream_without_slots_is_an_empty_array(self, client):
+        response = client.get("/slots/?stream=true")
+
+        assert b"".join(response.streaming_content) == b"[]"
+
+    def test_invalid_cursor_returns_bad_request(self, client):
+        response = client.get("/slots/?cursor=not-a-cursor")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"cursor": ["Invalid cursor"]}
+
+    def test_stream_cannot_be_paginated(self, client):
+        response = client.get("/slots/?stream=true&limit=10")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {
+            "non_field_errors": ["stream cannot be combined with cursor or limit"]
+        }
+
 
 @pytest.mark.django_db
 class TestBuyer:
@@ -157,6 +290,23 @@ class TestBuyer:
 
         assert response.status_code == status.HTTP_200_OK
 
+    @pytest.mark.parametrize("username", ["jorge", "nobody"])
+    def test_failed_login_hashes_the_password_once(self, client, monkeypatch, username):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("5.00"))
+        encode = PBKDF2PasswordHasher.encode
+        calls = []
+
+        def counted_encode(hasher, *args, **kwargs):
+            calls.append(1)
+            return encode(hasher, *args, **kwargs)
+
+        monkeypatch.setattr(PBKDF2PasswordHasher, "encode", counted_encode)
+        response = client.post("/login/", {"username": username, "password": "wrong"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert len(calls) == 1
+
     def test_buyer_profile(self, client):
         user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
         Buyer.objects.create(user=user, credit=Decimal("5.00"))
@@ -202,6 +352,31 @@ class TestBuyer:
 
         assert Buyer.objects.all()[0].credit == Decimal("15.00")
 
+    def test_buyer_add_credit_is_exact_and_uncapped(self, client):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("99.99"))
+        client.post("/login/", {"username": "jorge", "password": "password"})
+
+        for _ in range(3):
+            add_credit = client.post("/add-credit/", {"amount": "0.10"})
+
+        assert add_credit.status_code == status.HTTP_200_OK
+        assert add_credit.json() == {"balance": 100.29}
+        assert Buyer.objects.get().credit == Decimal("100.29")
+
+    def test_buyer_add_negative_credit(self, client):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("5.00"))
+        client.post("/login/", {"username": "jorge", "password": "password"})
+
+        add_credit = client.post("/add-credit/", {"amount": "-2.50"})
+        assert add_credit.json() == {"balance": 2.5}
+
+        add_credit = client.post("/add-credit/", {"amount": "-2.51"})
+        assert add_credit.status_code == status.HTTP_400_BAD_REQUEST
+        assert add_credit.content == b"cannot have negative salary"
+        assert Buyer.objects.get().credit == Decimal("2.50")
+
     def test_buyer_refund(self, client):
         user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
         Buyer.objects.create(user=user, credit=Decimal("5.00"))
@@ -263,6 +438,80 @@ class TestBuyer:
         assert Buyer.objects.all()[0].credit == Decimal("10.00")
         assert len(VendingMachineSlot.objects.all()) == 1
 
+    def test_buyer_order_decrements_ordered_quantity(self, client):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        test_vending_machine_slot = VendingMachineSlotFactory(quantity=5)
+        client.post("/login/", {"username": "jorge", "password": "password"})
+
+        order = client.post(
+            "/order/", {"slot_id": test_vending_machine_slot.id, "quantity": 3}
+        )
+
+        assert order.status_code == status.HTTP_200_OK
+        assert order.json() == {"balance": 18.8}
+        test_vending_machine_slot.refresh_from_db()
+        assert test_vending_machine_slot.quantity == 2
+
+    def test_buyer_order_keeps_empty_slots(self, client):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        test_vending_machine_slot = VendingMachineSlotFactory(quantity=2)
+        client.post("/login/", {"username": "jorge", "password": "password"})
+
+        order = client.post(
+            "/order/", {"slot_id": test_vending_machine_slot.id, "quantity": 2}
+        )
+
+        assert order.status_code == status.HTTP_200_OK
+        test_vending_machine_slot.refresh_from_db()
+        assert test_vending_machine_slot.quantity == 0
+        assert client.get("/slots/?in_stock=true").json() == []
+
+    def test_buyer_order_out_of_stock_does_not_charge(self, client):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        test_vending_machine_slot = VendingMachineSlotFactory(quantity=2)
+        client.post("/login/", {"username": "jorge", "password": "password"})
+
+        order = client.post(
+            "/order/", {"slot_id": test_vending_machine_slot.id, "quantity": 3}
+        )
+
+        assert order.status_code == status.HTTP_400_BAD_REQUEST
+        assert order.content == b"Not enough products in slot"
+        assert Buyer.objects.get().credit == Decimal("50.00")
+        test_vending_machine_slot.refresh_from_db()
+        assert test_vending_machine_slot.quantity == 2
+
+    def test_buyer_order_unknown_slot(self, client):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        client.post("/login/", {"username": "jorge", "password": "password"})
+
+        order = client.post(
+            "/order/",
+            {"slot_id": "9c3b1ad8-6f0a-4c4f-9a55-0f3b7d1d2a11", "quantity": 1},
+        )
+
+        assert order.status_code == status.HTTP_400_BAD_REQUEST
+        assert order.content == b"Slot not found"
+
+    def test_buyer_order_invalid_quantity(self, client):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        test_vending_machine_slot = VendingMachineSlotFactory()
+        client.post("/login/", {"username": "jorge", "password": "password"})
+
+        order = client.post(
+            "/order/", {"slot_id": test_vending_machine_slot.id, "quantity": 0}
+        )
+
+        assert order.status_code == status.HTTP_400_BAD_REQUEST
+        assert order.json() == {
+            "quantity": ["Ensure this value is greater than or equal to 1."]
+        }
+
     def test_buyer_logout(self, client):
         user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
         Buyer.objects.create(user=user, credit=Decimal("5.00"))
@@ -281,3 +530,886 @@ class TestBuyer:
         )
 
         assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestTokenAuthentication:
+    @pytest.fixture
+    def token(self, client) -> str:
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("5.00"))
+        login = client.post("/login/", {"username": "jorge", "password": "password"})
+        return login.json()["token"]
+
+    def test_login_returns_a_token(self, token):
+        assert token
+
+    def test_token_request_skips_session_and_user_queries(
+        self, token, django_assert_num_queries
+    ):
+        token_client = Client(HTTP_AUTHORIZATION=f"Token {token}")
+        session_client = Client()
+        session_client.post("/login/", {"username": "jorge", "password": "password"})
+
+        # Neither the session nor the user and its buyer are loaded for tokens,
+        # only the revocation and the user's state are checked, in one query.
+        with django_assert_num_queries(6):
+            session_client.post("/add-credit/", {"amount": 10})
+        with django_assert_num_queries(5):
+            response = token_client.post("/add-credit/", {"amount": 10})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"balance": 25.0}
+
+    def test_token_profile(self, token):
+        response = Client(HTTP_AUTHORIZATION=f"Token {token}").get("/profile/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["balance"] == 5
+
+    def test_logout_revokes_the_token(self, token):
+        token_client = Client(HTTP_AUTHORIZATION=f"Token {token}")
+
+        assert token_client.post("/logout/").status_code == status.HTTP_200_OK
+
+        response = token_client.post("/add-credit/", {"amount": 10})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert Buyer.objects.get().credit == Decimal("5.00")
+
+    def test_expired_revocations_are_purged(self, token):
+        RevokedToken.objects.create(
+            token_id="expired", expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        Client(HTTP_AUTHORIZATION=f"Token {token}").post("/logout/")
+
+        assert RevokedToken.objects.count() == 1
+        assert not RevokedToken.objects.filter(token_id="expired").exists()
+
+    @pytest.mark.parametrize(
+        "remove_user",
+        [lambda user: user.delete(), lambda user: User.objects.update(is_active=False)],
+        ids=["deleted", "inactive"],
+    )
+    @pytest.mark.parametrize(
+        "method, path",
+        [("post", "/add-credit/"), ("post", "/refund/"), ("get", "/profile/")],
+    )
+    def test_tokens_of_removed_users_are_rejected(
+        self, token, remove_user, method, path
+    ):
+        remove_user(User.objects.get())
+
+        response = getattr(Client(HTTP_AUTHORIZATION=f"Token {token}"), method)(
+            path, {"amount": 10} if method == "post" else None
+        )
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_tampered_token_is_rejected(self, token):
+        response = Client(HTTP_AUTHORIZATION=f"Token {token[:-1]}x").post(
+            "/add-credit/", {"amount": 10}
+        )
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_expired_token_is_rejected(self, token, settings):
+        settings.VENDING_AUTH_TOKEN_MAX_AGE = -1
+
+        response = Client(HTTP_AUTHORIZATION=f"Token {token}").post(
+            "/add-credit/", {"amount": 10}
+        )
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestRequestQueryCounts:
+    @pytest.fixture(autouse=True)
+    def query_count_header(self, settings):
+        settings.VENDING_QUERY_COUNT_HEADER = True
+
+    @pytest.fixture
+    def buyer_client(self, client) -> Client:
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        client.post("/login/", {"username": "jorge", "password": "password"})
+        return client
+
+    def test_anonymous_request_reports_its_queries(self, client):
+        response = client.get("/slots/")
+
+        assert response["X-Query-Count"] == "2"
+
+    def test_header_is_off_by_default(self, client, settings):
+        settings.VENDING_QUERY_COUNT_HEADER = False
+
+        assert "X-Query-Count" not in client.get("/slots/")
+
+    @pytest.mark.parametrize(
+        "method, path, data, queries",
+        [
+            ("get", "/profile/", None, 3),
+            ("post", "/add-credit/", {"amount": 10}, 6),
+            ("post", "/refund/", None, 7),
+        ],
+    )
+    def test_buyer_endpoints_load_the_buyer_once(
+        self, buyer_client, method, path, data, queries
+    ):
+        response = getattr(buyer_client, method)(path, data)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["X-Query-Count"] == str(queries)
+
+    def test_order_loads_the_buyer_once(self, buyer_client, settings):
+        # The sales journal is written after the response.
+        settings.VENDING_SALES_JOURNAL_SYNC = False
+        slot = VendingMachineSlotFactory(quantity=5)
+
+        response = buyer_client.post("/order/", {"slot_id": slot.id, "quantity": 1})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["X-Query-Count"] == "11"
+
+
+@pytest.mark.django_db
+class TestAsyncReadViews:
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "/slots/",
+            "/slots/?quantity=1",
+            "/slots/?in_stock=true&min_quantity=2",
+            "/slots/?search=product%201",
+            "/products/?search=prod&limit=3",
+            "/products/?limit=0",
+            "/slots/?limit=4",
+            "/slots/?quantity=-1",
+            "/slots/matrix",
+            "/slots/matrix?rows=2&columns=3",
+            "/slots/matrix?rows=0",
+            "/slots/low-stock?limit=3",
+            "/slots/low-stock?quantity=-1",
+            "/healthcheck/",
+        ],
+    )
+    def test_responses_match_sync_views(self, request, client, slots_grid, path):
+        expected = client.get(path)
+        request.getfixturevalue("async_reads")
+
+        response = Client().get(path)
+
+        assert response.status_code == expected.status_code
+        assert response.content == expected.content
+
+    def test_slot_and_machine_routes_match_sync_views(self, request, client):
+        slot = VendingMachineSlotFactory()
+        other_machine = VendingMachine.objects.create(name="Lobby")
+        paths = [
+            f"/slots/{slot.id}",
+            f"/slots/{other_machine.id}",
+            f"/machines/{slot.machine_id}/slots/",
+            f"/machines/{slot.machine_id}/slots/matrix",
+            f"/machines/{slot.machine_id}/slots/low-stock",
+            f"/machines/{other_machine.id}/slots/{slot.id}",
+        ]
+        expected = [client.get(path) for path in paths]
+        request.getfixturevalue("async_reads")
+
+        responses = [Client().get(path) for path in paths]
+        assert [response.status_code for response in responses] == [
+            response.status_code for response in expected
+        ]
+        assert [response.content for response in responses] == [
+            response.content for response in expected
+        ]
+        assert responses[1].status_code == status.HTTP_404_NOT_FOUND
+        assert responses[-1].status_code == status.HTTP_404_NOT_FOUND
+
+    def test_not_modified(self, client, slots_grid, async_reads):
+        etag = client.get("/slots/")["ETag"]
+
+        response = client.get("/slots/", HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+
+    def test_stream_matches_regular_listing(
+        self, client, slots_grid, async_reads, monkeypatch
+    ):
+        monkeypatch.setattr("apps.vending.async_views.STREAM_CHUNK_SIZE", 4)
+        response = client.get("/slots/?stream=true")
+
+        async def content():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        assert async_to_sync(content)() == client.get("/slots/").content
+
+    def test_profile_matches_sync_view(self, request, client):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("5.00"))
+        login = client.post("/login/", {"username": "jorge", "password": "password"})
+        token_client = Client(HTTP_AUTHORIZATION=f"Token {login.json()['token']}")
+        expected = client.get("/profile/").content
+        request.getfixturevalue("async_reads")
+
+        assert client.get("/profile/").content == expected
+        assert token_client.get("/profile/").content == expected
+
+    def test_profile_without_buyer(self, client, async_reads):
+        assert client.get("/profile/").status_code == status.HTTP_400_BAD_REQUEST
+
+        response = Client(HTTP_AUTHORIZATION="Token invalid").get("/profile/")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestVendingMachineSlotsMatrix:
+    def test_matrix_is_sized_from_stored_slots(self, client, slots_grid):
+        response = client.get("/slots/matrix")
+
+        assert response.status_code == status.HTTP_200_OK
+        matrix = response.json()
+        assert len(matrix) == 3
+        assert all(len(row) == 6 for row in matrix)
+        assert matrix[0] == [None] * 6
+        assert matrix[1][0] is None
+        assert matrix[1][1] == {
+            "id": ANY,
+            "quantity": 0,
+            "coordinates": [1, 1],
+            "product": {"id": ANY, "name": "Product 10", "price": "10.40"},
+        }
+        assert matrix[2][5]["product"]["name"] == "Product 1"
+
+    def test_matrix_with_explicit_dimensions(self, client, slots_grid):
+        response = client.get("/slots/matrix?rows=2&columns=3")
+
+        assert response.status_code == status.HTTP_200_OK
+        matrix = response.json()
+        assert len(matrix) == 2
+        assert all(len(row) == 3 for row in matrix)
+        assert [slot["coordinates"] for slot in matrix[1] if slot] == [[1, 1], [2, 1]]
+
+    def test_matrix_runs_a_single_listing_query(
+        self, client, slots_grid, django_assert_num_queries
+    ):
+        # One query for the inventory version and one for the matrix.
+        with django_assert_num_queries(2):
+            response = client.get("/slots/matrix")
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_matrix_without_slots_is_empty(self, client):
+        response = client.get("/slots/matrix")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == []
+
+    @pytest.mark.parametrize("async_views", [False, True])
+    def test_fleet_matrix_of_several_machines_is_rejected(
+        self, client, request, async_views
+    ):
+        if async_views:
+            request.getfixturevalue("async_reads")
+        slot = VendingMachineSlotFactory(row=0, column=0)
+        other_slot = VendingMachineSlotFactory(
+            machine=VendingMachineFactory(name="Lobby"), row=0, column=0
+        )
+
+        response = client.get("/slots/matrix")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert b"/machines/<machine_id>/slots/matrix" in response.content
+        for machine_slot in [slot, other_slot]:
+            matrix = client.get(
+                f"/machines/{machine_slot.machine_id}/slots/matrix"
+            ).json()
+            assert matrix[0][0]["id"] == str(machine_slot.id)
+
+    def test_invalid_matrix_dimensions_return_bad_request(self, client):
+        response = client.get("/slots/matrix?rows=12")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {
+            "rows": ["Ensure this value is less than or equal to 11."]
+        }
+
+
+@pytest.mark.django_db
+class TestCartOrder:
+    @pytest.fixture
+    def buyer(self, client) -> Buyer:
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        buyer = Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        client.post("/login/", {"username": "jorge", "password": "password"})
+        return buyer
+
+    def test_cart_order_sells_every_line(self, client, buyer):
+        first_slot = VendingMachineSlotFactory(quantity=5)
+        second_slot = VendingMachineSlotFactory(
+            quantity=5, product=ProductFactory(price=Decimal("2.50"))
+        )
+
+        order = client.post(
+            "/order/cart",
+            {
+                "lines": [
+                    {"slot_id": str(first_slot.id), "quantity": 2},
+                    {"slot_id": str(second_slot.id), "quantity": 3},
+                    {"slot_id": str(first_slot.id), "quantity": 1},
+                ]
+            },
+            content_type="application/json",
+        )
+
+        assert order.status_code == status.HTTP_200_OK
+        assert order.json() == {"balance": 11.3}
+        assert VendingMachineSlot.objects.get(id=first_slot.id).quantity == 2
+        assert VendingMachineSlot.objects.get(id=second_slot.id).quantity == 2
+
+    def test_cart_order_is_all_or_nothing(self, client, buyer):
+        first_slot = VendingMachineSlotFactory(quantity=5)
+        second_slot = VendingMachineSlotFactory(quantity=1)
+
+        order = client.post(
+            "/order/cart",
+            {
+                "lines": [
+                    {"slot_id": str(first_slot.id), "quantity": 1},
+                    {"slot_id": str(second_slot.id), "quantity": 2},
+                ]
+            },
+            content_type="application/json",
+        )
+
+        assert order.status_code == status.HTTP_400_BAD_REQUEST
+        assert Buyer.objects.get().credit == Decimal("50.00")
+        assert VendingMachineSlot.objects.get(id=first_slot.id).quantity == 5
+        assert VendingMachineSlot.objects.get(id=second_slot.id).quantity == 1
+
+    def test_cart_order_without_enough_credit_rolls_back_stock(self, client, buyer):
+        slot = VendingMachineSlotFactory(quantity=10)
+
+        order = client.post(
+            "/order/cart",
+            {"lines": [{"slot_id": str(slot.id), "quantity": 5}]},
+            content_type="application/json",
+        )
+
+        assert order.status_code == status.HTTP_400_BAD_REQUEST
+        assert order.content == b"Money not enough to buy products"
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 10
+
+    def test_empty_cart_returns_bad_request(self, client, buyer):
+        order = client.post(
+            "/order/cart", {"lines": []}, content_type="application/json"
+        )
+
+        assert order.status_code == status.HTTP_400_BAD_REQUEST
+        assert order.json() == {
+            "lines": {"non_field_errors": ["This list may not be empty."]}
+        }
+
+
+@pytest.mark.django_db
+class TestMachineScopedSlots:
+    @pytest.fixture
+    def lobby_slot(self) -> VendingMachineSlot:
+        return VendingMachineSlotFactory(
+            machine=VendingMachineFactory(name="Lobby"),
+            product=ProductFactory(name="Lobby water"),
+            row=0,
+            column=0,
+        )
+
+    def test_list_slots_of_one_machine(self, client, slots_grid, lobby_slot):
+        response = client.get(f"/machines/{lobby_slot.machine_id}/slots/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [slot["product"]["name"] for slot in response.json()] == ["Lobby water"]
+        assert len(client.get("/slots/").json()) == 11
+
+    def test_matrix_of_one_machine(self, client, slots_grid, lobby_slot):
+        machine_id = slots_grid[0].machine_id
+
+        response = client.get(f"/machines/{machine_id}/slots/matrix")
+
+        assert response.status_code == status.HTTP_200_OK
+        matrix = response.json()
+        assert matrix[0] == [None] * 6
+        assert matrix[1][1]["product"]["name"] == "Product 10"
+
+    def test_get_slot_of_one_machine(self, client, lobby_slot):
+        response = client.get(
+            f"/machines/{lobby_slot.machine_id}/slots/{lobby_slot.id}"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["product"]["name"] == "Lobby water"
+
+    def test_slot_of_another_machine_is_not_found(self, client, slots_grid, lobby_slot):
+        machine_id = slots_grid[0].machine_id
+
+        response = client.get(f"/machines/{machine_id}/slots/{lobby_slot.id}")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_unknown_slot_is_not_found(self, client, lobby_slot):
+        response = client.get(f"/slots/{lobby_slot.machine_id}")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {"detail": "Not found."}
+
+    def test_order_is_scoped_to_the_machine(self, client, slots_grid, lobby_slot):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        client.post("/login/", {"username": "jorge", "password": "password"})
+
+        order = client.post(
+            "/order/",
+            {
+                "slot_id": lobby_slot.id,
+                "quantity": 1,
+                "machine_id": slots_grid[0].machine_id,
+            },
+        )
+
+        assert order.status_code == status.HTTP_400_BAD_REQUEST
+        assert order.content == b"Slot not found"
+
+        order = client.post(
+            "/order/",
+            {
+                "slot_id": lobby_slot.id,
+                "quantity": 1,
+                "machine_id": lobby_slot.machine_id,
+            },
+        )
+
+        assert order.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestInventoryCache:
+    def test_repeated_reads_are_served_from_cache(
+        self, client, slots_grid, django_assert_num_queries
+    ):
+        slot = slots_grid[0]
+        urls = [
+            "/slots/",
+            "/slots/?quantity=2",
+            "/slots/?limit=3",
+            "/slots/matrix",
+            f"/slots/{slot.id}",
+            f"/machines/{slot.machine_id}/slots/",
+        ]
+        first = [client.get(url).content for url in urls]
+
+        # Only the inventory version is read for each request.
+        with django_assert_num_queries(len(urls)):
+            second = [client.get(url).content for url in urls]
+
+        assert first == second
+
+    def test_order_invalidates_its_machine_and_the_fleet(
+        self, client, slots_grid, django_assert_num_queries
+    ):
+        other_slot = VendingMachineSlotFactory(
+            machine=VendingMachineFactory(name="Lobby")
+        )
+        slot = slots_grid[-1]
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        client.post("/login/", {"username": "jorge", "password": "password"})
+        client.get("/slots/")
+        client.get(f"/machines/{slot.machine_id}/slots/matrix")
+        client.get(f"/machines/{other_slot.machine_id}/slots/")
+
+        client.post("/order/", {"slot_id": slot.id, "quantity": 1})
+
+        fleet = client.get("/slots/").json()
+        assert [s["quantity"] for s in fleet if s["id"] == str(slot.id)] == [3]
+        matrix = client.get(f"/machines/{slot.machine_id}/slots/matrix").json()
+        assert matrix[2][5]["quantity"] == 3
+        # Authenticated requests still load the session, so read anonymously.
+        with django_assert_num_queries(1):
+            Client().get(f"/machines/{other_slot.machine_id}/slots/")
+
+    def test_admin_edits_invalidate_cached_reads(self, client, slots_grid):
+        slot = slots_grid[0]
+        client.get("/slots/")
+        client.get(f"/slots/{slot.id}")
+
+        slot.quantity = 42
+        slot.save()
+        slot.product.name = "Renamed"
+        slot.product.save()
+
+        assert client.get(f"/slots/{slot.id}").json()["quantity"] == 42
+        assert client.get("/slots/").json()[0]["product"]["name"] == "Renamed"
+
+    def test_moving_a_slot_invalidates_both_machines(self, client, slots_grid):
+        slot = slots_grid[0]
+        lobby = VendingMachineFactory(name="Lobby")
+        client.get(f"/machines/{slot.machine_id}/slots/")
+        client.get(f"/machines/{lobby.id}/slots/")
+
+        slot.machine = lobby
+        slot.save()
+
+        assert len(client.get(f"/machines/{slot.machine_id}/slots/").json()) == 1
+        assert (
+            len(client.get(f"/machines/{slots_grid[1].machine_id}/slots/").json()) == 9
+        )
+
+
+@pytest.mark.django_db
+class TestInventoryETag:
+    @pytest.mark.parametrize(
+        "url", ["/slots/", "/slots/?stream=true", "/slots/matrix", "/slots/?limit=2"]
+    )
+    def test_unchanged_inventory_returns_not_modified(
+        self, client, slots_grid, django_assert_num_queries, url
+    ):
+        etag = client.get(url)["ETag"]
+
+        with django_assert_num_queries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+        assert response.content == b""
+
+    def test_etag_changes_with_inventory(self, client, slots_grid):
+        slot = slots_grid[0]
+        etag = client.get("/slots/")["ETag"]
+        slot_etag = client.get(f"/slots/{slot.id}")["ETag"]
+
+        slot.product.price = Decimal("1.00")
+        slot.product.save()
+
+        response = client.get("/slots/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        response = client.get(f"/slots/{slot.id}", HTTP_IF_NONE_MATCH=slot_etag)
+        assert response.json()["product"]["price"] == "1.00"
+
+    def test_machine_etag_ignores_other_machines(self, client, slots_grid):
+        machine_id = slots_grid[0].machine_id
+        etag = client.get(f"/machines/{machine_id}/slots/")["ETag"]
+        fleet_etag = client.get("/slots/")["ETag"]
+
+        VendingMachineSlotFactory(machine=VendingMachineFactory(name="Lobby"))
+
+        response = client.get(f"/machines/{machine_id}/slots/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        response = client.get("/slots/", HTTP_IF_NONE_MATCH=fleet_etag)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_order_bumps_the_inventory_version(self, client, slots_grid):
+        slot = slots_grid[-1]
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        etag = Client().get("/slots/matrix")["ETag"]
+        client.post("/login/", {"username": "jorge", "password": "password"})
+
+        client.post("/order/", {"slot_id": slot.id, "quantity": 1})
+
+        response = Client().get("/slots/matrix", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()[2][5]["quantity"] == 3
+
+
+@pytest.mark.django_db
+class TestProductSearch:
+    def test_search_ranks_matching_products(self, client):
+        for name in ["Coca Cola Zero", "Coca Cola", "Chocolate"]:
+            ProductFactory(name=name)
+
+        response = client.get("/products/?search=coca%20co")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [
+            {"id": ANY, "name": "Coca Cola", "price": "10.40"},
+            {"id": ANY, "name": "Coca Cola Zero", "price": "10.40"},
+        ]
+
+    def test_catalog_lists_products_by_name(self, client, products_list):
+        response = client.get("/products/?limit=2")
+
+        assert [product["name"] for product in response.json()] == [
+            "Product 1",
+            "Product 10",
+        ]
+
+    def test_new_products_change_the_catalog_etag(self, client):
+        etag = client.get("/products/?search=water")["ETag"]
+
+        ProductFactory(name="Water")
+
+        response = client.get("/products/?search=water", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert [product["name"] for product in response.json()] == ["Water"]
+
+    def test_invalid_search_returns_bad_request(self, client):
+        response = client.get(f"/products/?search={'x' * 101}&limit=0")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.json()) == {"search", "limit"}
+
+    def test_slots_are_filtered_by_product_search(self, client, slots_grid):
+        response = client.get("/slots/?search=product%201")
+        in_stock = client.get("/slots/?search=product%201&in_stock=true")
+
+        assert [slot["product"]["name"] for slot in response.json()] == [
+            "Product 10",
+            "Product 1",
+        ]
+        assert [slot["product"]["name"] for slot in in_stock.json()] == ["Product 1"]
+        assert client.get("/slots/?search=%3F%3F").json() == []
+
+    def test_slot_search_runs_a_single_listing_query(
+        self, client, slots_grid, django_assert_num_queries
+    ):
+        with django_assert_num_queries(2):
+            client.get("/slots/?search=product")
+
+
+@pytest.mark.django_db
+class TestLowStockSlots:
+    def test_lists_the_emptiest_slots_first(self, client, slots_grid):
+        response = client.get("/slots/low-stock?limit=3")
+
+        assert response.status_code == status.HTTP_200_OK
+        slots = response.json()
+        assert [slot["quantity"] for slot in slots] == [0, 0, 1]
+        assert [slot["coordinates"] for slot in slots] == [[1, 1], [1, 2], [2, 1]]
+
+    def test_filters_by_product_and_quantity(self, client, slots_grid):
+        slot = slots_grid[3]
+
+        by_product = client.get(f"/slots/low-stock?product_id={slot.product_id}")
+        below = client.get("/slots/low-stock?quantity=1")
+
+        assert [s["id"] for s in by_product.json()] == [str(slot.id)]
+        assert [s["quantity"] for s in below.json()] == [0, 0, 1, 1]
+
+    def test_lists_the_slots_of_one_machine(self, client, slots_grid):
+        lobby_slot = VendingMachineSlotFactory(
+            machine=VendingMachineFactory(name="Lobby"), quantity=5
+        )
+
+        response = client.get(f"/machines/{lobby_slot.machine_id}/slots/low-stock")
+
+        assert [slot["id"] for slot in response.json()] == [str(lobby_slot.id)]
+
+    def test_slot_writes_update_the_listing(self, client, slots_grid):
+        client.get("/slots/low-stock?limit=3")
+        slot = slots_grid[-1]
+
+        slot.quantity = 0
+        slot.save()
+
+        response = client.get("/slots/low-stock?limit=3")
+        assert [s["coordinates"] for s in response.json()] == [[1, 1], [1, 2], [5, 2]]
+
+    @pytest.mark.parametrize(
+        "scope, index",
+        [
+            ("fleet", "slot_low_stock_idx"),
+            ("product", "slot_product_stock_idx"),
+            ("machine", "slot_machine_stock_idx"),
+        ],
+    )
+    def test_reads_the_first_entries_of_an_index(self, slots_grid, scope, index):
+        slot = slots_grid[0]
+        kwargs = {"machine_id": slot.machine_id} if scope == "machine" else {}
+        data = {"product_id": slot.product_id} if scope == "product" else {}
+        validator = LowStockValidator(data={**data, "quantity": 2})
+        validator.is_valid(raise_exception=True)
+
+        plan = low_stock_slots(kwargs, validator.validated_data).explain()
+
+        assert index in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_invalid_parameters_return_bad_request(self, client):
+        response = client.get("/slots/low-stock?limit=0&product_id=1&quantity=-1")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.json()) == {"limit", "product_id", "quantity"}
+
+
+@pytest.mark.django_db
+class TestRestock:
+    @pytest.fixture
+    def admin_client(self, client):
+        client.force_login(User.objects.create_superuser("admin", password="password"))
+        return client
+
+    def test_restock_imports_a_streamed_csv(self, admin_client):
+        slot = VendingMachineSlotFactory(row=0, column=0, quantity=1)
+        body = (
+            "machine_id,product_id,row,column,quantity\n"
+            f"{slot.machine_id},{slot.product_id},0,0,8\n"
+            f"{slot.machine_id},{slot.product_id},0,1,4\n"
+            f"{slot.machine_id},{slot.product_id},0,99,4\n"
+        )
+
+        response = admin_client.post("/restock/", body, content_type="text/csv")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "created": 1,
+            "updated": 1,
+            "errors": [{"line": 4, "errors": {"column": [ANY]}}],
+            "unreadable": None,
+        }
+        quantities = VendingMachineSlot.objects.values_list("quantity", flat=True)
+        assert sorted(quantities) == [4, 8]
+
+    def test_restock_reports_lines_applied_before_an_unreadable_one(
+        self, admin_client, settings
+    ):
+        settings.VENDING_RESTOCK_BATCH_SIZE = 1
+        slot = VendingMachineSlotFactory(row=0, column=0, quantity=1)
+        body = (
+            "machine_id,product_id,row,column,quantity\n"
+            f"{slot.machine_id},{slot.product_id},0,0,8\n"
+            f"{slot.machine_id},{slot.product_id},0,1,4\n"
+        ).encode() + b"\xff\xfe,0,0,0\n"
+
+        response = admin_client.post("/restock/", body, content_type="text/csv")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {
+            "created": 1,
+            "updated": 1,
+            "errors": [],
+            "unreadable": ANY,
+        }
+        quantities = VendingMachineSlot.objects.values_list("quantity", flat=True)
+        assert sorted(quantities) == [4, 8]
+
+    def test_restock_requires_an_operator(self, client):
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        client.force_login(user)
+
+        response = client.post("/restock/", "", content_type="text/csv")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_restock_rejects_other_content_types(self, admin_client):
+        response = admin_client.post("/restock/", {"lines": []})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestIdempotencyKeys:
+    @pytest.fixture
+    def buyer(self, client) -> Buyer:
+        user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+        buyer = Buyer.objects.create(user=user, credit=Decimal("50.00"))
+        client.post("/login/", {"username": "jorge", "password": "password"})
+        return buyer
+
+    def test_retried_order_is_replayed(self, client, buyer):
+        slot = VendingMachineSlotFactory(quantity=5)
+        data = {"slot_id": slot.id, "quantity": 2}
+
+        first = client.post("/order/", data, HTTP_IDEMPOTENCY_KEY="order-1")
+        retry = client.post("/order/", data, HTTP_IDEMPOTENCY_KEY="order-1")
+
+        assert first.status_code == retry.status_code == status.HTTP_200_OK
+        assert retry.json() == first.json() == {"balance": 29.2}
+        assert retry["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 3
+
+    def test_retried_credit_is_replayed(self, client, buyer):
+        for _ in range(2):
+            response = client.post(
+                "/add-credit/", {"amount": "1.00"}, HTTP_IDEMPOTENCY_KEY="credit-1"
+            )
+
+        assert response.json() == {"balance": 51.0}
+        assert client.post("/add-credit/", {"amount": "1.00"}).json() == {
+            "balance": 52.0
+        }
+
+    def test_retried_form_order_is_replayed_with_csrf_checks(self, buyer):
+        # The CSRF check reads the form before the view, so the raw body is gone.
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(buyer.user)
+        client.cookies["csrftoken"] = "a" * 32
+        slot = VendingMachineSlotFactory(quantity=5)
+        data = {"slot_id": slot.id, "quantity": 2, "csrfmiddlewaretoken": "a" * 32}
+
+        first = client.post("/order/", data, HTTP_IDEMPOTENCY_KEY="order-1")
+        retry = client.post("/order/", data, HTTP_IDEMPOTENCY_KEY="order-1")
+
+        assert first.status_code == retry.status_code == status.HTTP_200_OK
+        assert retry.json() == first.json() == {"balance": 29.2}
+        assert retry["Idempotent-Replayed"] == "true"
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 3
+
+    def test_failed_orders_are_replayed(self, client, buyer):
+        slot = VendingMachineSlotFactory(quantity=1)
+        data = {"slot_id": slot.id, "quantity": 2}
+        first = client.post("/order/", data, HTTP_IDEMPOTENCY_KEY="order-1")
+
+        VendingMachineSlot.objects.filter(id=slot.id).update(quantity=5)
+        retry = client.post("/order/", data, HTTP_IDEMPOTENCY_KEY="order-1")
+
+        assert retry.status_code == first.status_code == status.HTTP_400_BAD_REQUEST
+        assert retry.content == first.content
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 5
+
+    def test_key_reused_for_another_request_is_rejected(self, client, buyer):
+        slot = VendingMachineSlotFactory(quantity=5)
+        client.post(
+            "/order/", {"slot_id": slot.id, "quantity": 1}, HTTP_IDEMPOTENCY_KEY="k"
+        )
+
+        response = client.post(
+            "/order/", {"slot_id": slot.id, "quantity": 2}, HTTP_IDEMPOTENCY_KEY="k"
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 4
+
+    def test_keys_are_scoped_to_the_route(self, client, buyer):
+        slot = VendingMachineSlotFactory(quantity=5)
+        client.post("/add-credit/", {"amount": "1.00"}, HTTP_IDEMPOTENCY_KEY="k")
+
+        response = client.post(
+            "/order/cart",
+            {"lines": [{"slot_id": str(slot.id), "quantity": 1}]},
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY="k",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 4
+
+    def test_invalid_requests_are_not_stored(self, client, buyer):
+        invalid = client.post("/add-credit/", {}, HTTP_IDEMPOTENCY_KEY="k")
+        valid = client.post(
+            "/add-credit/", {"amount": "1.00"}, HTTP_IDEMPOTENCY_KEY="k"
+        )
+
+        assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+        assert valid.json() == {"balance": 51.0}
+
+    def test_overlong_key_is_rejected(self, client, buyer):
+        response = client.post(
+            "/add-credit/", {"amount": "1.00"}, HTTP_IDEMPOTENCY_KEY="k" * 256
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert client.post("/add-credit/", {"amount": "1.00"}).json() == {
+            "balance": 51.0
+        }
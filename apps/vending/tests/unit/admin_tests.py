@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+
+from apps.vending import admin
+from apps.vending.models import Buyer, Product, VendingMachineSlot
+from apps.vending.orders import place_order
+from apps.vending.tests.unit.product_tests import ProductFactory
+from apps.vending.tests.unit.vending_machine_slot_tests import VendingMachineSlotFactory
+from apps.vending.versions import inventory_versions
+
+
+@pytest.fixture
+def buyers() -> list[Buyer]:
+    return [
+        Buyer.objects.create(
+            user=User.objects.create_user(f"buyer-{i}"), credit=Decimal("1.50")
+        )
+        for i in range(5)
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("model", ["buyer", "product", "sale", "vendingmachineslot"])
+def test_changelist_queries_do_not_grow_with_rows(
+    admin_client, django_assert_max_num_queries, buyers, model
+):
+    for column in range(5):
+        slot = VendingMachineSlotFactory(column=column, product__price=Decimal("1.00"))
+        place_order(buyers[column], slot.id, 1)
+
+    # Session, user, count and page.
+    with django_assert_max_num_queries(5):
+        response = admin_client.get(f"/admin/vending/{model}/")
+
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_buyer_changelist_shows_the_balance(admin_client, buyers):
+    response = admin_client.get("/admin/vending/buyer/")
+
+    assert response.content.count(b"1.50") == len(buyers)
+
+
+@pytest.mark.django_db
+def test_buyer_search_matches_username_prefixes(admin_client, buyers):
+    response = admin_client.get("/admin/vending/buyer/?q=buyer-3")
+
+    assert [buyer.pk for buyer in response.context["cl"].result_list] == [buyers[3].pk]
+
+
+@pytest.mark.django_db
+def test_unfiltered_changelists_estimate_large_counts(
+    admin_client, monkeypatch, buyers
+):
+    monkeypatch.setattr(admin, "ESTIMATED_COUNT_THRESHOLD", 2)
+    buyers[0].delete()
+
+    unfiltered = admin_client.get("/admin/vending/buyer/")
+    filtered = admin_client.get("/admin/vending/buyer/?q=buyer")
+
+    # The largest rowid still counts the deleted buyer.
+    assert unfiltered.context["cl"].result_count == 5
+    assert filtered.context["cl"].result_count == 4
+
+
+@pytest.mark.django_db
+def test_restock_action_sets_quantities_and_bumps_versions(admin_client):
+    slots = [
+        VendingMachineSlotFactory(column=column, quantity=0) for column in range(3)
+    ]
+    versions = inventory_versions(slots[0].machine_id)
+
+    admin_client.post(
+        "/admin/vending/vendingmachineslot/",
+        {
+            "action": "restock",
+            "_selected_action": [slot.pk for slot in slots[:2]],
+            "quantity": "",
+        },
+    )
+
+    assert sorted(VendingMachineSlot.objects.values_list("quantity", flat=True)) == [
+        0,
+        100,
+        100,
+    ]
+    assert inventory_versions(slots[0].machine_id) != versions
+
+
+@pytest.mark.django_db
+def test_change_price_action(admin_client):
+    products = [ProductFactory(name=f"Product {i}") for i in range(2)]
+
+    admin_client.post(
+        "/admin/vending/product/",
+        {
+            "action": "change_price",
+            "_selected_action": [products[0].pk],
+            "price": "2.25",
+        },
+    )
+
+    assert list(Product.objects.order_by("name").values_list("price", flat=True)) == [
+        Decimal("2.25"),
+        products[1].price,
+    ]
@@ -0,0 +1,123 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+from rest_framework import status
+
+from apps.vending import admission, views
+from apps.vending.admission import RateLimiter, TokenBucket
+from apps.vending.authentication import issue_token
+from apps.vending.models import Buyer
+from apps.vending.tests.unit.metrics_tests import sample_value
+
+
+def token_client(username: str) -> Client:
+    user = User.objects.create_user(username, password="password")
+    buyer = Buyer.objects.create(user=user, credit=Decimal("10.00"))
+    return Client(HTTP_AUTHORIZATION=f"Token {issue_token(buyer)}")
+
+
+def test_bucket_allows_a_burst_then_refills_at_its_rate():
+    bucket = TokenBucket(rate=2, burst=3, now=0)
+
+    assert [bucket.take(0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(0) == 0.5
+    assert bucket.take(0.25) == 0.25
+    assert bucket.take(0.5) == 0
+
+
+def test_limiter_forgets_the_least_recently_used_keys():
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+    limiter.take("a")
+    limiter.take("b")
+    limiter.take("a")
+
+    limiter.take("c")
+
+    assert limiter.take("a") > 0
+    assert limiter.take("b") == 0
+
+
+@pytest.mark.django_db
+def test_logins_over_the_address_limit_are_rejected(client, settings):
+    settings.VENDING_RATE_LIMITS = {"/login/": {"ip": (0.5, 2)}}
+    shed = 'vending_requests_shed_total{path="/login/",limit="ip"}'
+    before = sample_value(shed)
+
+    responses = [
+        client.post("/login/", {"username": "jorge", "password": "wrong"})
+        for _ in range(3)
+    ]
+
+    assert [response.status_code for response in responses] == [400, 400, 429]
+    assert responses[-1]["Retry-After"] == "2"
+    assert sample_value(shed) == before + 1
+    other_address = Client(REMOTE_ADDR="10.0.0.2")
+    response = other_address.post("/login/", {"username": "jorge", "password": "x"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize(
+    "trusted, forwarded, address",
+    [
+        ([], "10.0.0.7", "10.0.0.1"),
+        (["10.0.0.1"], "10.0.0.7", "10.0.0.7"),
+        (["10.0.0.1"], "6.6.6.6, 10.0.0.7", "10.0.0.7"),
+        (["10.0.0.1", "10.0.0.2"], "10.0.0.7, 10.0.0.2", "10.0.0.7"),
+        (["10.0.0.1"], "", "10.0.0.1"),
+    ],
+)
+def test_client_address_is_read_through_trusted_proxies(
+    rf, settings, trusted, forwarded, address
+):
+    settings.VENDING_TRUSTED_PROXIES = trusted
+    request = rf.get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR=forwarded)
+
+    assert admission.client_address(request) == address
+
+
+@pytest.mark.django_db
+def test_buyers_are_limited_separately(settings):
+    settings.VENDING_RATE_LIMITS = {"/add-credit/": {"buyer": (1, 1)}}
+    jorge, ana = token_client("jorge"), token_client("ana")
+
+    assert jorge.post("/add-credit/", {"amount": "1.00"}).status_code == 200
+    assert jorge.post("/add-credit/", {"amount": "1.00"}).status_code == 429
+    assert ana.post("/add-credit/", {"amount": "1.00"}).status_code == 200
+    assert jorge.get("/profile/").status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db(transaction=True)
+def test_writes_beyond_the_in_flight_limit_are_shed(settings, monkeypatch):
+    settings.VENDING_MAX_INFLIGHT_WRITES = 1
+    shed = 'vending_requests_shed_total{path="*",limit="writes"}'
+    before = sample_value(shed)
+    started = threading.Event()
+    release = threading.Event()
+    add_credit = views.add_credit
+
+    def slow_add_credit(*args):
+        started.set()
+        release.wait()
+        return add_credit(*args)
+
+    monkeypatch.setattr(views, "add_credit", slow_add_credit)
+    jorge, ana = token_client("jorge"), token_client("ana")
+
+    with ThreadPoolExecutor(1) as executor:
+        first = executor.submit(jorge.post, "/add-credit/", {"amount": "1.00"})
+        started.wait()
+        shed_write = ana.post("/add-credit/", {"amount": "1.00"})
+        read = ana.get("/slots/")
+        release.set()
+
+    assert first.result().status_code == status.HTTP_200_OK
+    assert shed_write.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert shed_write["Retry-After"] == "1"
+    assert read.status_code == status.HTTP_200_OK
+    assert sample_value(shed) == before + 1
+    assert ana.post("/add-credit/", {"amount": "1.00"}).status_code == 200
+    assert admission._writes.in_flight == 0
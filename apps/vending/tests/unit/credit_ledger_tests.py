@@ -0,0 +1,122 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from apps.vending.ledger import (
+    NegativeBalance,
+    add_credit,
+    append_entry,
+    balance,
+    compact_ledger,
+    refund,
+)
+from apps.vending.models import Buyer, CreditEntry
+
+
+@pytest.fixture
+def buyer() -> Buyer:
+    user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+    return Buyer.objects.create(user=user, credit=Decimal("5.00"))
+
+
+@pytest.mark.django_db
+def test_opening_credit_is_the_snapshot(buyer):
+    assert buyer.credit_cents == 500
+    assert buyer.credit == Decimal("5.00")
+    assert not CreditEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_balance_adds_appended_entries_to_the_snapshot(buyer):
+    add_credit(buyer.pk, Decimal("0.10"))
+    add_credit(buyer.pk, Decimal("0.20"))
+
+    assert balance(buyer.pk) == Decimal("5.30")
+    assert list(buyer.credit_entries.values_list("amount_cents", flat=True)) == [
+        10,
+        20,
+    ]
+
+
+@pytest.mark.django_db
+def test_balance_is_not_capped(buyer):
+    assert add_credit(buyer.pk, Decimal("1000.00")) == Decimal("1005.00")
+
+
+@pytest.mark.django_db
+def test_entry_that_would_overdraw_is_not_appended(buyer):
+    with pytest.raises(NegativeBalance):
+        append_entry(buyer.pk, -501, CreditEntry.Kind.ORDER)
+
+    assert balance(buyer.pk) == Decimal("5.00")
+    assert not CreditEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_refund_withdraws_the_whole_balance(buyer):
+    add_credit(buyer.pk, Decimal("2.50"))
+
+    assert refund(buyer.pk) == Decimal("0.00")
+    assert balance(buyer.pk) == Decimal("0.00")
+    assert buyer.credit_entries.last().amount_cents == -750
+
+
+@pytest.mark.django_db
+def test_compaction_keeps_balances_and_history(buyer):
+    other = Buyer.objects.create(user=User.objects.create(username="ana"), credit=1)
+    add_credit(buyer.pk, Decimal("1.00"))
+    append_entry(buyer.pk, -250, CreditEntry.Kind.ORDER)
+
+    assert compact_ledger() == 1
+
+    buyer.refresh_from_db()
+    other.refresh_from_db()
+    assert (buyer.credit_cents, buyer.ledger_position) == (
+        350,
+        CreditEntry.objects.last().id,
+    )
+    assert (other.credit_cents, other.ledger_position) == (100, 0)
+    assert buyer.credit == Decimal("3.50")
+    assert CreditEntry.objects.count() == 2
+
+    add_credit(buyer.pk, Decimal("0.01"))
+    assert buyer.credit == Decimal("3.51")
+
+
+@pytest.mark.django_db
+def test_compact_credit_ledger_command(buyer, capsys):
+    add_credit(buyer.pk, Decimal("1.00"))
+
+    call_command("compact_credit_ledger")
+
+    assert capsys.readouterr().out == "Compacted the credit ledger of 1 buyers\n"
+    assert compact_ledger() == 0
+
+
+@pytest.mark.django_db
+def test_credit_of_a_saved_buyer_cannot_be_assigned(buyer):
+    with pytest.raises(AttributeError):
+        buyer.credit = Decimal("1.00")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migrating_back_keeps_uncompacted_entries(buyer):
+    add_credit(buyer.pk, Decimal("2.50"))
+    compact_ledger()
+    append_entry(buyer.pk, -100, CreditEntry.Kind.ORDER)
+    executor = MigrationExecutor(connection)
+    latest = executor.loader.graph.leaf_nodes("vending")
+
+    executor.migrate([("vending", "0008_inventoryversion")])
+    old_buyer = executor.loader.project_state(
+        ("vending", "0008_inventoryversion")
+    ).apps.get_model("vending", "Buyer")
+    credit = old_buyer.objects.get(pk=buyer.pk).credit
+    executor.loader.build_graph()
+    executor.migrate(latest)
+
+    assert credit == Decimal("6.50")
@@ -0,0 +1,111 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.vending import idempotency
+from apps.vending.idempotency import REPLAYED_HEADER, run_idempotent
+from apps.vending.models import IdempotencyKey
+
+
+@pytest.mark.django_db(transaction=True)
+def test_duplicates_wait_for_the_request_in_flight():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def run():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return Response(data={"balance": 1.0})
+
+    with ThreadPoolExecutor(4) as executor:
+        first = executor.submit(run_idempotent, "buyer:key", "body", run)
+        started.wait()
+        duplicates = [
+            executor.submit(run_idempotent, "buyer:key", "body", run) for _ in range(3)
+        ]
+        release.set()
+        responses = [first.result()] + [future.result() for future in duplicates]
+
+    assert len(calls) == 1
+    assert [response.data for response in responses] == [{"balance": 1.0}] * 4
+    assert REPLAYED_HEADER not in responses[0]
+    assert all(REPLAYED_HEADER in response for response in responses[1:])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_duplicates_give_up_waiting_with_a_conflict(settings):
+    settings.VENDING_IDEMPOTENCY_WAIT_SECONDS = 0.05
+    started = threading.Event()
+    release = threading.Event()
+
+    def run():
+        started.set()
+        release.wait()
+        return HttpResponse("ok")
+
+    with ThreadPoolExecutor(1) as executor:
+        first = executor.submit(run_idempotent, "buyer:key", "body", run)
+        started.wait()
+        duplicate = run_idempotent("buyer:key", "body", run)
+        release.set()
+
+    assert duplicate.status_code == status.HTTP_409_CONFLICT
+    assert first.result().content == b"ok"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "outcome",
+    [HttpResponse(status=status.HTTP_503_SERVICE_UNAVAILABLE), ZeroDivisionError()],
+)
+def test_server_errors_and_exceptions_are_not_stored(outcome):
+    def fail():
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    try:
+        run_idempotent("buyer:key", "body", fail)
+    except ZeroDivisionError:
+        pass
+    response = run_idempotent("buyer:key", "body", lambda: HttpResponse("ok"))
+
+    assert response.content == b"ok"
+    assert REPLAYED_HEADER not in response
+
+
+@pytest.mark.django_db
+def test_plain_responses_are_replayed_with_their_content_type():
+    run_idempotent(
+        "buyer:key",
+        "body",
+        lambda: HttpResponse("no", status=400, content_type="text/plain"),
+    )
+
+    response = run_idempotent("buyer:key", "body", lambda: HttpResponse("other"))
+
+    assert response.status_code == 400
+    assert response.content == b"no"
+    assert response["Content-Type"] == "text/plain"
+
+
+@pytest.mark.django_db
+def test_expired_keys_are_claimed_again_and_purged(settings, monkeypatch):
+    settings.VENDING_IDEMPOTENCY_TTL = -1
+    run_idempotent("buyer:key", "body", lambda: HttpResponse("first"))
+    run_idempotent("buyer:other", "body", lambda: HttpResponse("other"))
+
+    response = run_idempotent("buyer:key", "changed", lambda: HttpResponse("second"))
+
+    assert response.content == b"second"
+    assert REPLAYED_HEADER not in response
+    monkeypatch.setattr(idempotency, "_last_purge", 0.0)
+    settings.VENDING_IDEMPOTENCY_TTL = 60
+    run_idempotent("buyer:new", "body", lambda: HttpResponse("new"))
+    assert IdempotencyKey.objects.count() == 1
@@ -0,0 +1,204 @@
+import threading
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.vending import journal
+from apps.vending.journal import SalesJournal
+from apps.vending.models import Buyer, Sale
+from apps.vending.orders import OutOfStock, place_cart_order
+from apps.vending.tests.unit.vending_machine_slot_tests import VendingMachineSlotFactory
+from apps.vending.writer import run_write
+
+
+@pytest.fixture
+def buyer() -> Buyer:
+    user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+    return Buyer.objects.create(user=user, credit=Decimal("50.00"))
+
+
+def sales(count: int, quantity: int = 1) -> list[Sale]:
+    return [
+        Sale(
+            order_id=uuid4(),
+            sold_at=timezone.now(),
+            buyer_id=1,
+            machine_id=uuid4(),
+            slot_id=uuid4(),
+            product_id=uuid4(),
+            quantity=quantity,
+            unit_price_cents=125,
+        )
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_orders_journal_a_sale_per_slot(buyer):
+    slots = [VendingMachineSlotFactory(column=column) for column in range(2)]
+
+    place_cart_order(buyer, [(slots[0].id, 2), (slots[1].id, 1), (slots[0].id, 1)])
+
+    journaled = Sale.objects.order_by("quantity")
+    assert [(sale.slot_id, sale.quantity) for sale in journaled] == [
+        (slots[1].id, 1),
+        (slots[0].id, 3),
+    ]
+    assert {sale.order_id for sale in journaled} == {journaled[0].order_id}
+    assert journaled[0].buyer_id == buyer.pk
+    assert journaled[0].product_id == slots[1].product_id
+    assert journaled[0].machine_id == slots[1].machine_id
+    assert journaled[0].unit_price_cents == 1040
+
+
+@pytest.mark.django_db
+def test_orders_read_prices_after_taking_stock(buyer):
+    slot = VendingMachineSlotFactory()
+
+    with CaptureQueriesContext(connection) as queries:
+        place_cart_order(buyer, [(slot.id, 1)])
+
+    statements = [query["sql"] for query in queries]
+    taken = next(i for i, sql in enumerate(statements) if sql.startswith("UPDATE"))
+    priced = next(i for i, sql in enumerate(statements) if '"price"' in sql)
+    assert taken < priced
+    assert Sale.objects.get().unit_price_cents == 1040
+
+
+@pytest.mark.django_db
+def test_failed_orders_journal_nothing(buyer):
+    slot = VendingMachineSlotFactory(quantity=1)
+
+    with pytest.raises(OutOfStock):
+        place_cart_order(buyer, [(slot.id, 2)])
+
+    assert not Sale.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_journal_writes_in_batches(monkeypatch):
+    batches = []
+    write_sales = journal.write_sales
+    monkeypatch.setattr(
+        journal,
+        "write_sales",
+        lambda batch: batches.append(len(batch)) or write_sales(batch),
+    )
+    sales_journal = SalesJournal(batch_size=2, max_pending=3, flush_seconds=0.01)
+
+    for _ in range(3):
+        sales_journal.put(sales(2))
+    sales_journal.flush()
+
+    assert Sale.objects.count() == 6
+    assert sum(batches) == 6
+    assert max(batches) <= 2
+    sales_journal.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_closing_writes_pending_sales_and_later_ones_inline():
+    sales_journal = SalesJournal(batch_size=10, max_pending=100, flush_seconds=0.01)
+    sales_journal.put(sales(5))
+
+    sales_journal.close()
+    assert Sale.objects.count() == 5
+
+    sales_journal.put(sales(1))
+    assert Sale.objects.count() == 6
+
+
+@pytest.mark.django_db(transaction=True)
+def test_closing_waits_for_sales_being_queued(monkeypatch):
+    writing = threading.Event()
+    release = threading.Event()
+    write_sales = journal.write_sales
+
+    def slow_write_sales(batch):
+        writing.set()
+        release.wait()
+        write_sales(batch)
+
+    monkeypatch.setattr(journal, "write_sales", slow_write_sales)
+    sales_journal = SalesJournal(batch_size=1, max_pending=1, flush_seconds=0.01)
+    # The first sale is being written, the second fills the queue and the
+    # third waits for room while the journal closes.
+    putting = threading.Thread(target=sales_journal.put, args=(sales(3),))
+    putting.start()
+    writing.wait()
+    closing = threading.Thread(target=sales_journal.close)
+    closing.start()
+    release.set()
+    putting.join()
+    closing.join()
+
+    assert Sale.objects.count() == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_batches_are_retried_until_written(monkeypatch, caplog):
+    monkeypatch.setattr(journal, "RETRY_SECONDS", 0.001)
+    failures = iter([ZeroDivisionError(), ZeroDivisionError()])
+    write_sales = journal.write_sales
+
+    def flaky_write_sales(batch):
+        if error := next(failures, None):
+            raise error
+        write_sales(batch)
+
+    monkeypatch.setattr(journal, "write_sales", flaky_write_sales)
+    sales_journal = SalesJournal(batch_size=10, max_pending=100, flush_seconds=0.01)
+    sales_journal.put(sales(3))
+    sales_journal.flush()
+
+    assert Sale.objects.count() == 3
+    assert "Could not journal 3 sales (attempt 2)" in caplog.text
+    sales_journal.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_closing_journal_gives_up_on_failed_batches(monkeypatch, caplog):
+    monkeypatch.setattr(journal, "RETRY_SECONDS", 0.001)
+    monkeypatch.setattr(journal, "write_sales", lambda batch: 1 / 0)
+    sales_journal = SalesJournal(batch_size=10, max_pending=100, flush_seconds=10)
+    sales_journal.put(sales(2))
+
+    sales_journal.close()
+
+    assert f"(attempt {journal.CLOSING_ATTEMPTS})" in caplog.text
+    assert "Gave up journaling 2 sales on close" in caplog.text
+
+
+@pytest.mark.django_db(transaction=True)
+def test_orders_journal_after_commit(buyer, settings, monkeypatch):
+    settings.VENDING_SALES_JOURNAL_SYNC = False
+    sales_journal = SalesJournal(batch_size=10, max_pending=100, flush_seconds=0.01)
+    monkeypatch.setattr(journal, "_journal", sales_journal)
+    slot = VendingMachineSlotFactory()
+
+    place_cart_order(buyer, [(slot.id, 1)])
+    sales_journal.flush()
+
+    assert Sale.objects.get().slot_id == slot.id
+    sales_journal.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_orders_through_the_single_writer_are_journaled(buyer, settings, monkeypatch):
+    settings.VENDING_SALES_JOURNAL_SYNC = False
+    settings.VENDING_SINGLE_WRITER = True
+    sales_journal = SalesJournal(batch_size=10, max_pending=1, flush_seconds=0.01)
+    monkeypatch.setattr(journal, "_journal", sales_journal)
+    slot = VendingMachineSlotFactory()
+
+    for _ in range(3):
+        run_write(place_cart_order, buyer, [(slot.id, 1)])
+    sales_journal.flush()
+
+    assert Sale.objects.count() == 3
+    sales_journal.close()
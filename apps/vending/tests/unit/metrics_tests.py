@@ -0,0 +1,136 @@
+import json
+import os
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+
+from apps.vending.ledger import add_credit, refund
+from apps.vending import metrics
+from apps.vending.metrics import process_key, render
+from apps.vending.models import Buyer
+from apps.vending.orders import place_order
+from apps.vending.tests.unit.vending_machine_slot_tests import VendingMachineSlotFactory
+
+
+def sample_value(sample: str) -> float:
+    """The value of ``sample`` (name and labels) in ``/metrics/``, 0 if absent."""
+    for line in render().splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0
+
+
+@pytest.fixture
+def buyer() -> Buyer:
+    user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+    return Buyer.objects.create(user=user, credit=Decimal("10.00"))
+
+
+@pytest.mark.django_db
+def test_requests_are_recorded_per_route(client):
+    requests = 'vending_http_requests_total{method="GET",route="slots/",status="200"}'
+    queries = 'vending_db_queries_total{method="GET",route="slots/"}'
+    slow = (
+        "vending_http_request_duration_seconds_bucket"
+        '{method="GET",route="slots/",le="+Inf"}'
+    )
+    before = [sample_value(requests), sample_value(queries), sample_value(slow)]
+
+    client.get("/slots/")
+
+    assert sample_value(requests) == before[0] + 1
+    # The inventory version lookup plus the slot query.
+    assert sample_value(queries) == before[1] + 2
+    assert sample_value(slow) == before[2] + 1
+
+
+@pytest.mark.django_db
+def test_unmatched_requests_share_a_route(client):
+    sample = 'vending_http_requests_total{method="GET",route="unmatched",status="404"}'
+    before = sample_value(sample)
+
+    client.get("/wp-login.php")
+
+    assert sample_value(sample) == before + 1
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_serves_the_text_format(admin_client):
+    response = admin_client.get("/metrics/")
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert b"# TYPE vending_http_request_duration_seconds histogram" in response.content
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_requires_staff_or_the_token(client, settings):
+    settings.VENDING_METRICS_TOKEN = "secret"
+    user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+
+    anonymous = client.get("/metrics/")
+    wrong_token = client.get("/metrics/", HTTP_AUTHORIZATION="Bearer wrong")
+    scraper = client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+    client.force_login(user)
+    buyer = client.get("/metrics/")
+
+    assert anonymous.status_code == wrong_token.status_code == 403
+    assert buyer.status_code == 403
+    assert scraper.status_code == 200
+
+
+@pytest.mark.django_db
+def test_sales_are_counted_once_committed(buyer, django_capture_on_commit_callbacks):
+    slot = VendingMachineSlotFactory(quantity=5, product__price=Decimal("1.00"))
+    before = [
+        sample_value(name)
+        for name in [
+            "vending_orders_total",
+            "vending_units_sold_total",
+            "vending_credit_added_cents_total",
+            "vending_refunds_total",
+        ]
+    ]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        place_order(buyer, slot.id, 3)
+        add_credit(buyer.pk, Decimal("2.50"))
+        refund(buyer.pk)
+
+    assert sample_value("vending_orders_total") == before[0] + 1
+    assert sample_value("vending_units_sold_total") == before[1] + 3
+    assert sample_value("vending_credit_added_cents_total") == before[2] + 250
+    assert sample_value("vending_refunds_total") == before[3] + 1
+
+
+def test_metrics_are_added_up_across_processes(settings, tmp_path):
+    settings.VENDING_METRICS_DIR = str(tmp_path)
+    before = sample_value("vending_orders_total")
+    (tmp_path / f"metrics-{os.getpid() + 1}-1.json").write_text(
+        json.dumps({"vending_orders_total": [[[], 4]]})
+    )
+
+    assert sample_value("vending_orders_total") == before + 4
+    assert (tmp_path / f"metrics-{process_key()}.json").exists()
+
+
+@pytest.mark.skipif(metrics.process_start(os.getpid()) is None, reason="needs /proc")
+def test_snapshots_of_exited_processes_are_folded(settings, tmp_path):
+    settings.VENDING_METRICS_DIR = str(tmp_path)
+    before = sample_value("vending_orders_total")
+    # An exited process whose pid this process reuses.
+    reused = tmp_path / f"metrics-{os.getpid()}-0.json"
+    reused.write_text(json.dumps({"vending_orders_total": [[[], 4]]}))
+    temporary = tmp_path / "metrics-1-1.1.1.tmp"
+    temporary.write_text("{")
+    os.utime(temporary, (0, 0))
+
+    assert sample_value("vending_orders_total") == before + 4
+    assert sample_value("vending_orders_total") == before + 4
+    assert not reused.exists()
+    assert not temporary.exists()
+    assert {path.name for path in tmp_path.glob("metrics-*.json")} == {
+        "metrics-exited.json",
+        f"metrics-{process_key()}.json",
+    }
@@ -0,0 +1,140 @@
+import csv
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.vending.models import VendingMachineSlot
+from apps.vending.restock import import_slots
+from apps.vending.tests.unit.product_tests import ProductFactory
+from apps.vending.tests.unit.vending_machine_slot_tests import VendingMachineSlotFactory
+from apps.vending.versions import inventory_versions
+
+
+def csv_lines(*rows) -> list[str]:
+    header = "machine_id,product_id,row,column,quantity\n"
+    return [header, *(",".join(map(str, row)) + "\n" for row in rows)]
+
+
+def slot_positions() -> list[tuple]:
+    return list(
+        VendingMachineSlot.objects.order_by("row", "column").values_list(
+            "product__name", "row", "column", "quantity"
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_import_updates_and_creates_slots(settings):
+    settings.VENDING_RESTOCK_BATCH_SIZE = 2
+    slot = VendingMachineSlotFactory(row=0, column=0, quantity=1)
+    water = ProductFactory(name="Water")
+    versions = inventory_versions(slot.machine_id)
+
+    report = import_slots(
+        csv_lines(
+            (slot.machine_id, water.id, 0, 0, 10),
+            (slot.machine_id, water.id, 0, 1, 20),
+            (slot.machine_id, water.id, 1, 0, 30),
+        ),
+        "csv",
+    )
+
+    assert (report.created, report.updated, report.errors) == (2, 1, [])
+    assert VendingMachineSlot.objects.get(id=slot.id).quantity == 10
+    assert slot_positions() == [
+        ("Water", 0, 0, 10),
+        ("Water", 0, 1, 20),
+        ("Water", 1, 0, 30),
+    ]
+    assert inventory_versions(slot.machine_id) != versions
+
+
+@pytest.mark.django_db
+def test_chunks_write_before_they_read_the_slots():
+    slot = VendingMachineSlotFactory(row=0, column=0)
+
+    with CaptureQueriesContext(connection) as queries:
+        import_slots(csv_lines((slot.machine_id, slot.product_id, 0, 0, 5)), "csv")
+
+    sql = [query["sql"] for query in queries]
+    # A read that upgrades to a write fails on SQLite if another writer
+    # committed in between, so the chunk's transaction starts with an UPDATE.
+    transaction_start = next(i for i, q in enumerate(sql) if q.startswith("SAVEPOINT"))
+    assert sql[transaction_start + 1].startswith("UPDATE")
+
+
+@pytest.mark.django_db
+def test_import_reports_invalid_lines_and_applies_the_rest():
+    slot = VendingMachineSlotFactory(row=0, column=0)
+    lines = [
+        json.dumps(
+            {
+                "machine_id": str(slot.machine_id),
+                "product_id": str(slot.product_id),
+                "row": 0,
+                "column": 0,
+                "quantity": 7,
+            }
+        ),
+        "",
+        "{not json",
+        json.dumps(
+            {
+                "machine_id": str(slot.machine_id),
+                "product_id": str(slot.product_id),
+                "row": 11,
+                "column": 0,
+                "quantity": 7,
+            }
+        ),
+        json.dumps(
+            {
+                "machine_id": str(slot.product_id),
+                "product_id": str(slot.product_id),
+                "row": 1,
+                "column": 0,
+                "quantity": 7,
+            }
+        ),
+    ]
+
+    report = import_slots(lines, "jsonl")
+
+    assert (report.created, report.updated) == (0, 1)
+    assert [error["line"] for error in report.errors] == [3, 4, 5]
+    assert list(report.errors[1]["errors"]) == ["row"]
+    assert report.errors[2]["errors"] == {"machine_id": ["Machine not found."]}
+    assert VendingMachineSlot.objects.get().quantity == 7
+
+
+@pytest.mark.django_db
+def test_restock_command_imports_a_file(tmp_path, capsys):
+    slot = VendingMachineSlotFactory(row=0, column=0, quantity=1)
+    path = tmp_path / "restock.csv"
+    path.write_text("".join(csv_lines((slot.machine_id, slot.product_id, 0, 0, 9))))
+
+    call_command("restock", str(path))
+
+    assert capsys.readouterr().out == "Created 0 slots, updated 1, 0 lines failed\n"
+    assert VendingMachineSlot.objects.get().quantity == 9
+
+
+@pytest.mark.django_db
+def test_import_stops_at_a_malformed_line_and_keeps_the_lines_before(settings):
+    settings.VENDING_RESTOCK_BATCH_SIZE = 2
+    slot = VendingMachineSlotFactory(row=0, column=0, quantity=1)
+    lines = csv_lines(
+        (slot.machine_id, slot.product_id, 0, 0, 5),
+        (slot.machine_id, slot.product_id, 0, 1, 6),
+        (slot.machine_id, slot.product_id, 0, 2, 7),
+    )
+    lines += ["x" * (csv.field_size_limit() + 1) + "\n", "4,5\n"]
+
+    report = import_slots(lines, "csv")
+
+    assert (report.created, report.updated, report.errors) == (2, 1, [])
+    assert report.unreadable is not None
+    assert [quantity for *_, quantity in slot_positions()] == [5, 6, 7]
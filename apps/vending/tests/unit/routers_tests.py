@@ -0,0 +1,119 @@
+import random
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import Client, RequestFactory
+
+from apps.vending.authentication import issue_token
+from apps.vending.middleware import ReplicaMiddleware
+from apps.vending.models import Buyer, Product, VendingMachine, VendingMachineSlot
+from apps.vending.routers import ReplicaRouter, copy_primary
+
+
+@pytest.fixture
+def replica(settings, transactional_db, tmp_path):
+    connections.settings["replica"] = {
+        **connection.settings_dict,
+        "NAME": str(tmp_path / "replica.sqlite3"),
+    }
+    settings.VENDING_READ_REPLICAS = ["replica"]
+    yield "replica"
+    connections["replica"].close()
+    del connections["replica"]
+    del connections.settings["replica"]
+
+
+@pytest.fixture
+def slot() -> VendingMachineSlot:
+    return VendingMachineSlot.objects.create(
+        machine=VendingMachine.objects.create(name="Machine"),
+        product=Product.objects.create(name="Snack", price="1.00"),
+        row=0,
+        column=0,
+        quantity=5,
+    )
+
+
+def slot_quantities(client: Client) -> list[int]:
+    return [slot["quantity"] for slot in client.get("/slots/").json()]
+
+
+def test_read_endpoints_read_from_the_replica(replica, slot):
+    copy_primary(replica)
+    VendingMachineSlot.objects.update(quantity=4)
+
+    assert slot_quantities(Client()) == [5]
+    assert VendingMachineSlot.objects.get().quantity == 4
+
+
+def test_clients_that_wrote_read_from_the_primary(replica, slot):
+    user = User.objects.create_user("jorge", password="password")
+    Buyer.objects.create(user=user, credit="5.00")
+    copy_primary(replica)
+    VendingMachineSlot.objects.update(quantity=4)
+    client = Client()
+
+    assert slot_quantities(client) == [5]
+    client.force_login(user)
+    response = client.post("/order/", {"slot_id": slot.id, "quantity": 1})
+
+    assert response.status_code == 200
+    assert slot_quantities(client) == [3]
+    # Everyone else still reads from the replica.
+    assert slot_quantities(Client()) == [5]
+
+
+@pytest.mark.parametrize("async_views", [False, True])
+def test_revoked_tokens_fail_on_replica_reads(replica, request, async_views):
+    if async_views:
+        request.getfixturevalue("async_reads")
+    user = User.objects.create_user("jorge", password="password")
+    token = issue_token(Buyer.objects.create(user=user, credit="5.00"))
+    copy_primary(replica)
+
+    Client().post("/logout/", HTTP_AUTHORIZATION=f"Token {token}")
+    response = Client().get("/profile/", HTTP_AUTHORIZATION=f"Token {token}")
+
+    assert response.status_code == 401
+
+
+def test_sessions_newer_than_the_replica_are_read(replica):
+    user = User.objects.create_user("jorge", password="password")
+    Buyer.objects.create(user=user, credit="5.00")
+    copy_primary(replica)
+    # Logging in without a request leaves the client unpinned, as it is once
+    # VENDING_REPLICA_PIN_SECONDS have passed.
+    client = Client()
+    client.force_login(user)
+
+    response = client.get("/profile/")
+
+    assert response.status_code == 200
+
+
+def test_async_read_endpoints_read_from_the_replica(replica, slot, async_reads):
+    copy_primary(replica)
+    VendingMachineSlot.objects.update(quantity=4)
+
+    assert slot_quantities(Client()) == [5]
+
+
+def test_requests_read_from_one_replica(settings, monkeypatch):
+    settings.VENDING_READ_REPLICAS = ["replica-1", "replica-2", "replica-3"]
+    picks = []
+
+    def choice(replicas):
+        picks.append(replicas[len(picks) % len(replicas)])
+        return picks[-1]
+
+    monkeypatch.setattr(random, "choice", choice)
+    router = ReplicaRouter()
+    middleware = ReplicaMiddleware(
+        lambda request: [router.db_for_read(Product) for _ in range(3)]
+    )
+    request = RequestFactory().get("/slots/")
+
+    assert middleware(request) == ["replica-1"] * 3
+    assert middleware(request) == ["replica-2"] * 3
+    assert picks == ["replica-1", "replica-2"]
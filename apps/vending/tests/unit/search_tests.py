@@ -0,0 +1,128 @@
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, models
+
+from apps.vending import search
+from apps.vending.models import Product
+from apps.vending.search import catalog_products, missing_triggers, search_query
+from apps.vending.tests.unit.product_tests import ProductFactory
+
+
+def names(text: str, limit: int = 10) -> list[str]:
+    return [name for _, name, _ in catalog_products(text, limit)]
+
+
+@pytest.mark.parametrize(
+    "text, query",
+    [
+        ("cola", '"cola"*'),
+        ("Coca  cola!", '"Coca"* "cola"*'),
+        ('name:"x" OR y*', '"name"* "x"* "OR"* "y"*'),
+        ("  -* ", None),
+    ],
+)
+def test_search_query(text, query):
+    assert search_query(text) == query
+
+
+@pytest.mark.django_db
+def test_search_matches_word_prefixes_ranked():
+    for name in ["Coca Cola Zero", "Coca Cola", "Chocolate", "Cocoa biscuits"]:
+        ProductFactory(name=name)
+
+    # bm25 ranks shorter names first.
+    assert names("coc") == ["Coca Cola", "Cocoa biscuits", "Coca Cola Zero"]
+    assert names("cola co") == ["Coca Cola", "Coca Cola Zero"]
+    assert names("coca", limit=1) == ["Coca Cola"]
+    assert names("zzz") == []
+    assert names("!") == []
+
+
+@pytest.mark.django_db
+def test_broad_searches_rank_names_starting_with_the_search_first(monkeypatch):
+    monkeypatch.setattr(search, "RANKED_MATCHES", 2)
+    for name in ["Diet cola can", "Big cola pack", "Cola"]:
+        ProductFactory(name=name)
+
+    assert names("cola", limit=2) == ["Cola", "Diet cola can"]
+
+
+@pytest.mark.django_db
+def test_search_ignores_case_and_accents():
+    ProductFactory(name="Ñandú crème")
+
+    assert names("NANDU creme") == ["Ñandú crème"]
+
+
+@pytest.mark.django_db
+def test_index_follows_every_product_write():
+    water = ProductFactory(name="Water")
+    Product.objects.bulk_create(
+        [Product(name="Sparkling water", price=Decimal("1.00"))]
+    )
+    assert names("water") == ["Water", "Sparkling water"]
+
+    water.name = "Juice"
+    water.save()
+    Product.objects.filter(name="Sparkling water").update(name="Soda")
+    assert names("water") == []
+    assert names("juice") == ["Juice"]
+    assert names("soda") == ["Soda"]
+
+    water.delete()
+    Product.objects.all().delete()
+    assert names("juice") == names("soda") == []
+
+
+@pytest.mark.django_db
+def test_catalog_without_search_lists_products_by_name():
+    for name in ["banana", "Apple", "cherry"]:
+        ProductFactory(name=name)
+
+    assert [name for _, name, _ in catalog_products(None, 2)] == ["Apple", "banana"]
+
+
+@pytest.mark.django_db
+def test_rebuild_command_restores_the_index(capsys):
+    ProductFactory(name="Water")
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM product_search")
+    assert names("water") == []
+
+    call_command("rebuild_product_search")
+
+    assert names("water") == ["Water"]
+    assert capsys.readouterr().out == "Rebuilt the product search index\n"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_index_survives_a_rebuild_of_the_product_table():
+    for name in ["Water", "Juice", "Soda"]:
+        ProductFactory(name=name)
+    Product.objects.filter(name="Water").delete()
+    name = Product._meta.get_field("name")
+    altered = models.CharField(max_length=name.max_length + 1)
+    altered.set_attributes_from_name("name")
+
+    # Like a migration's AlterField: SQLite copies the table, renumbering its
+    # rowids, and drops its triggers.
+    with connection.schema_editor() as editor:
+        editor.alter_field(Product, name, altered)
+    try:
+        assert names("juice") == ["Juice"]
+        assert missing_triggers() == [
+            "product_search_delete",
+            "product_search_insert",
+            "product_search_update",
+        ]
+    finally:
+        call_command("rebuild_product_search")
+        with connection.schema_editor() as editor:
+            editor.alter_field(Product, altered, name)
+        call_command("rebuild_product_search")
+
+    assert missing_triggers() == []
+    ProductFactory(name="Sparkling water")
+    assert names("water") == ["Sparkling water"]
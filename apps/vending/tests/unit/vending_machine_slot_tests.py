@@ -1,5 +1,6 @@
 from django import forms
 from apps.vending.tests.unit.product_tests import ProductFactory
+from apps.vending.tests.unit.vending_machine_tests import VendingMachineFactory
 
 import pytest
 import factory
@@ -12,6 +13,7 @@ class VendingMachineSlotFactory(DjangoModelFactory):
     class Meta:
         model = VendingMachineSlot
 
+    machine = factory.SubFactory(VendingMachineFactory)
     product = factory.SubFactory(ProductFactory)
     quantity = 3
     row = 1
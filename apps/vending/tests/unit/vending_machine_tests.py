@@ -0,0 +1,28 @@
+import pytest
+from factory.django import DjangoModelFactory
+
+from apps.vending.models import VendingMachine
+
+
+class VendingMachineFactory(DjangoModelFactory):
+    class Meta:
+        model = VendingMachine
+        django_get_or_create = ("name",)
+
+    name = "Abacum office"
+
+
+@pytest.mark.django_db
+def test_vending_machine_creation():
+    test_vending_machine = VendingMachineFactory()
+
+    stored_vending_machine = VendingMachine.objects.get(id=test_vending_machine.id)
+
+    assert stored_vending_machine == test_vending_machine
+    assert str(stored_vending_machine) == "Abacum office"
+
+
+@pytest.mark.django_db
+def test_vending_machine_factory_reuses_machine_by_name():
+    assert VendingMachineFactory() == VendingMachineFactory()
+    assert VendingMachineFactory(name="Lobby") != VendingMachineFactory()
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+
+from apps.vending.ledger import NegativeBalance, add_credit
+from apps.vending.models import Buyer
+from apps.vending.writer import WriteQueue, run_write
+
+
+@pytest.fixture
+def buyer() -> Buyer:
+    user = User.objects.create_user("jorge", "jorge@abacum.io", "password")
+    return Buyer.objects.create(user=user, credit=Decimal("5.00"))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_queue_returns_results_and_errors(buyer):
+    write_queue = WriteQueue(batch_size=10)
+
+    futures = [
+        write_queue.submit(add_credit, buyer.pk, Decimal("1.00")),
+        write_queue.submit(add_credit, buyer.pk, Decimal("-100.00")),
+        write_queue.submit(add_credit, buyer.pk, Decimal("2.00")),
+    ]
+
+    assert futures[0].result(timeout=5) == Decimal("6.00")
+    with pytest.raises(NegativeBalance):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == Decimal("8.00")
+    assert Buyer.objects.get().credit == Decimal("8.00")
+
+
+@pytest.mark.django_db
+def test_run_write_calls_through_when_disabled(buyer, settings):
+    settings.VENDING_SINGLE_WRITER = False
+
+    assert run_write(add_credit, buyer.pk, Decimal("1.00")) == Decimal("6.00")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_write_uses_the_queue_when_enabled(buyer, settings):
+    settings.VENDING_SINGLE_WRITER = True
+
+    assert run_write(add_credit, buyer.pk, Decimal("1.00")) == Decimal("6.00")
+    assert Buyer.objects.get().credit == Decimal("6.00")
+
+
+@pytest.mark.django_db
+def test_new_connections_apply_sqlite_pragmas(tmp_path):
+    wrapper = DatabaseWrapper(
+        {
+            **connection.settings_dict,
+            "NAME": str(tmp_path / "pragmas.sqlite3"),
+            "SQLITE_PRAGMAS": {"journal_mode": "wal", "synchronous": "normal"},
+        },
+        alias="pragmas",
+    )
+    wrapper.ensure_connection()
+    try:
+        assert wrapper.connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        # NORMAL is 1.
+        assert wrapper.connection.execute("PRAGMA synchronous").fetchone() == (1,)
+    finally:
+        wrapper.close()
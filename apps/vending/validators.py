@@ -1,5 +1,91 @@
 from rest_framework import serializers
 
+from apps.vending.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    decode_cursor,
+)
+
 
 class ListSlotsValidator(serializers.Serializer):
     quantity = serializers.IntegerField(required=False, min_value=0, default=None)
+    min_quantity = serializers.IntegerField(
+        required=False, min_value=0, max_value=100, default=None
+    )
+    in_stock = serializers.BooleanField(required=False, allow_null=True, default=None)
+    search = serializers.CharField(required=False, max_length=100, default=None)
+    cursor = serializers.CharField(required=False, default=None)
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=MAX_PAGE_SIZE, default=None
+    )
+    stream = serializers.BooleanField(required=False, default=False)
+
+    def validate_cursor(self, value):
+        if value is None:
+            return None
+        try:
+            return decode_cursor(value)
+        except InvalidCursor as error:
+            raise serializers.ValidationError(str(error))
+
+    def validate(self, attrs):
+        if attrs["stream"] and (attrs["cursor"] or attrs["limit"]):
+            raise serializers.ValidationError(
+                "stream cannot be combined with cursor or limit"
+            )
+        if attrs["in_stock"] is False and attrs["min_quantity"]:
+            raise serializers.ValidationError(
+                "in_stock=false cannot be combined with a positive min_quantity"
+            )
+        return attrs
+
+
+class ProductSearchValidator(serializers.Serializer):
+    search = serializers.CharField(required=False, max_length=100, default=None)
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=MAX_PAGE_SIZE, default=DEFAULT_PAGE_SIZE
+    )
+
+
+class LowStockValidator(serializers.Serializer):
+    product_id = serializers.UUIDField(required=False, default=None)
+    quantity = serializers.IntegerField(required=False, min_value=0, default=None)
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=MAX_PAGE_SIZE, default=DEFAULT_PAGE_SIZE
+    )
+
+
+class SlotsMatrixValidator(serializers.Serializer):
+    rows = serializers.IntegerField(
+        required=False, min_value=1, max_value=11, default=None
+    )
+    columns = serializers.IntegerField(
+        required=False, min_value=1, max_value=11, default=None
+    )
+
+
+class OrderLineValidator(serializers.Serializer):
+    slot_id = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1, max_value=100)
+
+
+class OrderValidator(OrderLineValidator):
+    machine_id = serializers.UUIDField(required=False, default=None)
+
+
+class CartValidator(serializers.Serializer):
+    machine_id = serializers.UUIDField(required=False, default=None)
+    lines = OrderLineValidator(many=True, allow_empty=False)
+
+
+class CreditValidator(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class RestockLineValidator(serializers.Serializer):
+    machine_id = serializers.UUIDField()
+    product_id = serializers.UUIDField()
+    row = serializers.IntegerField(min_value=0, max_value=10)
+    column = serializers.IntegerField(min_value=0, max_value=10)
+    quantity = serializers.IntegerField(min_value=0, max_value=100)
@@ -0,0 +1,107 @@
+"""Inventory versions used for cache keys and ETags.
+
+Every change to slots or products bumps the version of the scopes it affects,
+in the same transaction as the change itself:
+
+- ``catalog`` for product changes, since any slot may show the product;
+- ``products`` for new products, which no slot shows yet;
+- ``fleet`` and ``machine:<id>`` for slot changes.
+
+A fleet-wide response depends on ``catalog`` and ``fleet``, a machine scoped
+one on ``catalog`` and its machine, and the product catalog on ``catalog`` and
+``products``. Model saves and deletes are covered by ``apps.vending.signals``.
+Code that writes with ``QuerySet.update``, ``bulk_update`` or ``bulk_create``
+must call ``bump_slots``, ``bump_catalog`` or ``bump_products`` itself.
+"""
+
+from typing import Iterable
+from uuid import UUID
+
+from django.db.models import F
+
+from apps.vending.models import InventoryVersion
+
+CATALOG_SCOPE = "catalog"
+FLEET_SCOPE = "fleet"
+PRODUCTS_SCOPE = "products"
+
+
+def machine_scope(machine_id: UUID) -> str:
+    return f"machine:{machine_id}"
+
+
+def bump_versions(scopes: Iterable[str]) -> None:
+    scopes = set(scopes)
+    bumped = InventoryVersion.objects.filter(scope__in=scopes).update(
+        value=F("value") + 1
+    )
+    if bumped == len(scopes):
+        return
+
+    existing = InventoryVersion.objects.filter(scope__in=scopes).values_list(
+        "scope", flat=True
+    )
+    InventoryVersion.objects.bulk_create(
+        [
+            InventoryVersion(scope=scope, value=1)
+            for scope in scopes.difference(existing)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def bump_slots(machine_ids: Iterable[UUID]) -> None:
+    bump_versions([FLEET_SCOPE, *(machine_scope(id) for id in machine_ids)])
+
+
+def bump_catalog() -> None:
+    bump_versions([CATALOG_SCOPE])
+
+
+def bump_products() -> None:
+    bump_versions([PRODUCTS_SCOPE])
+
+
+def inventory_versions(machine_id: UUID | None) -> tuple[int, int]:
+    """Returns the catalog and slot scope versions a response depends on."""
+    return scope_versions(_slot_scope(machine_id))
+
+
+async def ainventory_versions(machine_id: UUID | None) -> tuple[int, int]:
+    return await ascope_versions(_slot_scope(machine_id))
+
+
+def catalog_versions() -> tuple[int, int]:
+    """Returns the versions the product catalog depends on."""
+    return scope_versions(PRODUCTS_SCOPE)
+
+
+async def acatalog_versions() -> tuple[int, int]:
+    return await ascope_versions(PRODUCTS_SCOPE)
+
+
+def scope_versions(scope: str) -> tuple[int, int]:
+    return _pick_versions(dict(_versions_query(scope)), scope)
+
+
+async def ascope_versions(scope: str) -> tuple[int, int]:
+    versions = {key: value async for key, value in _versions_query(scope)}
+    return _pick_versions(versions, scope)
+
+
+def _slot_scope(machine_id: UUID | None) -> str:
+    return machine_scope(machine_id) if machine_id else FLEET_SCOPE
+
+
+def _versions_query(scope: str):
+    return InventoryVersion.objects.filter(
+        scope__in=[CATALOG_SCOPE, scope]
+    ).values_list("scope", "value")
+
+
+def _pick_versions(versions: dict, scope: str) -> tuple[int, int]:
+    return versions.get(CATALOG_SCOPE, 0), versions.get(scope, 0)
+
+
+def inventory_etag(versions: tuple[int, int]) -> str:
+    return '"inventory-{}-{}"'.format(*versions)
@@ -1,129 +1,367 @@
+import codecs
 import json
-from decimal import Decimal
+from dataclasses import asdict
+from functools import partial
 
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseBadRequest
+from django.db.models import QuerySet
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 
 # from django.contrib.auth.decorators import login_required
-from django.shortcuts import redirect
+from django.shortcuts import get_object_or_404, redirect
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
+from apps.vending.authentication import (
+    TokenClaims,
+    issue_token,
+    request_buyer,
+    revoke_token,
+    user_buyer,
+)
+from apps.vending.cache import catalog_response, inventory_response, not_modified
+from apps.vending.idempotency import idempotent
+from apps.vending.ledger import NegativeBalance, add_credit, refund
 from apps.vending.models import Buyer, VendingMachineSlot
-from apps.vending.serializers import BuyerSerializer, VendingMachineSlotSerializer
-from apps.vending.validators import ListSlotsValidator
+from apps.vending.orders import OrderError, place_cart_order, place_order
+from apps.vending.pagination import DEFAULT_PAGE_SIZE, SLOT_ORDERING, paginate_slots
+from apps.vending.restock import import_slots
+from apps.vending.search import catalog_products, matching_product_ids
+from apps.vending.serializers import (
+    SLOT_FIELDS,
+    BuyerSerializer,
+    VendingMachineSlotSerializer,
+    serialize_product_row,
+    serialize_slot_row,
+)
+from apps.vending.streaming import STREAM_CHUNK_SIZE, stream_json_array
+from apps.vending.validators import (
+    CartValidator,
+    CreditValidator,
+    ListSlotsValidator,
+    LowStockValidator,
+    OrderValidator,
+    ProductSearchValidator,
+    SlotsMatrixValidator,
+)
+from apps.vending.versions import inventory_etag, inventory_versions
+from apps.vending.writer import run_write
+
+
+def machine_filters(kwargs: dict) -> dict:
+    """Scopes slot queries to the machine in the URL, if the route has one."""
+    if machine_id := kwargs.get("machine_id"):
+        return {"machine_id": machine_id}
+    return {}
+
+
+def listed_slots(kwargs: dict, params: dict) -> QuerySet:
+    filters = machine_filters(kwargs)
+    if params["quantity"] is not None:
+        filters["quantity__lte"] = params["quantity"]
+    if params["min_quantity"]:
+        filters["quantity__gte"] = params["min_quantity"]
+    # SQLite only uses a partial index when the query repeats its condition, so
+    # positive minimums also spell out ``quantity > 0`` for slot_in_stock_idx.
+    if params["in_stock"] or params["min_quantity"]:
+        filters["quantity__gt"] = 0
+    elif params["in_stock"] is False:
+        filters["quantity"] = 0
+    if params["search"] is not None:
+        filters["product_id__in"] = matching_product_ids(params["search"])
+    return (
+        VendingMachineSlot.objects.filter(**filters)
+        .order_by(*SLOT_ORDERING)
+        .values_list(*SLOT_FIELDS)
+    )
+
+
+def low_stock_slots(kwargs: dict, params: dict) -> QuerySet:
+    """The ``limit`` emptiest slots, ties in listing order.
+
+    The ordering matches slot_low_stock_idx, or slot_product_stock_idx and
+    slot_machine_stock_idx when scoped, so this reads the first ``limit``
+    entries of an index instead of sorting every slot.
+    """
+    filters = machine_filters(kwargs)
+    if params["product_id"] is not None:
+        filters["product_id"] = params["product_id"]
+    if params["quantity"] is not None:
+        filters["quantity__lte"] = params["quantity"]
+    return (
+        VendingMachineSlot.objects.filter(**filters)
+        .order_by("quantity", *SLOT_ORDERING)
+        .values_list(*SLOT_FIELDS)[: params["limit"]]
+    )
+
+
+def matrix_filters(kwargs: dict, rows: int | None, columns: int | None) -> dict:
+    filters = machine_filters(kwargs)
+    if rows is not None:
+        filters["row__lt"] = rows
+    if columns is not None:
+        filters["column__lt"] = columns
+    return filters
+
+
+# The matrix query also reads each slot's machine, last.
+MATRIX_FIELDS = (*SLOT_FIELDS, "machine_id")
+
+
+class SeveralMachines(Exception):
+    """The slots of a fleet-wide matrix belong to more than one machine."""
+
+    message = "slots of several machines, use /machines/<machine_id>/slots/matrix"
+
+
+def matrix_slots(slot_rows: list[tuple]) -> list[dict]:
+    """Serializes ``MATRIX_FIELDS`` rows, which must come from one machine.
+
+    Machines share grid positions, so a grid of several machines would show one
+    slot per position and hide the others.
+    """
+    if len({slot_row[-1] for slot_row in slot_rows}) > 1:
+        raise SeveralMachines()
+    return [serialize_slot_row(slot_row[:-1]) for slot_row in slot_rows]
+
+
+def slots_matrix(slots: list[dict], rows: int | None, columns: int | None) -> list:
+    # Without explicit dimensions the grid is sized to fit every stored slot.
+    if rows is None:
+        rows = max((slot["coordinates"][1] for slot in slots), default=-1) + 1
+    if columns is None:
+        columns = max((slot["coordinates"][0] for slot in slots), default=-1) + 1
+
+    matrix = [[None] * columns for _ in range(rows)]
+    for slot in slots:
+        column, row = slot["coordinates"]
+        if matrix[row][column] is None:
+            matrix[row][column] = slot
+    return matrix
 
 
 class VendingMachineSlotsView(APIView):
-    def get(self, request: Request) -> Response:
+    read_replica = True
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
         validator = ListSlotsValidator(data=request.query_params)
         validator.is_valid(raise_exception=True)
-        filters = {}
-        if quantity := validator.validated_data["quantity"]:
-            filters["quantity__lte"] = quantity
+        slots = listed_slots(self.kwargs, validator.validated_data)
 
-        slots = VendingMachineSlot.objects.filter(**filters)
-        slots_serializer = VendingMachineSlotSerializer(slots, many=True)
-        return Response(data=slots_serializer.data)
+        if validator.validated_data["stream"]:
+            return self.stream(slots)
+
+        cursor = validator.validated_data["cursor"]
+        limit = validator.validated_data["limit"]
+        if cursor is None and limit is None:
+            build = partial(self.serialize, slots)
+        else:
+            build = partial(self.paginate, slots, cursor, limit or DEFAULT_PAGE_SIZE)
+
+        return inventory_response(request, self.kwargs.get("machine_id"), build)
+
+    def stream(self, slots):
+        etag = inventory_etag(inventory_versions(self.kwargs.get("machine_id")))
+        if not_modified(self.request, etag):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+
+        response = StreamingHttpResponse(
+            stream_json_array(
+                serialize_slot_row(slot)
+                for slot in slots.iterator(chunk_size=STREAM_CHUNK_SIZE)
+            ),
+            content_type="application/json",
+        )
+        response["ETag"] = etag
+        return response
+
+    def serialize(self, slots) -> list:
+        return [serialize_slot_row(slot) for slot in slots]
+
+    def paginate(self, slots, cursor, limit: int) -> dict:
+        page, next_cursor = paginate_slots(slots, cursor, limit)
+        next_url = None
+        if next_cursor is not None:
+            next_url = replace_query_param(
+                self.request.build_absolute_uri(), "cursor", next_cursor
+            )
+        return {
+            "next": next_url,
+            "results": [serialize_slot_row(slot) for slot in page],
+        }
+
+
+class LowStockSlotsView(APIView):
+    read_replica = True
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        validator = LowStockValidator(data=request.query_params)
+        validator.is_valid(raise_exception=True)
+        slots = low_stock_slots(self.kwargs, validator.validated_data)
+
+        return inventory_response(
+            request, self.kwargs.get("machine_id"), partial(self.serialize, slots)
+        )
+
+    def serialize(self, slots) -> list:
+        return [serialize_slot_row(slot) for slot in slots]
 
 
 class VendingMachineSlotsMatrixView(APIView):
-    def get(self, request: Request) -> Response:
-        slots_matrix = [[None, None, None], [None, None, None], [None, None, None]]
-        for row in range(0, 3):
-            for column in range(0, 3):
-                filters = {}
-                filters["row"] = row
-                filters["column"] = column
-                slot = VendingMachineSlot.objects.filter(**filters)
-                if slot is not None:
-                    slots_serializer = VendingMachineSlotSerializer(slot, many=True)
-                    if len(slots_serializer.data) > 0:
-                        slots_matrix[row][column] = slots_serializer.data[0]
-                    else:
-                        slots_matrix[row][column] = None
-                else:
-                    slots_matrix[row][column] = None
-
-        return Response(data=slots_matrix)
+    read_replica = True
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        validator = SlotsMatrixValidator(data=request.query_params)
+        validator.is_valid(raise_exception=True)
+        rows = validator.validated_data["rows"]
+        columns = validator.validated_data["columns"]
+
+        try:
+            return inventory_response(
+                request,
+                self.kwargs.get("machine_id"),
+                partial(self.build_matrix, rows, columns),
+            )
+        except SeveralMachines as error:
+            return HttpResponseBadRequest(content=error.message)
+
+    def build_matrix(self, rows: int | None, columns: int | None) -> list:
+        filters = matrix_filters(self.kwargs, rows, columns)
+        slots = matrix_slots(
+            VendingMachineSlot.objects.filter(**filters)
+            .order_by("row", "column")
+            .values_list(*MATRIX_FIELDS)
+        )
+        return slots_matrix(slots, rows, columns)
 
 
 class VendingMachineSlotView(APIView):
+    read_replica = True
+
     def get(self, request, *args, **kwargs):
         id = self.kwargs["id"]
         if id is not None:
-            slot = VendingMachineSlot.objects.get(id=id)
-            slots_serializer = VendingMachineSlotSerializer(slot)
-        return Response(data=slots_serializer.data)
+            response = inventory_response(
+                request,
+                self.kwargs.get("machine_id"),
+                lambda: VendingMachineSlotSerializer(
+                    get_object_or_404(
+                        VendingMachineSlot, id=id, **machine_filters(self.kwargs)
+                    )
+                ).data,
+            )
+        return response
+
+
+class ProductsView(APIView):
+    read_replica = True
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        validator = ProductSearchValidator(data=request.query_params)
+        validator.is_valid(raise_exception=True)
+
+        return catalog_response(
+            request,
+            partial(
+                self.search,
+                validator.validated_data["search"],
+                validator.validated_data["limit"],
+            ),
+        )
+
+    def search(self, text: str | None, limit: int) -> list:
+        return [serialize_product_row(row) for row in catalog_products(text, limit)]
 
 
 class BuyerCreditView(APIView):
+    @idempotent
     def post(self, request, *args, **kwargs):
-        amount = request.data["amount"]
-        buyer = Buyer.objects.filter(user=request.user).first()
+        validator = CreditValidator(data=request.data)
+        validator.is_valid(raise_exception=True)
+        buyer = request_buyer(request)
         if buyer is None:
             return HttpResponseBadRequest(content="user not logged in")
 
-        current_amount = float(buyer.credit)
-        new_amount = current_amount + float(amount)
-
-        if new_amount < 0:
+        try:
+            new_amount = run_write(
+                add_credit, buyer.pk, validator.validated_data["amount"]
+            )
+        except NegativeBalance:
             return HttpResponseBadRequest(content="cannot have negative salary")
 
-        buyer.credit = Decimal(new_amount)
-        buyer.save()
-
         return Response(data={"balance": new_amount})
 
 
 class BuyerRefundView(APIView):
     def post(self, request, *args, **kwargs):
-        buyer = Buyer.objects.filter(user=request.user).first()
+        buyer = request_buyer(request)
         if buyer is None:
             return HttpResponseBadRequest(content="user not logged in")
 
-        buyer.credit = Decimal("0.00")
-        buyer.save()
-
-        return Response(data={"balance": buyer.credit})
+        return Response(data={"balance": run_write(refund, buyer.pk)})
 
 
 class BuyerOrderView(APIView):
+    @idempotent
     def post(self, request):
-        slot_id = request.data["slot_id"]
-        quantity = request.data["quantity"]
-        vending_machine_slot = VendingMachineSlot.objects.filter(id=slot_id).first()
-        buyer = Buyer.objects.filter(user=request.user).first()
+        validator = OrderValidator(data=request.data)
+        validator.is_valid(raise_exception=True)
+        buyer = request_buyer(request)
         if buyer is None:
             return HttpResponseBadRequest(content="user not logged in")
 
-        current_amount = float(buyer.credit)
-        product_price = float(vending_machine_slot.product.price)
-        total_product_price = int(quantity) * product_price
+        try:
+            balance = run_write(
+                place_order,
+                buyer,
+                validator.validated_data["slot_id"],
+                validator.validated_data["quantity"],
+                machine_id=validator.validated_data["machine_id"],
+            )
+        except OrderError as error:
+            return HttpResponseBadRequest(content=str(error))
 
-        if total_product_price > current_amount:
-            return HttpResponseBadRequest(content="Money not enough to buy products")
+        return Response(data={"balance": balance})
 
-        vending_machine_slot_quantity = vending_machine_slot.quantity
-        if vending_machine_slot_quantity - int(quantity) == 0:
-            vending_machine_slot.delete()
-        else:
-            vending_machine_slot.quantity -= 1
-            vending_machine_slot.save()
 
-        buyer.credit = Decimal(current_amount - total_product_price)
-        buyer.save()
+class CartOrderView(APIView):
+    @idempotent
+    def post(self, request):
+        validator = CartValidator(data=request.data)
+        validator.is_valid(raise_exception=True)
+        buyer = request_buyer(request)
+        if buyer is None:
+            return HttpResponseBadRequest(content="user not logged in")
 
-        return Response(data={"balance": buyer.credit})
+        try:
+            balance = run_write(
+                place_cart_order,
+                buyer,
+                [
+                    (line["slot_id"], line["quantity"])
+                    for line in validator.validated_data["lines"]
+                ],
+                machine_id=validator.validated_data["machine_id"],
+            )
+        except OrderError as error:
+            return HttpResponseBadRequest(content=str(error))
+
+        return Response(data={"balance": balance})
 
 
 class ProfileView(APIView):
+    read_replica = True
+
     def get(self, request: Request) -> Response:
-        if request.user.is_authenticated:
-            buyer = Buyer.objects.get(user=request.user)
+        buyer = request_buyer(request)
+        if buyer is not None:
             buyer_serializer = BuyerSerializer(buyer)
             return Response(data=buyer_serializer.data)
         else:
@@ -138,13 +376,13 @@ class LoginView(APIView):
         if user is not None:
             login(self.request, user)
 
-            buyer = Buyer.objects.filter(user=user).first()
+            buyer = user_buyer(user)
             if not buyer:
                 buyer = Buyer.objects.create(user=user, credit=0)
 
             buyer_serializer = BuyerSerializer(buyer)
             return Response(
-                data=buyer_serializer.data
+                data={**buyer_serializer.data, "token": issue_token(buyer)}
             )
         else:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -152,5 +390,33 @@ class LoginView(APIView):
 
 class LogoutView(APIView):
     def post(self, request: Request) -> Response:
-        logout(request)
+        if isinstance(request.auth, TokenClaims):
+            revoke_token(request.auth)
+        else:
+            logout(request)
         return Response(status=status.HTTP_200_OK)
+
+
+class RestockView(APIView):
+    """Imports slot lines streamed as CSV or JSON Lines, see ``restock``."""
+
+    permission_classes = [IsAdminUser]
+    formats = {
+        "text/csv": "csv",
+        "application/jsonl": "jsonl",
+        "application/x-ndjson": "jsonl",
+    }
+
+    def post(self, request: Request) -> Response:
+        format = self.formats.get(request.content_type.split(";")[0].strip())
+        if format is None:
+            return HttpResponseBadRequest(content="send text/csv or application/jsonl")
+
+        # Read from the request stream, line by line, instead of the body.
+        lines = codecs.iterdecode(request._request, "utf-8-sig")
+        report = import_slots(lines, format)
+
+        # The lines before an unreadable one are applied all the same.
+        if report.unreadable is not None:
+            return Response(data=asdict(report), status=status.HTTP_400_BAD_REQUEST)
+        return Response(data=asdict(report))
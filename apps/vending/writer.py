@@ -0,0 +1,115 @@
+"""Optional single-writer queue for the write endpoints.
+
+SQLite allows one writer at a time. With many request threads, every write
+competes for the lock and waits in SQLite's busy handler, which sleeps and
+retries and still fails once the busy timeout runs out. With
+``VENDING_SINGLE_WRITER`` the views hand their writes to one thread per process
+instead. It applies them one at a time, with no lock contention inside the
+process, and commits up to ``VENDING_WRITE_BATCH_SIZE`` writes per transaction,
+so a burst of orders pays for one commit instead of one each.
+
+Every write runs in its own savepoint, so a failing one (e.g. an order that is
+out of stock) is rolled back alone and its exception is raised in the request
+thread as usual. Results are only returned once the batch is committed.
+Processes still contend with each other, through the busy timeout.
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from apps.vending.models import InventoryVersion
+
+
+class WriteQueue:
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self._jobs = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        self._jobs.put((future, fn, args, kwargs))
+        self._start()
+        return future
+
+    def run(self, fn: Callable, *args, **kwargs):
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._work, name="vending-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _work(self) -> None:
+        while True:
+            batch = [self._jobs.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            close_old_connections()
+            self._apply(batch)
+
+    def _apply(self, batch: list) -> None:
+        outcomes = []
+        try:
+            with transaction.atomic():
+                self._lock_database()
+                for future, fn, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, fn(*args, **kwargs), None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            # The batch was rolled back, so none of its writes happened.
+            for future, *_ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _lock_database(self) -> None:
+        # A write that matches nothing still takes SQLite's write lock, so no
+        # other process can commit between the reads and the writes of the batch.
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {InventoryVersion._meta.db_table} SET value = value WHERE 0"
+                )
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def write_queue() -> WriteQueue:
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue(settings.VENDING_WRITE_BATCH_SIZE)
+    return _write_queue
+
+
+def run_write(fn: Callable, *args, **kwargs):
+    """Runs ``fn`` through the write queue if it is enabled, or right away."""
+    if settings.VENDING_SINGLE_WRITER:
+        return write_queue().run(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
@@ -0,0 +1,64 @@
+"""Admin changelists and searches on large slot and buyer tables."""
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+
+from apps.vending.models import Buyer, Product, VendingMachine, VendingMachineSlot
+from benchmarks.utils import measure, report
+
+TABLE_SIZES = [10_000, 100_000, 300_000]
+GRID_SIZE = 11
+
+
+def grow_tables(rows: int) -> None:
+    """Grows the slot and buyer tables to ``rows`` rows each."""
+    products = list(Product.objects.all()) or Product.objects.bulk_create(
+        Product(name=f"Product {i:04}", price="1.00") for i in range(1_000)
+    )
+    machines = (rows - VendingMachineSlot.objects.count()) // GRID_SIZE**2
+    fleet = VendingMachine.objects.bulk_create(
+        VendingMachine(name=f"Machine {i}") for i in range(machines)
+    )
+    VendingMachineSlot.objects.bulk_create(
+        (
+            VendingMachineSlot(
+                machine=machine,
+                product=products[(index + row * GRID_SIZE + column) % len(products)],
+                row=row,
+                column=column,
+                quantity=(row + column) % 10,
+            )
+            for index, machine in enumerate(fleet)
+            for row in range(GRID_SIZE)
+            for column in range(GRID_SIZE)
+        ),
+        batch_size=5_000,
+    )
+
+    existing = User.objects.count()
+    users = User.objects.bulk_create(
+        (User(username=f"buyer-{i:07}", password="!") for i in range(existing, rows)),
+        batch_size=5_000,
+    )
+    Buyer.objects.bulk_create((Buyer(user=user) for user in users), batch_size=5_000)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+@pytest.mark.django_db
+def test_bench_admin(admin_client):
+    rows = []
+    for size in TABLE_SIZES:
+        grow_tables(size)
+        for path in [
+            "/admin/vending/vendingmachineslot/",
+            "/admin/vending/vendingmachineslot/?q=%22product+0042%22",
+            "/admin/vending/vendingmachineslot/?stock=empty",
+            "/admin/vending/buyer/",
+            "/admin/vending/buyer/?q=buyer-00042",
+        ]:
+            result = measure(lambda: admin_client.get(path), iterations=10)
+            rows.append({"rows": size, "path": path, **result})
+
+    report("admin changelists", rows)
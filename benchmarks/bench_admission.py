@@ -0,0 +1,103 @@
+"""Order latency under overload, with and without shedding writes.
+
+``CLIENTS`` threads post orders through the test client as fast as they can.
+Without a cap every order waits on SQLite's write lock behind all the others;
+with ``VENDING_MAX_INFLIGHT_WRITES`` the orders beyond it are answered with a
+503 at once and the admitted ones keep their latency. Shed clients back off for
+their ``Retry-After``, scaled down by ``BACKOFF_SCALE`` to keep the run short.
+"""
+
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+
+from apps.vending.authentication import issue_token
+from apps.vending.models import Buyer, Product, VendingMachine, VendingMachineSlot
+from benchmarks.utils import percentile, report
+
+CLIENTS = 32
+ORDERS_PER_CLIENT = 20
+WRITE_LIMITS = [None, 8, 2]
+BACKOFF_SCALE = 0.02
+
+
+def run_clients(clients: list[Client], slot_id) -> dict:
+    latencies = {}
+    barrier = threading.Barrier(len(clients))
+    lock = threading.Lock()
+
+    def client(http_client: Client) -> None:
+        barrier.wait()
+        try:
+            for _ in range(ORDERS_PER_CLIENT):
+                start = time.perf_counter()
+                response = http_client.post(
+                    "/order/",
+                    {"slot_id": str(slot_id), "quantity": 1},
+                    content_type="application/json",
+                )
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.setdefault(response.status_code, []).append(elapsed)
+                if retry_after := response.get("Retry-After"):
+                    time.sleep(int(retry_after) * BACKOFF_SCALE)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    admitted = latencies.pop(200, [])
+    shed = latencies.pop(503, [])
+    return {
+        "ok": len(admitted),
+        "shed": len(shed),
+        "errors": sum(len(samples) for samples in latencies.values()),
+        "ok_p50_ms": percentile(admitted, 50),
+        "ok_p95_ms": percentile(admitted, 95),
+        "shed_p95_ms": percentile(shed or [0.0], 95),
+        "orders_per_s": len(admitted) / elapsed,
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bench_admission(settings):
+    slot = VendingMachineSlot.objects.create(
+        machine=VendingMachine.objects.create(name="Busy machine"),
+        product=Product.objects.create(name="Water", price=Decimal("0.10")),
+        row=0,
+        column=0,
+        quantity=1_000,
+    )
+    clients = [
+        Client(
+            HTTP_AUTHORIZATION="Token "
+            + issue_token(
+                Buyer.objects.create(
+                    user=User.objects.create(username=f"client-{i}"),
+                    credit=Decimal("1000"),
+                )
+            )
+        )
+        for i in range(CLIENTS)
+    ]
+
+    rows = []
+    for limit in WRITE_LIMITS:
+        settings.VENDING_MAX_INFLIGHT_WRITES = limit
+        VendingMachineSlot.objects.filter(id=slot.id).update(quantity=1_000)
+        rows.append({"max_inflight_writes": limit, **run_clients(clients, slot.id)})
+
+    report(f"{CLIENTS} clients ordering at once", rows)
+    assert rows[-1]["shed"] > 0
+    assert rows[-1]["ok_p95_ms"] < rows[0]["ok_p95_ms"]
@@ -0,0 +1,101 @@
+"""Concurrent reads through the ASGI handler, sync vs async views.
+
+Each burst fires ``concurrency`` requests at once through ``AsyncClient``, which
+drives Django's ASGI handler in-process, over a mix of the read endpoints.
+``sync`` serves them with the DRF views, each request holding a thread for its
+whole duration; ``async`` routes them to ``apps.vending.async_views``.
+Both run the same queries against one SQLite file, whose calls still go
+through the ORM's thread, so expect the gap to be modest here.
+"""
+
+import asyncio
+import statistics
+import time
+from importlib import reload
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client
+from django.urls import clear_url_caches
+
+import vending_machine.urls
+from apps.vending.models import Buyer, Product, VendingMachine, VendingMachineSlot
+from benchmarks.utils import percentile, report
+
+CONCURRENCY = [50, 200, 500]
+GRID_SIZE = 11
+
+
+@pytest.fixture
+def paths() -> list[str]:
+    machine = VendingMachine.objects.create(name="ASGI bench")
+    product = Product.objects.create(name="Async bar", price="0.10")
+    slots = VendingMachineSlot.objects.bulk_create(
+        VendingMachineSlot(
+            machine=machine, product=product, row=row, column=column, quantity=5
+        )
+        for row in range(GRID_SIZE)
+        for column in range(GRID_SIZE)
+    )
+    return [
+        "/slots/",
+        "/slots/matrix",
+        f"/slots/{slots[0].id}",
+        f"/machines/{machine.id}/slots/?limit=20",
+        "/healthcheck/",
+    ]
+
+
+@pytest.fixture
+def token() -> str:
+    user = User.objects.create_user("bench", password="password")
+    Buyer.objects.create(user=user, credit=0)
+    login = Client().post("/login/", {"username": "bench", "password": "password"})
+    return login.json()["token"]
+
+
+def use_async_reads(settings, enabled: bool) -> None:
+    settings.VENDING_ASYNC_READS = enabled
+    reload(vending_machine.urls)
+    clear_url_caches()
+
+
+async def burst(paths: list[str], token: str, concurrency: int) -> dict:
+    client = AsyncClient()
+    headers = {"Authorization": f"Token {token}"}
+    requests = [*paths, "/profile/"]
+
+    async def timed(path: str) -> float:
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        assert response.status_code == 200, path
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    samples = await asyncio.gather(
+        *(timed(requests[i % len(requests)]) for i in range(concurrency))
+    )
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_s": concurrency / elapsed,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bench_async_reads(settings, paths, token):
+    rows = []
+    try:
+        for mode in ["sync", "async"]:
+            use_async_reads(settings, mode == "async")
+            asyncio.run(burst(paths, token, 10))  # warm up
+            for concurrency in CONCURRENCY:
+                result = asyncio.run(burst(paths, token, concurrency))
+                rows.append({"views": mode, "concurrency": concurrency, **result})
+    finally:
+        use_async_reads(settings, False)
+
+    report("concurrent reads through ASGI", rows)
@@ -0,0 +1,61 @@
+"""Queries and latency per authenticated request, session vs signed token."""
+
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+
+from apps.vending.models import Buyer, Product, VendingMachine, VendingMachineSlot
+from benchmarks.utils import measure, report
+
+ITERATIONS = 300
+
+
+@pytest.fixture
+def slot() -> VendingMachineSlot:
+    return VendingMachineSlot.objects.create(
+        machine=VendingMachine.objects.create(name="Auth bench"),
+        product=Product.objects.create(name="Auth bar", price="0.10"),
+        row=0,
+        column=0,
+        quantity=10 * ITERATIONS,
+    )
+
+
+def logged_in_client(mode: str) -> Client:
+    user = User.objects.create_user(f"bench-{mode}", password="password")
+    Buyer.objects.create(user=user, credit=Decimal("0.00"))
+    client = Client()
+    login = client.post("/login/", {"username": user.username, "password": "password"})
+    if mode == "token":
+        client = Client(HTTP_AUTHORIZATION=f"Token {login.json()['token']}")
+    return client
+
+
+@pytest.mark.django_db
+def test_bench_auth(slot):
+    rows = []
+    for mode in ["session", "token"]:
+        client = logged_in_client(mode)
+        requests = {
+            "/add-credit/": lambda: client.post("/add-credit/", {"amount": 1}),
+            "/order/": lambda: client.post(
+                "/order/", {"slot_id": slot.id, "quantity": 1}
+            ),
+            "/refund/": lambda: client.post("/refund/"),
+            "/profile/": lambda: client.get("/profile/"),
+        }
+        for path, request in requests.items():
+            rows.append(
+                {"auth": mode, "endpoint": path, **measure(request, ITERATIONS)}
+            )
+
+    report("authenticated requests", rows)
+
+    # A token costs a lookup of its revocation instead of loading the session,
+    # so it never needs more queries and saves one wherever the user is loaded.
+    session = {row["endpoint"]: row["queries"] for row in rows[: len(rows) // 2]}
+    for row in rows[len(rows) // 2 :]:
+        assert row["queries"] <= session[row["endpoint"]]
+    assert any(row["queries"] < session[row["endpoint"]] for row in rows[4:])
@@ -0,0 +1,133 @@
+"""Concurrent top-ups and orders against the credit of a single buyer.
+
+Every client adds 1.00 and then takes one unit of stock while paying 0.10,
+``ROUNDS`` times. ``ledger`` appends entries through ``apps.vending.ledger``,
+``hot-row`` applies the same changes with conditional
+``UPDATE ... SET credit_cents = credit_cents + n`` statements on the buyer row
+and ``read-modify-write`` replays the original float arithmetic.
+
+SQLite serialises every writer on the database lock, so here the ledger is
+about exact, uncapped balances without a hot row rather than raw throughput.
+"""
+
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+
+from apps.vending.ledger import add_credit, append_entry, compact_ledger
+from apps.vending.models import (
+    Buyer,
+    CreditEntry,
+    Product,
+    VendingMachine,
+    VendingMachineSlot,
+)
+from benchmarks.utils import report
+
+CLIENT_COUNTS = [1, 2, 4, 8, 16]
+ROUNDS = 25
+
+
+def ledger_round(buyer: Buyer, slot_id) -> None:
+    add_credit(buyer.pk, Decimal("1.00"))
+    with transaction.atomic():
+        VendingMachineSlot.objects.filter(id=slot_id, quantity__gte=1).update(
+            quantity=F("quantity") - 1
+        )
+        append_entry(buyer.pk, -10, CreditEntry.Kind.ORDER)
+
+
+def hot_row_round(buyer: Buyer, slot_id) -> None:
+    Buyer.objects.filter(pk=buyer.pk).update(credit_cents=F("credit_cents") + 100)
+    with transaction.atomic():
+        VendingMachineSlot.objects.filter(id=slot_id, quantity__gte=1).update(
+            quantity=F("quantity") - 1
+        )
+        Buyer.objects.filter(pk=buyer.pk, credit_cents__gte=10).update(
+            credit_cents=F("credit_cents") - 10
+        )
+
+
+def read_modify_write_round(buyer: Buyer, slot_id) -> None:
+    buyer = Buyer.objects.get(pk=buyer.pk)
+    buyer.credit_cents = int((float(buyer.credit_cents) / 100 + 1.0) * 100)
+    buyer.save()
+    VendingMachineSlot.objects.filter(id=slot_id).update(quantity=F("quantity") - 1)
+    buyer = Buyer.objects.get(pk=buyer.pk)
+    buyer.credit_cents = int((float(buyer.credit_cents) / 100 - 0.1) * 100)
+    buyer.save()
+
+
+STRATEGIES = {
+    "ledger": ledger_round,
+    "hot-row": hot_row_round,
+    "read-modify-write": read_modify_write_round,
+}
+
+
+def run_clients(round_fn, buyer: Buyer, slot_id, clients: int) -> dict:
+    errors = [0] * clients
+    barrier = threading.Barrier(clients)
+
+    def client(index: int) -> None:
+        barrier.wait()
+        try:
+            for _ in range(ROUNDS):
+                try:
+                    round_fn(buyer, slot_id)
+                except OperationalError:
+                    errors[index] += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {"elapsed": time.perf_counter() - start, "lock_errors": sum(errors)}
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_bench_credit_contention(strategy):
+    machine = VendingMachine.objects.create(name="Contended machine")
+    product = Product.objects.create(name="Contended bar", price="0.10")
+    rows = []
+    for clients in CLIENT_COUNTS:
+        buyer = Buyer.objects.create(
+            user=User.objects.create(username=f"{strategy}-{clients}"), credit=0
+        )
+        slot = VendingMachineSlot.objects.create(
+            machine=machine,
+            product=product,
+            row=0,
+            column=0,
+            quantity=clients * ROUNDS,
+        )
+
+        result = run_clients(STRATEGIES[strategy], buyer, slot.id, clients)
+
+        compact_ledger()
+        buyer.refresh_from_db()
+        expected_cents = clients * ROUNDS * 90
+        operations = clients * ROUNDS * 2
+        rows.append(
+            {
+                "clients": clients,
+                "balance_cents": buyer.credit_cents,
+                "lost_cents": expected_cents - buyer.credit_cents,
+                "lock_errors": result["lock_errors"],
+                "credit_ops_per_s": operations / result["elapsed"],
+            }
+        )
+        if strategy != "read-modify-write":
+            assert buyer.credit_cents == expected_cents
+
+    report(f"credit contention ({strategy})", rows)
@@ -0,0 +1,357 @@
+"""Latency and query counts of every route, checked against stored budgets.
+
+The database is seeded at each of ``SIZES`` and every route in
+``vending_machine.urls`` is requested ``ITERATIONS`` times. Buyers use tokens,
+the admin pages a superuser session. Results are saved as JSON under
+``BENCH_RESULTS_DIR`` (``benchmarks/results`` by default) and compared with the
+previous run.
+
+The test fails when an endpoint runs more queries than its budget in
+``budgets.json``, when its p95 latency exceeds the budget for the size, or when
+a route has no benchmark. Query budgets do not depend on the size, so N+1
+queries fail on the first run that has them. Latency budgets are multiplied by
+``BENCH_LATENCY_FACTOR`` for slower machines. ``BENCH_UPDATE_BUDGETS=1``
+rewrites ``budgets.json`` from the current run::
+
+    python -m pytest benchmarks/bench_endpoints.py -s -p no:warnings
+"""
+
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+import django
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import URLPattern, get_resolver
+
+from apps.vending.authentication import issue_token
+from apps.vending.ledger import add_credit
+from apps.vending.models import Buyer, Product, VendingMachine, VendingMachineSlot
+from benchmarks.utils import measure, report
+
+BENCHMARKS_DIR = Path(__file__).parent
+BUDGETS_PATH = BENCHMARKS_DIR / "budgets.json"
+RESULTS_DIR = Path(os.environ.get("BENCH_RESULTS_DIR", BENCHMARKS_DIR / "results"))
+LATENCY_FACTOR = float(os.environ.get("BENCH_LATENCY_FACTOR", "1"))
+
+# Machines with a full 11x11 grid, and buyers.
+SIZES = {
+    "small": (1, 10),
+    "medium": (10, 100),
+    "large": (50, 1_000),
+}
+GRID_SIZE = 11
+ITERATIONS = 20
+STOCK = 1_000_000
+METRICS_TOKEN = "benchmark"
+
+
+def seed(machines: int, buyers: int) -> SimpleNamespace:
+    products = Product.objects.bulk_create(
+        Product(name=f"Product {i}", price="0.50") for i in range(GRID_SIZE)
+    )
+    fleet = VendingMachine.objects.bulk_create(
+        VendingMachine(name=f"Machine {i}") for i in range(machines)
+    )
+    VendingMachineSlot.objects.bulk_create(
+        (
+            VendingMachineSlot(
+                machine=machine,
+                product=products[column],
+                row=row,
+                column=column,
+                quantity=STOCK,
+            )
+            for machine in fleet
+            for row in range(GRID_SIZE)
+            for column in range(GRID_SIZE)
+        ),
+        batch_size=5_000,
+    )
+    users = User.objects.bulk_create(
+        User(username=f"buyer-{i}", password="!") for i in range(buyers)
+    )
+    Buyer.objects.bulk_create(Buyer(user=user, credit=STOCK) for user in users)
+
+    user = User.objects.create_user("benchmark", password="password")
+    buyer = Buyer.objects.create(user=user, credit=STOCK)
+    admin = User.objects.create_superuser("admin", password="password")
+    admin_client = Client()
+    admin_client.force_login(admin)
+    machine = fleet[-1]
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    return SimpleNamespace(
+        machine=machine,
+        slots=list(
+            VendingMachineSlot.objects.filter(machine=machine).order_by("row", "column")
+        ),
+        user=user,
+        buyer=buyer,
+        client=Client(HTTP_AUTHORIZATION=f"Token {issue_token(buyer)}"),
+        session_client=Client(),
+        admin_client=admin_client,
+        metrics_client=Client(HTTP_AUTHORIZATION=f"Bearer {METRICS_TOKEN}"),
+    )
+
+
+def endpoints(data: SimpleNamespace) -> dict:
+    """Maps benchmark names to ``(request, setup)``."""
+    anonymous = Client()
+    client = data.client
+    machine = f"/machines/{data.machine.id}"
+    slot = data.slots[0]
+
+    def log_in():
+        data.session_client.force_login(data.user)
+
+    def top_up():
+        add_credit(data.buyer.pk, Decimal("1.00"))
+
+    def get(path, http_client=anonymous):
+        return lambda: http_client.get(path)
+
+    def stream(path):
+        def request():
+            response = anonymous.get(path)
+            b"".join(response.streaming_content)
+            return response
+
+        return request
+
+    def post(path, payload=None, http_client=client):
+        return lambda: http_client.post(
+            path, payload or {}, content_type="application/json"
+        )
+
+    # Restocks every slot of the machine.
+    restock_csv = "machine_id,product_id,row,column,quantity\n" + "".join(
+        f"{data.machine.id},{slot.product_id},{slot.row},{slot.column},100\n"
+        for slot in data.slots
+    )
+
+    return {
+        "GET /healthcheck/": (get("/healthcheck/"), None),
+        "GET /readiness/": (get("/readiness/"), None),
+        "GET /metrics/": (get("/metrics/", data.metrics_client), None),
+        "GET /slots/": (get("/slots/"), None),
+        "GET /slots/?limit=": (get("/slots/?limit=100"), None),
+        "GET /slots/?stream=": (stream("/slots/?stream=1"), None),
+        "GET /slots/?search=": (get("/slots/?search=product%201"), None),
+        "GET /slots/<id>": (get(f"/slots/{slot.id}"), None),
+        "GET /slots/matrix": (get("/slots/matrix?rows=11&columns=11"), None),
+        "GET /slots/low-stock": (get("/slots/low-stock?limit=20"), None),
+        "GET /machines/<id>/slots/": (get(f"{machine}/slots/"), None),
+        "GET /machines/<id>/slots/<id>": (get(f"{machine}/slots/{slot.id}"), None),
+        "GET /machines/<id>/slots/matrix": (get(f"{machine}/slots/matrix"), None),
+        "GET /machines/<id>/slots/low-stock": (get(f"{machine}/slots/low-stock"), None),
+        "GET /products/": (get("/products/"), None),
+        "GET /products/?search=": (get("/products/?search=prod"), None),
+        "POST /add-credit/": (post("/add-credit/", {"amount": "1.00"}), None),
+        "POST /order/": (
+            post("/order/", {"slot_id": str(slot.id), "quantity": 1}),
+            None,
+        ),
+        "POST /order/cart": (
+            post(
+                "/order/cart",
+                {
+                    "lines": [
+                        {"slot_id": str(cart_slot.id), "quantity": 1}
+                        for cart_slot in data.slots[:5]
+                    ]
+                },
+            ),
+            None,
+        ),
+        # Runs after the orders, which need the credit it refunds.
+        "POST /refund/": (post("/refund/"), top_up),
+        "GET /profile/": (get("/profile/", client), None),
+        "POST /login/": (
+            post(
+                "/login/",
+                {"username": "benchmark", "password": "password"},
+                Client(),
+            ),
+            None,
+        ),
+        "POST /logout/": (post("/logout/", http_client=data.session_client), log_in),
+        "POST /restock/": (
+            lambda: data.admin_client.post(
+                "/restock/", restock_csv, content_type="text/csv"
+            ),
+            None,
+        ),
+        "GET /admin/": (get("/admin/", data.admin_client), None),
+        **{
+            f"GET /admin/vending/{model}/": (
+                get(f"/admin/vending/{model}/", data.admin_client),
+                None,
+            )
+            for model in ["buyer", "product", "vendingmachine", "vendingmachineslot"]
+        },
+    }
+
+
+def expected_status(name: str, machines: int) -> int:
+    # A fleet-wide matrix needs a fleet of one machine, so the larger sizes
+    # measure its rejection.
+    if name == "GET /slots/matrix" and machines > 1:
+        return 400
+    return 200
+
+
+def url_routes(patterns=None, prefix: str = "") -> set[str]:
+    """Every route of the URLconf, with the admin site counted as one."""
+    routes = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLPattern):
+            routes.add(route)
+        elif getattr(pattern, "app_name", None) == "admin":
+            routes.add(route)
+        else:
+            routes |= url_routes(pattern.url_patterns, route)
+    return routes
+
+
+def response_route(response) -> str:
+    # Probes are answered before URL resolution, so resolve the path here.
+    match = get_resolver().resolve(response.wsgi_request.path_info)
+    return "admin/" if match.app_name == "admin" else match.route
+
+
+def check_budget(name: str, size: str, result: dict, budgets: dict) -> list[str]:
+    if name not in budgets:
+        return [f"{name}: no budget in {BUDGETS_PATH.name}"]
+    budget = budgets[name]
+    failures = []
+    if result["max_queries"] > budget["queries"]:
+        failures.append(
+            f"{name} ({size}): {result['max_queries']} queries,"
+            f" budget {budget['queries']}"
+        )
+    p95_budget = budget["p95_ms"][size] * LATENCY_FACTOR
+    if result["p95_ms"] > p95_budget:
+        failures.append(
+            f"{name} ({size}): p95 {result['p95_ms']:.1f}ms,"
+            f" budget {p95_budget:.1f}ms"
+        )
+    return failures
+
+
+def new_budgets(results: list[dict]) -> dict:
+    """Budgets with the current query counts and three times the p95 latency.
+
+    Latency budgets are at least 5ms, which absorbs the noise of fast endpoints.
+    """
+    budgets = {}
+    for result in results:
+        budget = budgets.setdefault(
+            result["endpoint"], {"queries": result["max_queries"], "p95_ms": {}}
+        )
+        budget["queries"] = max(budget["queries"], result["max_queries"])
+        budget["p95_ms"][result["size"]] = max(5, round(result["p95_ms"] * 3))
+    return budgets
+
+
+def save_results(results: list[dict]) -> Path:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=BENCHMARKS_DIR,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    created_at = datetime.now(timezone.utc)
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"endpoints-{created_at:%Y%m%dT%H%M%SZ}.json"
+    path.write_text(
+        json.dumps(
+            {
+                "created_at": created_at.isoformat(),
+                "commit": commit or None,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "latency_factor": LATENCY_FACTOR,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    return path
+
+
+def previous_results() -> dict:
+    runs = sorted(RESULTS_DIR.glob("endpoints-*.json"))
+    if not runs:
+        return {}
+    return {
+        (result["endpoint"], result["size"]): result
+        for result in json.loads(runs[-1].read_text())["results"]
+    }
+
+
+@pytest.mark.django_db
+def test_bench_endpoints(settings):
+    # Orders journal their sales after the response, as in production; the
+    # test transaction never commits, so nothing is written.
+    settings.VENDING_SALES_JOURNAL_SYNC = False
+    settings.VENDING_METRICS_TOKEN = METRICS_TOKEN
+    budgets = json.loads(BUDGETS_PATH.read_text())
+    previous = previous_results()
+    results = []
+    failures = []
+    covered = set()
+
+    for size, (machines, buyers) in SIZES.items():
+        data = seed(machines, buyers)
+        rows = []
+        for name, (request, setup) in endpoints(data).items():
+            response = request()
+            expected = expected_status(name, machines)
+            assert response.status_code == expected, f"{name}: {response.status_code}"
+            covered.add(response_route(response))
+
+            result = {
+                "endpoint": name,
+                "size": size,
+                **measure(request, ITERATIONS, setup),
+            }
+            results.append(result)
+            failures += check_budget(name, size, result, budgets)
+            if last := previous.get((name, size)):
+                result_row = {
+                    **result,
+                    "p95_change_ms": result["p95_ms"] - last["p95_ms"],
+                }
+            else:
+                result_row = result
+            rows.append(
+                {key: value for key, value in result_row.items() if key != "size"}
+            )
+
+        report(f"endpoints ({size}: {machines} machines, {buyers} buyers)", rows)
+        for model in [VendingMachineSlot, VendingMachine, Product, Buyer, User]:
+            model.objects.all().delete()
+
+    print(f"\nSaved {save_results(results)}")
+    if os.environ.get("BENCH_UPDATE_BUDGETS") == "1":
+        BUDGETS_PATH.write_text(json.dumps(new_budgets(results), indent=2) + "\n")
+        print(f"Updated {BUDGETS_PATH}")
+        return
+
+    missing = url_routes() - covered
+    assert not missing, f"routes without a benchmark: {sorted(missing)}"
+    assert not failures, "budgets exceeded:\n" + "\n".join(failures)
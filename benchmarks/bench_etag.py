@@ -0,0 +1,48 @@
+"""Kiosk polling with and without ``If-None-Match`` revalidation."""
+
+import pytest
+from django.test import Client
+
+from apps.vending.models import Product, VendingMachine, VendingMachineSlot
+from benchmarks.utils import measure, report
+
+GRID_SIZE = 11
+ROUTES = ["slots/", "slots/matrix"]
+
+
+@pytest.fixture
+def machine() -> VendingMachine:
+    machine = VendingMachine.objects.create(name="Polled machine")
+    product = Product.objects.create(name="Polled bar", price="1.50")
+    VendingMachineSlot.objects.bulk_create(
+        VendingMachineSlot(
+            machine=machine, product=product, row=row, column=column, quantity=10
+        )
+        for row in range(GRID_SIZE)
+        for column in range(GRID_SIZE)
+    )
+    return machine
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("route", ROUTES)
+def test_bench_etag_polling(machine, route):
+    kiosk = Client()
+    url = f"/machines/{machine.id}/{route}"
+    first = kiosk.get(url)
+    etag = first["ETag"]
+
+    full = measure(lambda: kiosk.get(url), iterations=200)
+    revalidated = measure(
+        lambda: kiosk.get(url, HTTP_IF_NONE_MATCH=etag), iterations=200
+    )
+
+    assert kiosk.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert revalidated["queries"] == 1
+    report(
+        f"polling /machines/<id>/{route}",
+        [
+            {"mode": "full", "bytes": len(first.content), **full},
+            {"mode": "if-none-match", "bytes": 0, **revalidated},
+        ],
+    )
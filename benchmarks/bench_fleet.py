@@ -0,0 +1,73 @@
+"""Per-machine slot queries as the fleet grows.
+
+Every machine has a full 11x11 grid. Latency of the machine scoped endpoints
+should stay flat while the total number of slots grows with the fleet.
+"""
+
+import pytest
+from django.db import connection
+
+from apps.vending.models import Product, VendingMachine, VendingMachineSlot
+from benchmarks.utils import measure, report
+
+FLEET_SIZES = [10, 100, 1_000, 3_000]
+GRID_SIZE = 11
+
+
+def grow_fleet(machines: int) -> VendingMachine:
+    product = Product.objects.first() or Product.objects.create(
+        name="Fleet bar", price="1.50"
+    )
+    missing = machines - VendingMachine.objects.count()
+    fleet = VendingMachine.objects.bulk_create(
+        VendingMachine(name=f"Machine {i}") for i in range(missing)
+    )
+    VendingMachineSlot.objects.bulk_create(
+        (
+            VendingMachineSlot(
+                machine=machine,
+                product=product,
+                row=row,
+                column=column,
+                quantity=(row + column) % 10,
+            )
+            for machine in fleet
+            for row in range(GRID_SIZE)
+            for column in range(GRID_SIZE)
+        ),
+        batch_size=5_000,
+    )
+    return fleet[-1]
+
+
+def query_plan(queryset) -> str:
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return " | ".join(row[-1] for row in cursor.fetchall())
+
+
+@pytest.mark.django_db
+def test_bench_fleet(client):
+    rows = []
+    for machines in FLEET_SIZES:
+        machine = grow_fleet(machines)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        listing = measure(lambda: client.get(f"/machines/{machine.id}/slots/"))
+        low_stock = measure(
+            lambda: client.get(f"/machines/{machine.id}/slots/?quantity=2")
+        )
+        matrix = measure(lambda: client.get(f"/machines/{machine.id}/slots/matrix"))
+        slots = VendingMachineSlot.objects.count()
+        rows.append({"machines": machines, "slots": slots, "route": "slots", **listing})
+        rows.append({"machines": machines, "route": "slots?quantity", **low_stock})
+        rows.append({"machines": machines, "route": "matrix", **matrix})
+
+    plan = query_plan(
+        VendingMachineSlot.objects.filter(machine=machine, quantity__lte=2)
+    )
+    report("machine scoped slot queries", rows)
+    print(f"  plan(quantity filter): {plan}")
+    assert "slot_machine_" in plan
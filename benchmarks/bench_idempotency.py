@@ -0,0 +1,73 @@
+"""POST /order/ with and without ``Idempotency-Key``, and replayed retries.
+
+``fresh`` sends a new key with every order, which is the cost of storing the
+response; ``retry`` resends one key, as a kiosk retrying after a network blip
+does, and is answered from the ``idempotency_key`` table. Expired keys are
+purged once a minute, not per request, so the run starts right after a purge.
+"""
+
+import time
+from decimal import Decimal
+from itertools import count
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+
+from apps.vending import idempotency
+from apps.vending.authentication import issue_token
+from apps.vending.models import (
+    Buyer,
+    IdempotencyKey,
+    Product,
+    VendingMachine,
+    VendingMachineSlot,
+)
+from benchmarks.utils import measure, report
+
+ITERATIONS = 200
+
+
+@pytest.mark.django_db
+def test_bench_idempotency(monkeypatch):
+    user = User.objects.create_user("benchmark")
+    buyer = Buyer.objects.create(user=user, credit=Decimal("1000000"))
+    slot = VendingMachineSlot.objects.create(
+        machine=VendingMachine.objects.create(name="Benchmark machine"),
+        product=Product.objects.create(name="Water", price=Decimal("0.10")),
+        row=0,
+        column=0,
+        quantity=100,
+    )
+    client = Client(HTTP_AUTHORIZATION=f"Token {issue_token(buyer)}")
+    data = {"slot_id": str(slot.id), "quantity": 1}
+    keys = count()
+    IdempotencyKey.objects.all().delete()
+    monkeypatch.setattr(idempotency, "_last_purge", time.monotonic())
+
+    def order(**headers):
+        response = client.post("/order/", data, **headers)
+        assert response.status_code == 200
+        return response
+
+    def restock():
+        VendingMachineSlot.objects.filter(id=slot.id).update(quantity=100)
+
+    results = {
+        "none": measure(order, ITERATIONS, restock),
+        "fresh": measure(
+            lambda: order(HTTP_IDEMPOTENCY_KEY=f"fresh-{next(keys)}"),
+            ITERATIONS,
+            restock,
+        ),
+        "retry": measure(lambda: order(HTTP_IDEMPOTENCY_KEY="retry"), ITERATIONS),
+    }
+    report(
+        "POST /order/ by Idempotency-Key",
+        [{"key": key, **result} for key, result in results.items()],
+    )
+
+    # A retry checks its token and reads its key; a fresh key is read, claimed
+    # and then answered.
+    assert results["retry"]["max_queries"] == 2
+    assert results["fresh"]["max_queries"] <= results["none"]["max_queries"] + 3
@@ -0,0 +1,73 @@
+"""Inventory reads with and without the cache at a 200:1 read/write mix."""
+
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+
+from apps.vending.models import Buyer, Product, VendingMachine, VendingMachineSlot
+from benchmarks.utils import measure, report
+
+READS_PER_WRITE = 200
+MACHINES = 50
+GRID_SIZE = 11
+
+
+@pytest.fixture
+def fleet() -> list[VendingMachine]:
+    product = Product.objects.create(name="Cached bar", price="0.10")
+    machines = VendingMachine.objects.bulk_create(
+        VendingMachine(name=f"Machine {i}") for i in range(MACHINES)
+    )
+    VendingMachineSlot.objects.bulk_create(
+        VendingMachineSlot(
+            machine=machine, product=product, row=row, column=column, quantity=100
+        )
+        for machine in machines
+        for row in range(GRID_SIZE)
+        for column in range(GRID_SIZE)
+    )
+    return machines
+
+
+def mixed_workload(machines: list[VendingMachine]):
+    reader = Client()
+    writer = Client()
+    user = User.objects.create_user("bench", password="password")
+    Buyer.objects.create(user=user, credit=Decimal("99.99"))
+    writer.post("/login/", {"username": "bench", "password": "password"})
+    slots = list(VendingMachineSlot.objects.values_list("id", "machine_id"))
+    counter = iter(range(10**9))
+
+    def run():
+        i = next(counter)
+        machine = machines[i % len(machines)]
+        if i % READS_PER_WRITE == 0:
+            slot_id, _ = slots[i % len(slots)]
+            writer.post("/order/", {"slot_id": slot_id, "quantity": 1})
+        elif i % 2:
+            reader.get(f"/machines/{machine.id}/slots/")
+        else:
+            reader.get(f"/machines/{machine.id}/slots/matrix")
+
+    return run
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "backend",
+    [
+        "django.core.cache.backends.dummy.DummyCache",
+        "django.core.cache.backends.locmem.LocMemCache",
+    ],
+)
+def test_bench_inventory_cache(settings, fleet, backend):
+    settings.CACHES = {**settings.CACHES, "inventory": {"BACKEND": backend}}
+
+    result = measure(mixed_workload(fleet), iterations=2_000)
+
+    report(
+        f"{READS_PER_WRITE}:1 read/write mix",
+        [{"cache": backend.rsplit(".", 1)[-1], **result}],
+    )
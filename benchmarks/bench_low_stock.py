@@ -0,0 +1,90 @@
+"""The k emptiest slots of a large fleet: index scans against sorting a filter.
+
+Every machine has a full 11x11 grid stocked from a catalog of ``PRODUCTS``.
+``low_stock`` reads the first k entries of the low-stock indexes. ``sorted``
+is what clients did before ``/slots/low-stock``: list every slot under a
+quantity threshold and sort it themselves, which grows with the fleet.
+"""
+
+import heapq
+
+import pytest
+from django.db import connection
+
+from apps.vending.models import Product, VendingMachine, VendingMachineSlot
+from apps.vending.validators import ListSlotsValidator, LowStockValidator
+from apps.vending.views import listed_slots, low_stock_slots
+from benchmarks.bench_fleet import GRID_SIZE, query_plan
+from benchmarks.utils import measure, report
+
+MACHINES = 3_000
+PRODUCTS = 500
+LIMIT = 20
+# Reading the first entries of an index must not depend on the fleet size.
+MAX_P95_MS = 5
+
+
+def validated(validator_class, data: dict) -> dict:
+    validator = validator_class(data=data)
+    validator.is_valid(raise_exception=True)
+    return validator.validated_data
+
+
+def seed_fleet() -> VendingMachine:
+    products = Product.objects.bulk_create(
+        Product(name=f"Product {i}", price="1.50") for i in range(PRODUCTS)
+    )
+    fleet = VendingMachine.objects.bulk_create(
+        VendingMachine(name=f"Machine {i}") for i in range(MACHINES)
+    )
+    VendingMachineSlot.objects.bulk_create(
+        (
+            VendingMachineSlot(
+                machine=machine,
+                product=products[(i * 7 + row * GRID_SIZE + column) % PRODUCTS],
+                row=row,
+                column=column,
+                quantity=(i + row + column) % 10,
+            )
+            for i, machine in enumerate(fleet)
+            for row in range(GRID_SIZE)
+            for column in range(GRID_SIZE)
+        ),
+        batch_size=5_000,
+    )
+    return fleet[-1]
+
+
+def sorted_below(threshold: int) -> list[tuple]:
+    slots = listed_slots({}, validated(ListSlotsValidator, {"quantity": threshold}))
+    return heapq.nsmallest(LIMIT, slots, key=lambda slot: slot[1:4] + slot[:1])
+
+
+@pytest.mark.django_db
+def test_bench_low_stock():
+    machine = seed_fleet()
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    product_id = machine.slots.values_list("product_id")[0][0]
+
+    scopes = {
+        "fleet": ({}, {"limit": LIMIT}),
+        "product": ({}, {"limit": LIMIT, "product_id": product_id}),
+        "machine": ({"machine_id": machine.id}, {"limit": LIMIT}),
+        "fleet, quantity<=3": ({}, {"limit": LIMIT, "quantity": 3}),
+    }
+    rows = [{"slots": VendingMachineSlot.objects.count()}]
+    for scope, (kwargs, data) in scopes.items():
+        slots = low_stock_slots(kwargs, validated(LowStockValidator, data))
+        result = measure(lambda: list(slots.all()), 100)
+        rows.append({"scope": scope, "path": "low_stock", **result})
+
+        assert result["queries"] == 1
+        assert result["p95_ms"] < MAX_P95_MS
+        assert "TEMP B-TREE" not in query_plan(slots)
+
+    for threshold in [1, 3]:
+        result = measure(lambda: sorted_below(threshold), 5)
+        rows.append({"scope": f"quantity<={threshold}", "path": "sorted", **result})
+
+    report("k emptiest slots", rows)
@@ -0,0 +1,19 @@
+"""Overhead of the metrics middleware and SQL timing on cheap endpoints."""
+
+import pytest
+
+from apps.vending.tests.unit.vending_machine_slot_tests import VendingMachineSlotFactory
+from benchmarks.utils import measure, report
+
+
+@pytest.mark.django_db
+def test_bench_metrics(client, settings):
+    slot = VendingMachineSlotFactory()
+    rows = []
+    for enabled in [False, True]:
+        settings.VENDING_METRICS = enabled
+        for path in ["/healthcheck/", f"/slots/{slot.id}"]:
+            result = measure(lambda: client.get(path), iterations=500)
+            rows.append({"metrics": enabled, "path": path, **result})
+
+    report("metrics overhead", rows)
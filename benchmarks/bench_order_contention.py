@@ -0,0 +1,124 @@
+"""Throughput and oversell count of concurrent orders against one slot.
+
+Every client thread has its own buyer and keeps ordering single units from the
+same slot until it is sold out. ``conditional`` uses the order engine,
+``read-modify-write`` replays the original view logic for comparison.
+"""
+
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+
+from apps.vending.models import Buyer, Product, VendingMachine, VendingMachineSlot
+from apps.vending.orders import OrderError, place_order
+from benchmarks.utils import report
+
+CLIENT_COUNTS = [1, 2, 4, 8, 16]
+STOCK = 100
+PRICE = Decimal("0.10")
+
+
+def read_modify_write_order(buyer: Buyer, slot_id, quantity: int) -> None:
+    slot = VendingMachineSlot.objects.filter(id=slot_id).first()
+    if slot is None or slot.quantity < quantity:
+        raise OrderError("sold out")
+    buyer.refresh_from_db()
+    total_cents = int(slot.product.price * 100) * quantity
+    if total_cents > buyer.credit_cents:
+        raise OrderError("no credit")
+    slot.quantity -= quantity
+    slot.save()
+    buyer.credit_cents -= total_cents
+    buyer.save()
+
+
+def run_clients(order, slot_id, buyers: list[Buyer]) -> dict:
+    sold = [0] * len(buyers)
+    errors = [0] * len(buyers)
+    barrier = threading.Barrier(len(buyers))
+
+    def client(index: int) -> None:
+        barrier.wait()
+        try:
+            while True:
+                try:
+                    order(buyers[index], slot_id, 1)
+                    sold[index] += 1
+                except OrderError:
+                    break
+                except OperationalError:
+                    errors[index] += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(len(buyers))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {"sold": sum(sold), "lock_errors": sum(errors), "elapsed": elapsed}
+
+
+def seed(clients: int) -> tuple[VendingMachineSlot, list[Buyer]]:
+    product = Product.objects.create(name="Contended bar", price=PRICE)
+    slot = VendingMachineSlot.objects.create(
+        machine=VendingMachine.objects.create(name="Contended machine"),
+        product=product,
+        row=0,
+        column=0,
+        quantity=STOCK,
+    )
+    buyers = [
+        Buyer.objects.create(
+            user=User.objects.create(username=f"client-{clients}-{i}"),
+            credit=Decimal("99.99"),
+        )
+        for i in range(clients)
+    ]
+    return slot, buyers
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize(
+    "strategy, order",
+    [("conditional", place_order), ("read-modify-write", read_modify_write_order)],
+)
+def test_bench_order_contention(strategy, order):
+    rows = []
+    for clients in CLIENT_COUNTS:
+        slot, buyers = seed(clients)
+        result = run_clients(order, slot.id, buyers)
+
+        remaining = (
+            VendingMachineSlot.objects.filter(id=slot.id)
+            .values_list("quantity", flat=True)
+            .first()
+            or 0
+        )
+        debited = sum(Decimal("99.99") - buyer.credit for buyer in Buyer.objects.all())
+        rows.append(
+            {
+                "clients": clients,
+                "sold": result["sold"],
+                "oversold": result["sold"] - (STOCK - remaining),
+                "charged_units": int(debited / PRICE),
+                "lock_errors": result["lock_errors"],
+                "orders_per_s": result["sold"] / result["elapsed"],
+            }
+        )
+        Buyer.objects.all().delete()
+        User.objects.all().delete()
+        Product.objects.all().delete()
+
+        if strategy == "conditional":
+            assert result["sold"] == STOCK
+            assert int(debited / PRICE) == STOCK
+
+    report(f"order contention ({strategy})", rows)
@@ -0,0 +1,55 @@
+"""Restocking a fleet: per-row saves against the chunked bulk import."""
+
+import time
+
+import pytest
+
+from apps.vending.models import VendingMachineSlot
+from apps.vending.restock import import_slots
+from benchmarks.bench_fleet import grow_fleet
+from benchmarks.utils import report
+
+FLEET_SIZES = [10, 100]
+
+
+def restock_lines(quantity: int) -> list[str]:
+    return ["machine_id,product_id,row,column,quantity\n"] + [
+        f"{machine_id},{product_id},{row},{column},{quantity}\n"
+        for machine_id, product_id, row, column in VendingMachineSlot.objects.values_list(
+            "machine_id", "product_id", "row", "column"
+        )
+    ]
+
+
+def per_row_restock(quantity: int) -> None:
+    """One save per slot, as when restocking through the admin."""
+    for slot in VendingMachineSlot.objects.all():
+        slot.quantity = quantity
+        slot.save()
+
+
+@pytest.mark.django_db
+def test_bench_restock():
+    rows = []
+    for machines in FLEET_SIZES:
+        grow_fleet(machines)
+        lines = restock_lines(50)
+
+        start = time.perf_counter()
+        imported = import_slots(lines, "csv")
+        bulk_s = time.perf_counter() - start
+        start = time.perf_counter()
+        per_row_restock(60)
+        per_row_s = time.perf_counter() - start
+
+        assert imported.updated == len(lines) - 1
+        rows.append(
+            {
+                "machines": machines,
+                "slots": len(lines) - 1,
+                "bulk_s": bulk_s,
+                "per_row_s": per_row_s,
+            }
+        )
+
+    report("restock", rows)
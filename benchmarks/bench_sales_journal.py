@@ -0,0 +1,62 @@
+"""Order latency with the sales journal inserted in the order or written behind.
+
+Orders run back to back through ``place_order`` in autocommit mode, as the
+endpoint runs them. ``background`` orders only queue their sales, and ``flush_ms``
+is how long the writer thread takes to catch up afterwards.
+"""
+
+import time
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+
+from apps.vending import journal
+from apps.vending.journal import SalesJournal
+from apps.vending.models import Buyer, Product, Sale, VendingMachine, VendingMachineSlot
+from apps.vending.orders import place_order
+from benchmarks.utils import measure, report
+
+ORDERS = 500
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bench_sales_journal(settings, monkeypatch):
+    user = User.objects.create_user("benchmark")
+    buyer = Buyer.objects.create(user=user, credit=Decimal("1000000"))
+    slot = VendingMachineSlot.objects.create(
+        machine=VendingMachine.objects.create(name="Benchmark machine"),
+        product=Product.objects.create(name="Water", price=Decimal("0.10")),
+        row=0,
+        column=0,
+        quantity=100,
+    )
+
+    def order():
+        place_order(buyer, slot.id, 1)
+
+    def restock():
+        VendingMachineSlot.objects.filter(id=slot.id).update(quantity=100)
+
+    rows = []
+    for mode in ["sync", "background"]:
+        settings.VENDING_SALES_JOURNAL_SYNC = mode == "sync"
+        sales_journal = SalesJournal(
+            settings.VENDING_SALES_JOURNAL_BATCH_SIZE,
+            settings.VENDING_SALES_JOURNAL_MAX_PENDING,
+            settings.VENDING_SALES_JOURNAL_FLUSH_SECONDS,
+        )
+        monkeypatch.setattr(journal, "_journal", sales_journal)
+        Sale.objects.all().delete()
+
+        result = measure(order, ORDERS, restock)
+        start = time.perf_counter()
+        sales_journal.flush()
+        flush_ms = (time.perf_counter() - start) * 1000
+        sales_journal.close()
+        rows.append({"journal": mode, **result, "flush_ms": flush_ms})
+
+        # measure() warms up with one extra order.
+        assert Sale.objects.count() == ORDERS + 1
+
+    report("order latency by sales journal mode", rows)
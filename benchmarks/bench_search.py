@@ -0,0 +1,77 @@
+"""Product search over 100k products: the FTS5 index against ``icontains`` scans.
+
+Unranked ``icontains`` returns the first rows that match, so it only keeps up on
+words found in most names; rare and missing words scan the whole table.
+"""
+
+import random
+from itertools import accumulate
+import time
+
+import pytest
+from django.db.models import Q
+
+from apps.vending.models import Product
+from apps.vending.search import catalog_products
+from benchmarks.utils import measure, report
+
+PRODUCT_COUNT = 100_000
+VOCABULARY_SIZE = 5_000
+SYLLABLES = ["ba", "co", "la", "mi", "nu", "ta", "ro", "zi", "pe", "ka", "lo", "su"]
+SEARCHES = ["cola", "choc bar", "b", "ro", "bala coro", "zzz"]
+# Catalog searches must stay in the low milliseconds on this catalog size.
+MAX_P95_MS = 5
+
+
+def vocabulary(words: random.Random) -> list[str]:
+    return [
+        "".join(words.choices(SYLLABLES, k=words.randint(2, 4)))
+        for _ in range(VOCABULARY_SIZE)
+    ] + ["cola", "chocolate", "bar", "water", "zero"]
+
+
+def seed_products(count: int) -> None:
+    """Names of two to four words, drawn with a Zipf-like distribution."""
+    words = random.Random(0)
+    vocab = vocabulary(words)
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(vocab) + 1)))
+    words.shuffle(vocab)
+    Product.objects.bulk_create(
+        (
+            Product(
+                name=" ".join(
+                    words.choices(vocab, cum_weights=cum_weights, k=words.randint(2, 4))
+                ),
+                price="1.25",
+            )
+            for _ in range(count)
+        ),
+        batch_size=5_000,
+    )
+
+
+def icontains_search(text: str, limit: int) -> list[tuple]:
+    terms = Q()
+    for word in text.split():
+        terms &= Q(name__icontains=word)
+    return list(
+        Product.objects.filter(terms).values_list("id", "name", "price")[:limit]
+    )
+
+
+@pytest.mark.django_db
+def test_bench_search():
+    start = time.perf_counter()
+    seed_products(PRODUCT_COUNT)
+    rows = [{"products": PRODUCT_COUNT, "seed_s": time.perf_counter() - start}]
+
+    for text in SEARCHES:
+        fts = measure(lambda: catalog_products(text, 20), 50)
+        scan = measure(lambda: icontains_search(text, 20), 5)
+        rows.append({"search": text, "path": "fts", **fts})
+        rows.append({"search": text, "path": "icontains", **scan})
+
+        assert fts["queries"] == 1
+        assert fts["p95_ms"] < MAX_P95_MS
+
+    report("product search", rows)
@@ -0,0 +1,68 @@
+"""``/slots/`` fast read path against the nested DRF serializers."""
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from apps.vending.models import Product, VendingMachine, VendingMachineSlot
+from apps.vending.pagination import SLOT_ORDERING
+from apps.vending.serializers import (
+    SLOT_FIELDS,
+    VendingMachineSlotSerializer,
+    serialize_slot_row,
+)
+from benchmarks.utils import measure, report
+
+SLOT_COUNTS = [100, 1_000, 10_000]
+
+
+def seed_slots(count: int) -> None:
+    products = Product.objects.bulk_create(
+        Product(name=f"Product {i}", price="1.25") for i in range(count)
+    )
+    machine = VendingMachine.objects.create(name="Benchmark machine")
+    VendingMachineSlot.objects.bulk_create(
+        (
+            VendingMachineSlot(
+                machine=machine,
+                product=product,
+                row=i // 11 % 11,
+                column=i % 11,
+                quantity=i % 100,
+            )
+            for i, product in enumerate(products)
+        ),
+        batch_size=1_000,
+    )
+
+
+def render_drf() -> bytes:
+    slots = VendingMachineSlot.objects.order_by(*SLOT_ORDERING)
+    return JSONRenderer().render(VendingMachineSlotSerializer(slots, many=True).data)
+
+
+def render_fast() -> bytes:
+    slots = VendingMachineSlot.objects.order_by(*SLOT_ORDERING).values_list(
+        *SLOT_FIELDS
+    )
+    return JSONRenderer().render([serialize_slot_row(slot) for slot in slots])
+
+
+@pytest.mark.django_db
+def test_bench_slots_listing():
+    rows = []
+    for count in SLOT_COUNTS:
+        VendingMachineSlot.objects.all().delete()
+        Product.objects.all().delete()
+        seed_slots(count)
+        assert render_fast() == render_drf()
+
+        iterations = max(3, 10_000 // count)
+        drf = measure(render_drf, iterations)
+        fast = measure(render_fast, iterations)
+        rows.append({"slots": count, "path": "drf", **drf})
+        rows.append({"slots": count, "path": "fast", **fast})
+        rows.append({"slots": count, "speedup": drf["mean_ms"] / fast["mean_ms"]})
+
+        assert fast["queries"] == 1
+
+    report("/slots/ serialization", rows)
@@ -0,0 +1,52 @@
+"""Query count and latency of ``/slots/matrix`` against the per-cell strategy."""
+
+import pytest
+
+from apps.vending.models import Product, VendingMachine, VendingMachineSlot
+from apps.vending.serializers import VendingMachineSlotSerializer
+from benchmarks.utils import measure, report
+
+GRID_SIZES = [3, 6, 11]
+
+
+def seed_grid(size: int) -> None:
+    machine = VendingMachine.objects.create(name="Benchmark machine")
+    product = Product.objects.create(name="Benchmark bar", price="1.50")
+    VendingMachineSlot.objects.bulk_create(
+        VendingMachineSlot(
+            machine=machine, product=product, row=row, column=column, quantity=10
+        )
+        for row in range(size)
+        for column in range(size)
+    )
+
+
+def per_cell_matrix(size: int) -> list:
+    """The original implementation: one query and one serializer per cell."""
+    slots_matrix = [[None] * size for _ in range(size)]
+    for row in range(size):
+        for column in range(size):
+            slot = VendingMachineSlot.objects.filter(row=row, column=column)
+            data = VendingMachineSlotSerializer(slot, many=True).data
+            slots_matrix[row][column] = data[0] if len(data) > 0 else None
+    return slots_matrix
+
+
+@pytest.mark.django_db
+def test_bench_slots_matrix(client):
+    rows = []
+    for size in GRID_SIZES:
+        VendingMachineSlot.objects.all().delete()
+        seed_grid(size)
+
+        joined = measure(
+            lambda: client.get(f"/slots/matrix?rows={size}&columns={size}")
+        )
+        per_cell = measure(lambda: per_cell_matrix(size))
+        rows.append({"grid": f"{size}x{size}", "strategy": "joined", **joined})
+        rows.append({"grid": f"{size}x{size}", "strategy": "per-cell", **per_cell})
+
+        # The inventory version lookup plus the joined slot query.
+        assert joined["queries"] == 2
+
+    report("/slots/matrix", rows)
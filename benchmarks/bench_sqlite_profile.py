@@ -0,0 +1,140 @@
+"""Concurrent /order/ and /add-credit/ requests under each SQLite profile.
+
+Every client thread has its own buyer and alternates a 1.00 top-up with a
+single-unit order from a shared machine, closing its connection after each
+request the way the WSGI handler does (which keeps it under ``CONN_MAX_AGE``).
+``development`` is Django's default setup, ``production`` the profile from
+``DATABASE_PROFILES`` and ``production+writer`` adds the single-writer queue.
+Failed requests are reported as ``errors``; they are "database is locked".
+"""
+
+import threading
+import time
+
+import pytest
+from django.conf import settings as django_settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, connection
+from django.test import Client
+
+from apps.vending.models import Buyer, Product, VendingMachine, VendingMachineSlot
+from benchmarks.utils import percentile, report
+
+CLIENT_COUNTS = [4, 16, 32]
+ROUNDS = 25
+
+PROFILES = {
+    "development": (
+        {
+            "CONN_MAX_AGE": 0,
+            "CONN_HEALTH_CHECKS": False,
+            # WAL is persistent, so switch the file back explicitly.
+            "SQLITE_PRAGMAS": {"journal_mode": "delete"},
+        },
+        False,
+    ),
+    "production": (django_settings.DATABASE_PROFILES["production"], False),
+    "production+writer": (django_settings.DATABASE_PROFILES["production"], True),
+}
+
+
+@pytest.fixture
+def database_profile(transactional_db):
+    # Depends on the database so the settings are restored before the flush.
+    original = dict(connection.settings_dict)
+
+    def use(overrides: dict) -> None:
+        connection.close()
+        connection.settings_dict.clear()
+        connection.settings_dict.update(original, **overrides)
+
+    yield use
+    use({})
+
+
+def login_buyers(clients: int, label: str) -> list[Client]:
+    buyer_clients = []
+    for index in range(clients):
+        username = f"{label}-{index}"
+        Buyer.objects.create(
+            user=User.objects.create_user(username, password="password"), credit=0
+        )
+        login = Client().post("/login/", {"username": username, "password": "password"})
+        buyer_clients.append(
+            Client(
+                raise_request_exception=False,
+                HTTP_AUTHORIZATION=f"Token {login.json()['token']}",
+            )
+        )
+    return buyer_clients
+
+
+def run_clients(buyer_clients: list[Client], slot_id) -> dict:
+    samples = [[] for _ in buyer_clients]
+    errors = [0] * len(buyer_clients)
+    barrier = threading.Barrier(len(buyer_clients))
+
+    def run(index: int) -> None:
+        client = buyer_clients[index]
+        barrier.wait()
+        try:
+            for _ in range(ROUNDS):
+                for path, data in [
+                    ("/add-credit/", {"amount": "1.00"}),
+                    ("/order/", {"slot_id": slot_id, "quantity": 1}),
+                ]:
+                    start = time.perf_counter()
+                    response = client.post(path, data)
+                    samples[index].append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 200:
+                        errors[index] += 1
+                    close_old_connections()
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=run, args=(i,)) for i in range(len(buyer_clients))
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = [sample for client_samples in samples for sample in client_samples]
+    return {
+        "errors": sum(errors),
+        "requests_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_bench_sqlite_profile(settings, database_profile, profile):
+    overrides, single_writer = PROFILES[profile]
+    database_profile(overrides)
+    settings.VENDING_SINGLE_WRITER = single_writer
+    machine = VendingMachine.objects.create(name="Edge machine")
+    product = Product.objects.create(name="Edge bar", price="0.10")
+
+    rows = []
+    for clients in CLIENT_COUNTS:
+        slot = VendingMachineSlot.objects.create(
+            machine=machine,
+            product=product,
+            row=0,
+            column=0,
+            quantity=clients * ROUNDS,
+        )
+        buyer_clients = login_buyers(clients, f"{profile}-{clients}")
+
+        result = run_clients(buyer_clients, slot.id)
+
+        rows.append({"clients": clients, **result})
+        if profile != "development":
+            assert result["errors"] == 0
+
+    report(f"orders and top-ups ({profile})", rows)
@@ -0,0 +1,40 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    """Benchmarks run against an on-disk test database.
+
+    The default in-memory test database is shared between threads through
+    SQLite's shared cache, whose table locks do not honour the busy timeout, so
+    it does not reflect how concurrent requests behave in production.
+    """
+    from django.conf import settings
+
+    test_settings = settings.DATABASES["default"].setdefault("TEST", {})
+    test_settings["NAME"] = str(Path(tempfile.gettempdir()) / "vending_bench.sqlite3")
+
+
+@pytest.fixture(autouse=True)
+def sync_sales_journal(settings):
+    """Benchmarks journal sales in the order transaction unless they opt out."""
+    settings.VENDING_SALES_JOURNAL_SYNC = True
+
+
+@pytest.fixture(autouse=True)
+def unlimited_admission(settings):
+    """Benchmarks drive the endpoints harder than any client is allowed to."""
+    settings.VENDING_RATE_LIMITS = {}
+    settings.VENDING_MAX_INFLIGHT_WRITES = None
+
+
+@pytest.fixture(autouse=True)
+def uncached_inventory(settings):
+    """Benchmarks measure the database path unless they enable the cache."""
+    settings.CACHES = {
+        **settings.CACHES,
+        "inventory": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    }
@@ -0,0 +1,67 @@
+"""Helpers shared by the benchmark modules.
+
+Benchmarks are regular pytest modules named ``bench_*.py`` so they are not
+collected by the default test run. Run them explicitly, e.g.::
+
+    python -m pytest benchmarks/bench_slots_matrix.py -s
+"""
+
+import statistics
+import time
+from typing import Callable
+
+from django.db import connection
+
+from apps.vending.middleware import QueryCounter
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(
+    fn: Callable[[], object],
+    iterations: int = 50,
+    setup: Callable[[], object] | None = None,
+) -> dict:
+    """Runs ``fn`` ``iterations`` times and returns latency and query stats.
+
+    ``setup`` runs before every call, outside the timings and query counts.
+    """
+    if setup is not None:
+        setup()
+    fn()  # warm up caches, url resolver and serializers
+    samples = []
+    queries = []
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        for _ in range(iterations):
+            if setup is not None:
+                setup()
+            before = counter.count
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+            queries.append(counter.count - before)
+
+    return {
+        "iterations": iterations,
+        "queries": statistics.fmean(queries),
+        "max_queries": max(queries),
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+    }
+
+
+def report(title: str, rows: list[dict]) -> None:
+    print(f"\n{title}")
+    for row in rows:
+        print("  " + "  ".join(f"{key}={_format(value)}" for key, value in row.items()))
+
+
+def _format(value) -> str:
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
@@ -12,5 +12,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "vending_machine.settings")
+os.environ.setdefault("VENDING_ASYNC_READS", "1")
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,7 +27,7 @@ SECRET_KEY = "django-insecure-52atj*-w#r0$9*qt969kyl#08f0)w8iy2^oiv7g4afld=^z0hs
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
-ALLOWED_HOSTS = ['localhost']
+ALLOWED_HOSTS = ["localhost"]
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:3000",
 ]
@@ -47,6 +48,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "apps.health.middleware.ProbeMiddleware",
+    "apps.vending.middleware.MetricsMiddleware",
+    "apps.vending.middleware.QueryCountMiddleware",
+    "apps.vending.middleware.AdmissionMiddleware",
+    "apps.vending.middleware.ReplicaMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -81,13 +87,93 @@ WSGI_APPLICATION = "vending_machine.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Pick a profile with the VENDING_DATABASE_PROFILE environment variable.
+# SQLITE_PRAGMAS are applied to every new connection (see apps.vending.signals).
+DATABASE_PROFILES = {
+    # Django's defaults: rollback journal and a connection per request.
+    "development": {},
+    # WAL lets reads run alongside the single writer, and synchronous=NORMAL
+    # only syncs at checkpoints, which is still safe against application
+    # crashes in WAL mode. Writers wait up to 20s for the lock instead of
+    # failing with "database is locked". Connections are reused across
+    # requests and checked before reuse.
+    "production": {
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "SQLITE_PRAGMAS": {
+            "journal_mode": "wal",
+            "synchronous": "normal",
+            "busy_timeout": 20_000,
+            "mmap_size": 256 * 1024 * 1024,
+            "temp_store": "memory",
+        },
+    },
+}
+DATABASE_PROFILE = os.environ.get("VENDING_DATABASE_PROFILE", "development")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        **DATABASE_PROFILES[DATABASE_PROFILE],
     }
 }
 
+# Read replicas for the read-only endpoints, given as a comma-separated list of
+# SQLite files in VENDING_READ_REPLICAS (see apps.vending.routers). Clients
+# that wrote read from the primary for VENDING_REPLICA_PIN_SECONDS afterwards.
+VENDING_READ_REPLICAS = []
+replica_paths = os.environ.get("VENDING_READ_REPLICAS", "")
+for index, path in enumerate(filter(None, replica_paths.split(","))):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "NAME": path,
+        "TEST": {"MIRROR": "default"},
+    }
+    VENDING_READ_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["apps.vending.routers.ReplicaRouter"]
+VENDING_REPLICA_PIN_SECONDS = 5
+
+# Run the write endpoints through one writer thread per process, which commits
+# them in batches (see apps.vending.writer).
+VENDING_SINGLE_WRITER = os.environ.get("VENDING_SINGLE_WRITER") == "1"
+VENDING_WRITE_BATCH_SIZE = 64
+
+# Slot lines validated and applied per transaction by /restock/ and the
+# restock command (see apps.vending.restock).
+VENDING_RESTOCK_BATCH_SIZE = 1_000
+
+# Orders journal their sales from a writer thread, which inserts what it collects
+# in VENDING_SALES_JOURNAL_FLUSH_SECONDS in batches of
+# VENDING_SALES_JOURNAL_BATCH_SIZE, with at most VENDING_SALES_JOURNAL_MAX_PENDING
+# waiting in memory. VENDING_SALES_JOURNAL_SYNC inserts them in the order's
+# transaction instead (see apps.vending.journal).
+VENDING_SALES_JOURNAL_SYNC = os.environ.get("VENDING_SALES_JOURNAL_SYNC") == "1"
+VENDING_SALES_JOURNAL_BATCH_SIZE = 500
+VENDING_SALES_JOURNAL_MAX_PENDING = 10_000
+VENDING_SALES_JOURNAL_FLUSH_SECONDS = 0.5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Inventory cache keys embed database-backed inventory versions, so a cache
+# local to each process stays correct with several workers. A shared backend
+# (e.g. django.core.cache.backends.filebased.FileBasedCache) only improves the
+# hit rate.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "inventory": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "inventory",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10_000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -130,7 +216,81 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-# Authentication backends
-AUTHENTICATION_BACKENDS = (
-    "django.contrib.auth.backends.ModelBackend",
+# Authentication backends. BuyerBackend is a ModelBackend; listing both would
+# hash the password of every failed login twice.
+AUTHENTICATION_BACKENDS = ("apps.vending.authentication.BuyerBackend",)
+
+# REST framework
+# https://www.django-rest-framework.org/api-guide/authentication/
+
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "apps.vending.authentication.SignedTokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
+}
+
+# Lifetime in seconds of the tokens issued by LoginView
+VENDING_AUTH_TOKEN_MAX_AGE = 60 * 60
+
+# Responses to Idempotency-Key requests are replayed to retries for
+# VENDING_IDEMPOTENCY_TTL seconds. Duplicates of a request still running wait up
+# to VENDING_IDEMPOTENCY_WAIT_SECONDS for it, and a request that has not
+# finished after VENDING_IDEMPOTENCY_LOCK_SECONDS is assumed lost. Expired keys
+# are purged every VENDING_IDEMPOTENCY_PURGE_SECONDS.
+VENDING_IDEMPOTENCY_TTL = 60 * 60
+VENDING_IDEMPOTENCY_WAIT_SECONDS = 10
+VENDING_IDEMPOTENCY_LOCK_SECONDS = 60
+VENDING_IDEMPOTENCY_PURGE_SECONDS = 60
+
+# Admission control (see apps.vending.admission). Token bucket limits per path,
+# or "*" for every path, as {key: (requests per second, burst)} with "buyer",
+# "ip" or "route" keys. Each login spends over 100ms of CPU on PBKDF2, so they
+# are limited hardest. Writes beyond VENDING_MAX_INFLIGHT_WRITES at once per
+# process (None for no limit) are turned away with a 503 asking to retry in
+# VENDING_OVERLOAD_RETRY_AFTER seconds.
+VENDING_RATE_LIMITS = {
+    "/login/": {"route": (5, 10)},
+    "/order/": {"buyer": (5, 20)},
+    "/order/cart": {"buyer": (5, 20)},
+    "/add-credit/": {"buyer": (5, 20)},
+}
+# Per-address limits are opt-in with VENDING_RATE_LIMIT_BY_IP=1. Behind a
+# reverse proxy or a NAT every client has the same REMOTE_ADDR and would share
+# one bucket, locking everyone out of /login/ at once. List the proxies in
+# VENDING_TRUSTED_PROXIES, comma-separated, so the client address is read from
+# the X-Forwarded-For header they set.
+VENDING_TRUSTED_PROXIES = list(
+    filter(None, os.environ.get("VENDING_TRUSTED_PROXIES", "").split(","))
 )
+if os.environ.get("VENDING_RATE_LIMIT_BY_IP") == "1":
+    VENDING_RATE_LIMITS["*"] = {"ip": (50, 100)}
+    VENDING_RATE_LIMITS["/login/"]["ip"] = (1, 5)
+VENDING_RATE_LIMIT_MAX_KEYS = 100_000
+VENDING_MAX_INFLIGHT_WRITES = 32
+VENDING_OVERLOAD_RETRY_AFTER = 1
+
+# Report the queries of every request in an X-Query-Count response header
+VENDING_QUERY_COUNT_HEADER = DEBUG
+
+# /readiness/ caches its result for VENDING_READINESS_TTL seconds and fails when
+# "SELECT 1" takes longer than VENDING_READINESS_MAX_DB_LATENCY seconds.
+VENDING_READINESS_TTL = 5
+VENDING_READINESS_MAX_DB_LATENCY = 0.25
+
+# Request, SQL and sales metrics served at /metrics/ (see apps.vending.metrics).
+# Workers that share VENDING_METRICS_DIR report their metrics together; share it
+# only between processes of one host, which tell exited processes apart by pid.
+# The metrics include business counters (orders, units sold, credit added and
+# refunded), so only staff sessions and scrapers sending
+# "Authorization: Bearer <VENDING_METRICS_TOKEN>" may read them.
+VENDING_METRICS = True
+VENDING_METRICS_DIR = os.environ.get("VENDING_METRICS_DIR")
+VENDING_METRICS_TOKEN = os.environ.get("VENDING_METRICS_TOKEN")
+VENDING_METRICS_FLUSH_SECONDS = 1
+
+# Serve the read endpoints with the async views in apps.vending.async_views.
+# asgi.py turns it on: under ASGI, sync views hold a worker thread for the
+# whole request.
+VENDING_ASYNC_READS = os.environ.get("VENDING_ASYNC_READS") == "1"
@@ -14,19 +14,34 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
-from apps.health.views import healthcheck
+from apps.health.views import healthcheck, metrics, readiness
+import apps.vending.async_views as vending_async_views
 import apps.vending.views as vending_views
 
+# Under ASGI the read endpoints are served by async views (see
+# apps.vending.async_views).
+read_views = vending_async_views if settings.VENDING_ASYNC_READS else vending_views
+
+slots_urlpatterns = [
+    path("", read_views.VendingMachineSlotsView.as_view()),
+    path("<uuid:id>", read_views.VendingMachineSlotView.as_view()),
+    path("matrix", read_views.VendingMachineSlotsMatrixView.as_view()),
+    path("low-stock", read_views.LowStockSlotsView.as_view()),
+]
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("healthcheck/", healthcheck),
-    path("slots/", include([
-        path("", vending_views.VendingMachineSlotsView.as_view()),
-        path("<uuid:id>", vending_views.VendingMachineSlotView.as_view()),
-        path("matrix", vending_views.VendingMachineSlotsMatrixView.as_view()),
+    path("readiness/", readiness),
+    path("metrics/", metrics),
+    path("slots/", include(slots_urlpatterns)),
+    path("products/", read_views.ProductsView.as_view()),
+    path("machines/<uuid:machine_id>/", include([
+        path("slots/", include(slots_urlpatterns)),
     ])),
 
     path("add-credit/", include([
@@ -35,12 +50,16 @@ urlpatterns = [
     path("refund/", include([
         path("", vending_views.BuyerRefundView.as_view()),
     ])),
+    path("restock/", include([
+        path("", vending_views.RestockView.as_view()),
+    ])),
     path("order/", include([
         path("", vending_views.BuyerOrderView.as_view()),
+        path("cart", vending_views.CartOrderView.as_view()),
     ])),
 
     path("profile/", include([
-        path("", vending_views.ProfileView.as_view()),
+        path("", read_views.ProfileView.as_view()),
     ])),
     path("login/", include([
         path("", vending_views.LoginView.as_view()),